@@ -0,0 +1,347 @@
+"""Headless fill analysis for the in-game bars and gauges.
+
+`CustomImageUtils.analyzeEnergyBar`, `analyzeRelationshipBars` and
+`analyzeSpiritExplosionGauges` estimate how full a bar is by counting the pixels
+of a crop that fall within some HSV ranges, one crop at a time. This module does
+the same offline for a whole batch of crops at once: the crops are stacked,
+converted to HSV in one call and tested against every color range with one
+`cv2.inRange` per range. Each crop is then reduced to a profile along its fill
+direction (the fraction of matching pixels in every column), and the fill is
+read from how far the filled columns extend. Unlike a pixel ratio, that is not
+thrown off by the frame, segment dividers or highlights of a bar.
+
+The color ranges are the ones the Kotlin code uses. The relationship bar ranges
+are in the hue space of an image with swapped red and blue channels because
+`analyzeRelationshipBars` converts an RGBA bitmap with `COLOR_BGR2RGB`.
+
+Run it with: `python barAnalyzer.py` to check and benchmark it on rendered test
+crops, or `python barAnalyzer.py --samples-dir DIR` on a directory of crops
+(e.g. the `debug_spiritExplosionGauge*.png` images the bot saves in debug mode)
+listed in a `expected.json` manifest. Add `--write-samples DIR` to save the
+rendered test crops and their manifest.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+# How every kind of bar is read.
+#
+#   size: The (length, thickness) every crop is resized to, with the length along the fill direction.
+#   direction: The direction the bar fills in. "right" or "up".
+#   swap_red_blue: Whether the HSV ranges are for an image with swapped red and blue channels.
+#   fill_colors: The named HSV ranges of the filled part. If None, everything that is not empty is filled.
+#   empty_colors: The HSV ranges of the empty part. If set, columns that are neither filled nor empty,
+#       like the frame around the bar, are ignored.
+#   segments: How many equal segments the bar is divided into.
+BAR_TYPES = {
+    "relationship": {
+        "size": (111, 13),
+        "direction": "right",
+        "swap_red_blue": True,
+        "fill_colors": {
+            "blue": ((10, 150, 150), (25, 255, 255)),
+            "green": ((40, 150, 150), (80, 255, 255)),
+            "orange": ((100, 150, 150), (130, 255, 255)),
+        },
+        "empty_colors": None,
+        "segments": 5,
+    },
+    "energy": {
+        "size": (600, 5),
+        "direction": "right",
+        "swap_red_blue": False,
+        "fill_colors": {"color": ((5, 0, 120), (180, 255, 255))},
+        "empty_colors": [((0, 0, 116), (180, 255, 118))],
+        "segments": 100,
+    },
+    "spirit_gauge": {
+        "size": (40, 30),
+        "direction": "up",
+        "swap_red_blue": False,
+        "fill_colors": None,
+        "empty_colors": [((0, 0, 50), (180, 50, 200))],
+        "segments": 4,
+    },
+}
+
+
+def in_ranges(hsv: np.ndarray, ranges: Sequence) -> np.ndarray:
+    """Masks the pixels of an HSV image that fall within any of the given ranges.
+
+    Args:
+        hsv (np.ndarray): The HSV image. A whole batch is tested at once by passing it as one tall image.
+        ranges (Sequence): The inclusive (lower, upper) HSV bounds.
+
+    Returns:
+        A boolean array that is True where a pixel is within any of the ranges.
+    """
+    mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+    for lower, upper in ranges:
+        mask = cv2.bitwise_or(mask, cv2.inRange(hsv, np.array(lower), np.array(upper)))
+    return mask.view(bool)
+
+
+def stack_crops(crops: Sequence[np.ndarray], bar_type: str) -> np.ndarray:
+    """Resizes the crops to their bar type's size and stacks them with the fill direction along the columns.
+
+    Args:
+        crops (Sequence[np.ndarray]): The BGR crops of the bars.
+        bar_type (str): One of the `BAR_TYPES` keys.
+
+    Returns:
+        The (N, thickness, length, 3) stack, with the empty end of every bar on the right.
+    """
+    spec = BAR_TYPES[bar_type]
+    length, thickness = spec["size"]
+    width, height = (length, thickness) if spec["direction"] == "right" else (thickness, length)
+
+    stack = np.empty((len(crops), height, width, 3), dtype=np.uint8)
+    for i, crop in enumerate(crops):
+        stack[i] = crop if crop.shape[:2] == (height, width) else cv2.resize(crop, (width, height), interpolation=cv2.INTER_AREA)
+
+    if spec["direction"] == "up":
+        # Turn bottom-to-top into left-to-right.
+        stack = np.rot90(stack, k=-1, axes=(1, 2))
+    return stack
+
+
+def analyze_bars(crops: Sequence[np.ndarray], bar_type: str, column_threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """Estimates the fill of a batch of bars of the same type.
+
+    Args:
+        crops (Sequence[np.ndarray]): The BGR crops of the bars.
+        bar_type (str): One of the `BAR_TYPES` keys.
+        column_threshold (float, optional): The fraction of a column's pixels that must
+            match for the column to count as filled. Defaults to 0.5.
+
+    Returns:
+        For every crop, its fill percentage, the number of filled segments and the
+        dominant fill color (or "none" below 1% fill).
+    """
+    if not crops:
+        return []
+
+    spec = BAR_TYPES[bar_type]
+    stack = stack_crops(crops, bar_type)
+
+    # One conversion for the whole batch by treating the stack as one tall image.
+    n, h, w = stack.shape[:3]
+    conversion = cv2.COLOR_RGB2HSV if spec["swap_red_blue"] else cv2.COLOR_BGR2HSV
+    hsv = cv2.cvtColor(np.ascontiguousarray(stack).reshape(n * h, w, 3), conversion)
+
+    empty = in_ranges(hsv, spec["empty_colors"]).reshape(n, h, w) if spec["empty_colors"] else None
+    if spec["fill_colors"]:
+        color_names = list(spec["fill_colors"].keys())
+        color_masks = np.stack([in_ranges(hsv, [spec["fill_colors"][name]]).reshape(n, h, w) for name in color_names], axis=1)
+        filled = color_masks.any(axis=1)
+    else:
+        color_names = []
+        filled = ~empty
+
+    # Column profiles along the fill direction.
+    filled_columns = filled.mean(axis=1) >= column_threshold
+    if empty is not None:
+        valid_columns = (filled | empty).mean(axis=1) >= column_threshold
+        filled_columns &= valid_columns
+    else:
+        valid_columns = np.ones_like(filled_columns)
+
+    # The fill extends to the last filled column, counted in valid columns.
+    valid_counts = np.cumsum(valid_columns, axis=1)
+    any_filled = filled_columns.any(axis=1)
+    last_filled = w - 1 - np.argmax(filled_columns[:, ::-1], axis=1)
+    total_valid = np.maximum(valid_counts[:, -1], 1)
+    fill_percent = np.where(any_filled, 100.0 * valid_counts[np.arange(n), last_filled] / total_valid, 0.0)
+
+    if color_names:
+        color_counts = color_masks.sum(axis=(2, 3))
+        dominant = np.argmax(color_counts, axis=1)
+
+    results = []
+    for i in range(n):
+        if fill_percent[i] < 1.0:
+            dominant_color = "none"
+        else:
+            dominant_color = color_names[dominant[i]] if color_names else "filled"
+        results.append(
+            {
+                "fill_percent": float(fill_percent[i]),
+                "segments": int(min(spec["segments"], fill_percent[i] * spec["segments"] // 100)),
+                "dominant_color": dominant_color,
+            }
+        )
+    return results
+
+
+def analyze_bar_pixel_ratio(crop: np.ndarray, bar_type: str) -> float:
+    """Estimates the fill of one bar by its ratio of matching pixels like the Kotlin code does today.
+
+    Args:
+        crop (np.ndarray): The BGR crop of the bar.
+        bar_type (str): One of the `BAR_TYPES` keys.
+
+    Returns:
+        The fill percentage.
+    """
+    spec = BAR_TYPES[bar_type]
+    hsv = cv2.cvtColor(crop, cv2.COLOR_RGB2HSV if spec["swap_red_blue"] else cv2.COLOR_BGR2HSV)
+
+    empty_pixels = sum(cv2.countNonZero(cv2.inRange(hsv, np.array(lower), np.array(upper))) for lower, upper in spec["empty_colors"] or [])
+    if spec["fill_colors"] is None:
+        total = crop.shape[0] * crop.shape[1]
+        return 100.0 * (total - empty_pixels) / total
+
+    filled_pixels = sum(cv2.countNonZero(cv2.inRange(hsv, np.array(lower), np.array(upper))) for lower, upper in spec["fill_colors"].values())
+    total = filled_pixels + empty_pixels if spec["empty_colors"] else crop.shape[0] * crop.shape[1]
+    return 100.0 * filled_pixels / total if total else 0.0
+
+
+def render_bar(bar_type: str, fill_percent: float, rng: np.random.Generator, color: str = None) -> np.ndarray:
+    """Renders a test crop of a bar with a known fill.
+
+    The bars mimic the game's look: a frame around the bar, an empty part in the
+    bar's empty color, segment dividers for the relationship bar, a brighter
+    highlight along the filled part, slightly soft edges and noise.
+
+    Args:
+        bar_type (str): One of the `BAR_TYPES` keys.
+        fill_percent (float): How full the bar is.
+        rng (np.random.Generator): The random generator for the size and noise.
+        color (str, optional): The fill color of a relationship bar. Defaults to a random one.
+
+    Returns:
+        The BGR crop.
+    """
+    spec = BAR_TYPES[bar_type]
+    length, thickness = spec["size"]
+    # Vary the size a little like crops taken at other resolutions.
+    scale = rng.uniform(0.85, 1.25)
+    length, thickness = max(4, int(round(length * scale))), max(3, int(round(thickness * scale)))
+
+    fill_bgr = {
+        "relationship": {"blue": (235, 150, 40), "green": (70, 200, 60), "orange": (30, 150, 250)},
+        "energy": {"color": (255, 200, 60)},
+        "spirit_gauge": {"filled": (250, 220, 120)},
+    }[bar_type]
+    color = color or list(fill_bgr.keys())[int(rng.integers(len(fill_bgr)))]
+    empty_bgr = {"relationship": (110, 105, 110), "energy": (117, 117, 117), "spirit_gauge": (120, 120, 120)}[bar_type]
+
+    # The frame is 1-2 px along the length. The energy and spirit gauge crops are taken inside the bar.
+    frame = max(1, thickness // 8) if bar_type == "relationship" else 0
+    bar = np.empty((thickness, length, 3), dtype=np.float32)
+    bar[:] = (60, 60, 70)
+    inner = bar[frame : thickness - frame, frame : length - frame]
+    inner[:] = empty_bgr
+
+    filled_length = int(round(inner.shape[1] * fill_percent / 100.0))
+    inner[:, :filled_length] = fill_bgr[color]
+    # A highlight along the top of the filled part.
+    inner[: max(1, inner.shape[0] // 4), :filled_length] = np.minimum(255, np.array(fill_bgr[color]) * 0.85 + 60)
+
+    if bar_type == "relationship":
+        for segment in range(1, spec["segments"]):
+            x = segment * inner.shape[1] // spec["segments"]
+            inner[:, x] = (235, 235, 235)
+
+    bar = cv2.GaussianBlur(bar, (3, 1), 0) + rng.normal(0.0, 0.5, bar.shape)
+    bar = np.clip(bar, 0, 255).astype(np.uint8)
+    if spec["direction"] == "up":
+        # Bottom-to-top bars are the same picture rotated.
+        bar = np.ascontiguousarray(np.rot90(bar, k=1))
+    return bar
+
+
+def render_samples(num_samples: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Renders test crops of every bar type with uniformly random fills."""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for bar_type in BAR_TYPES:
+        for _ in range(num_samples):
+            fill = float(rng.uniform(0.0, 100.0))
+            samples.append({"bar_type": bar_type, "fill": fill, "image": render_bar(bar_type, fill, rng)})
+    return samples
+
+
+def load_samples(samples_dir: str) -> List[Dict[str, Any]]:
+    """Loads test crops listed in `expected.json` as {"file.png": {"bar_type": ..., "fill": ...}}."""
+    with open(os.path.join(samples_dir, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    return [{"bar_type": entry["bar_type"], "fill": entry["fill"], "image": cv2.imread(os.path.join(samples_dir, filename))} for filename, entry in expected.items()]
+
+
+def write_samples(samples: List[Dict[str, Any]], samples_dir: str):
+    """Saves test crops and their `expected.json` manifest."""
+    os.makedirs(samples_dir, exist_ok=True)
+    expected = {}
+    for i, sample in enumerate(samples):
+        filename = f"{sample['bar_type']}_{i:04d}.png"
+        cv2.imwrite(os.path.join(samples_dir, filename), sample["image"])
+        expected[filename] = {"bar_type": sample["bar_type"], "fill": round(sample["fill"], 2)}
+    with open(os.path.join(samples_dir, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump(expected, f, indent=4)
+    logging.info(f"Saved {len(samples)} test crops to {samples_dir}.")
+
+
+def benchmark(samples: List[Dict[str, Any]], repeat: int = 5):
+    """Compares the batched column-profile analysis with the per-crop pixel ratio on test crops.
+
+    Args:
+        samples (List[Dict[str, Any]]): The test crops with their bar type and expected fill.
+        repeat (int, optional): How many times each measurement is repeated. Defaults to 5.
+    """
+
+    def best_time(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return 1000.0 * min(times)
+
+    for bar_type in BAR_TYPES:
+        typed = [sample for sample in samples if sample["bar_type"] == bar_type]
+        if not typed:
+            continue
+        crops = [sample["image"] for sample in typed]
+        expected = np.array([sample["fill"] for sample in typed])
+
+        batched = np.array([result["fill_percent"] for result in analyze_bars(crops, bar_type)])
+        pixel_ratio = np.array([analyze_bar_pixel_ratio(crop, bar_type) for crop in crops])
+
+        batched_ms = best_time(lambda: analyze_bars(crops, bar_type))
+        single_ms = best_time(lambda: [analyze_bars([crop], bar_type) for crop in crops])
+        pixel_ratio_ms = best_time(lambda: [analyze_bar_pixel_ratio(crop, bar_type) for crop in crops])
+
+        logging.info(
+            f"{bar_type} ({len(typed)} crops): column profiles MAE {np.abs(batched - expected).mean():.2f}% "
+            f"(max {np.abs(batched - expected).max():.2f}%) vs pixel ratio MAE {np.abs(pixel_ratio - expected).mean():.2f}% "
+            f"(max {np.abs(pixel_ratio - expected).max():.2f}%)"
+        )
+        logging.info(
+            f"    Per crop: batched {1000.0 * batched_ms / len(typed):.1f} us | one crop per call {1000.0 * single_ms / len(typed):.1f} us | "
+            f"pixel ratio {1000.0 * pixel_ratio_ms / len(typed):.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Checks and benchmarks the batched bar fill analysis.")
+    parser.add_argument("--samples-dir", default=None, help="Directory of test crops with an expected.json manifest. Defaults to rendered crops.")
+    parser.add_argument("--samples", type=int, default=200, help="Number of rendered crops per bar type.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the rendered crops.")
+    parser.add_argument("--write-samples", default=None, help="Optional directory to save the rendered crops and their manifest to.")
+    parser.add_argument("--repeat", type=int, default=5, help="How many times each measurement is repeated.")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples_dir) if args.samples_dir else render_samples(args.samples, args.seed)
+    if args.write_samples:
+        write_samples(samples, args.write_samples)
+    benchmark(samples, args.repeat)
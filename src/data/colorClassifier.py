@@ -0,0 +1,263 @@
+"""Lookup-table based color classification for the image detection tools.
+
+Masking several color ranges is usually done with one `cv2.inRange` and one
+`cv2.bitwise_or` per range on top of a BGR to HSV conversion, so the cost grows
+with every range that is added. `ColorClassifier` compiles a set
+of named ranges once into lookup tables and then classifies every pixel against
+all of the ranges in a single pass.
+
+Two modes are available:
+
+- "hsv": One 256-entry lookup table per HSV channel holding a bit per range.
+  A pixel is in a range when the range's bit is set in all three tables, so
+  classification costs one conversion, three `cv2.LUT` calls and two
+  `cv2.bitwise_and` calls per group of eight ranges. This is exact.
+- "bgr": One lookup table over (quantized) BGR colors holding the bits of every
+  range, which skips the HSV conversion entirely. With 8 bits per channel
+  (16 MB table) this is exact. Fewer bits shrink the table at the cost of
+  classifying colors near a range boundary by their quantization cell's center.
+
+The per-range loop stays cheaper for one or two ranges because `cv2.inRange`
+tests all three channels at once. The lookup tables pay off once a frame is
+tested against a handful of ranges or has to be labeled by class.
+
+Run it with: `python colorClassifier.py` to benchmark it against the per-range
+`cv2.inRange` loop.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from imageDetection import hex_to_hsv
+
+Color = Union[str, Sequence[int]]
+
+
+def to_hsv(color: Color) -> np.ndarray:
+    """Converts a hex color string or an (H, S, V) sequence to an OpenCV HSV array."""
+    if isinstance(color, str):
+        return hex_to_hsv(color)
+    return np.array(color, dtype=np.uint8)
+
+
+class ColorClassifier:
+    """
+    Classifies pixels against a set of named color ranges in one pass.
+
+    Args:
+        classes (Dict[str, List[Tuple[Color, Color]]]): Maps each class name to its
+            (lower, upper) color ranges. Colors are hex strings or OpenCV (H, S, V)
+            values. Bounds are inclusive like `cv2.inRange`.
+        mode (str): "hsv" or "bgr". See the module docstring. Defaults to "hsv".
+        bgr_bits (int): Bits per channel of the "bgr" lookup table. Defaults to 8 (exact).
+    """
+
+    def __init__(self, classes: Dict[str, List[Tuple[Color, Color]]], mode: str = "hsv", bgr_bits: int = 8):
+        if mode not in ("hsv", "bgr"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if not 1 <= bgr_bits <= 8:
+            raise ValueError(f"bgr_bits must be between 1 and 8. Got: {bgr_bits}.")
+
+        self.mode = mode
+        self.bgr_bits = bgr_bits
+        self.class_names = list(classes.keys())
+
+        # Every range gets its own bit. Ranges are split into planes of eight bits.
+        self._ranges = []
+        self._class_bits = {}
+        for name, ranges in classes.items():
+            bits = []
+            for lower, upper in ranges:
+                bits.append(len(self._ranges))
+                self._ranges.append((to_hsv(lower), to_hsv(upper)))
+            self._class_bits[name] = bits
+        self.num_planes = max(1, (len(self._ranges) + 7) // 8)
+
+        if mode == "hsv":
+            self._channel_luts = self._compile_hsv_luts()
+        else:
+            self._bgr_lut = self._compile_bgr_lut()
+
+    def _compile_hsv_luts(self) -> List[List[np.ndarray]]:
+        values = np.arange(256)
+        planes = []
+        for plane in range(self.num_planes):
+            luts = [np.zeros(256, dtype=np.uint8) for _ in range(3)]
+            for bit, (lower, upper) in enumerate(self._ranges[plane * 8 : plane * 8 + 8]):
+                for channel in range(3):
+                    inside = (values >= lower[channel]) & (values <= upper[channel])
+                    luts[channel][inside] |= np.uint8(1 << bit)
+            planes.append(luts)
+        return planes
+
+    def _compile_bgr_lut(self) -> np.ndarray:
+        # Classify the center of every quantization cell. With 8 bits that is every color.
+        levels = 1 << self.bgr_bits
+        step = 256 // levels
+        centers = (np.arange(levels) * step + step // 2).astype(np.uint8)
+        b, g, r = np.meshgrid(centers, centers, centers, indexing="ij")
+        colors = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=-1).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(colors, cv2.COLOR_BGR2HSV).reshape(-1, 3)
+
+        # Reuse the per-channel tables to classify all of the colors at once.
+        lut = np.empty((self.num_planes, levels**3), dtype=np.uint8)
+        for plane, (lut_h, lut_s, lut_v) in enumerate(self._compile_hsv_luts()):
+            lut[plane] = lut_h[hsv[:, 0]] & lut_s[hsv[:, 1]] & lut_v[hsv[:, 2]]
+        return lut
+
+    def classify(self, image: np.ndarray, is_hsv: bool = False) -> List[np.ndarray]:
+        """
+        Computes the range bits of every pixel.
+
+        Args:
+            image (np.ndarray): The BGR image.
+            is_hsv (bool): Whether `image` was already converted to HSV. Only valid in "hsv" mode.
+
+        Returns:
+            List[np.ndarray]: One bit plane per group of eight ranges. Bit `i` of plane
+                `p` is set when the pixel is within range `p * 8 + i`.
+        """
+        if self.mode == "hsv":
+            hsv_img = image if is_hsv else cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            h, s, v = cv2.split(hsv_img)
+            planes = []
+            for lut_h, lut_s, lut_v in self._channel_luts:
+                plane = cv2.bitwise_and(cv2.LUT(h, lut_h), cv2.LUT(s, lut_s))
+                planes.append(cv2.bitwise_and(plane, cv2.LUT(v, lut_v)))
+            return planes
+
+        if is_hsv:
+            raise ValueError("The bgr mode classifies BGR images only.")
+
+        shift = 8 - self.bgr_bits
+        quantized = image >> shift if shift else image
+        index = quantized[:, :, 0].astype(np.int32) << (2 * self.bgr_bits)
+        index |= quantized[:, :, 1].astype(np.int32) << self.bgr_bits
+        index |= quantized[:, :, 2]
+        return [plane_lut[index] for plane_lut in self._bgr_lut]
+
+    def mask(self, image: np.ndarray, names: Sequence[str] = None, is_hsv: bool = False, planes: List[np.ndarray] = None) -> np.ndarray:
+        """
+        Masks the pixels within any range of the given classes.
+
+        Args:
+            image (np.ndarray): The BGR image.
+            names (Sequence[str]): The classes to include. Defaults to every class.
+            is_hsv (bool): Whether `image` was already converted to HSV.
+            planes (List[np.ndarray]): Bit planes from an earlier `classify` call to reuse.
+
+        Returns:
+            np.ndarray: A mask that is 255 where a pixel is within one of the ranges and 0 elsewhere.
+        """
+        planes = planes if planes is not None else self.classify(image, is_hsv)
+        selected = [bit for name in (names if names is not None else self.class_names) for bit in self._class_bits[name]]
+
+        mask = None
+        for plane_index, plane in enumerate(planes):
+            plane_bits = sum(1 << (bit % 8) for bit in selected if bit // 8 == plane_index)
+            if plane_bits == 0:
+                continue
+
+            plane_mask = cv2.compare(cv2.bitwise_and(plane, plane_bits), 0, cv2.CMP_GT)
+            mask = plane_mask if mask is None else cv2.bitwise_or(mask, plane_mask)
+
+        if mask is None:
+            mask = np.zeros(planes[0].shape, dtype=np.uint8)
+        return mask
+
+    def labels(self, image: np.ndarray, is_hsv: bool = False) -> np.ndarray:
+        """
+        Labels every pixel with the first class whose ranges contain it.
+
+        Args:
+            image (np.ndarray): The BGR image.
+            is_hsv (bool): Whether `image` was already converted to HSV.
+
+        Returns:
+            np.ndarray: 0 for unclassified pixels, otherwise the 1-based index of the
+                class in `class_names`.
+        """
+        planes = self.classify(image, is_hsv)
+        labels = np.zeros(planes[0].shape, dtype=np.uint8)
+        # Assign in reverse so that earlier classes win where ranges overlap.
+        for label in range(len(self.class_names), 0, -1):
+            labels[self.mask(image, [self.class_names[label - 1]], planes=planes) > 0] = label
+        return labels
+
+
+def benchmark(image_fp: str, num_ranges_list: Sequence[int] = (2, 8, 16), repeat: int = 20):
+    """
+    Compares the classifier against a per-range `cv2.inRange` loop.
+
+    The first two ranges are the scrollbar colors used by `detectScrollBar`.
+    Extra ranges are generated around other colors sampled from the image so that
+    they match a realistic number of pixels.
+
+    Args:
+        image_fp (str): The image to classify.
+        num_ranges_list (Sequence[int]): The numbers of ranges to benchmark.
+        repeat (int): How many times each measurement is repeated.
+    """
+    image = cv2.imread(image_fp)
+    hsv_img = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    rng = np.random.default_rng(0)
+    base_ranges = [("#787388", "#7d788e"), ("#d3d1db", "#d3d1db")]
+
+    def best_time(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return 1000.0 * min(times)
+
+    logging.info(f"Benchmark on {image_fp} ({image.shape[1]}x{image.shape[0]}), best of {repeat}:")
+    for num_ranges in num_ranges_list:
+        ranges = list(base_ranges[:num_ranges])
+        while len(ranges) < num_ranges:
+            y, x = rng.integers(0, image.shape[0]), rng.integers(0, image.shape[1])
+            center = hsv_img[y, x].astype(int)
+            ranges.append((tuple(np.clip(center - 4, 0, 255)), tuple(np.clip(center + 4, 0, 255))))
+
+        def in_range_loop():
+            # Mirrors the per-frame work `detectScrollBar` used to do.
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+            for lower, upper in ranges:
+                mask = cv2.bitwise_or(cv2.inRange(hsv, to_hsv(lower), to_hsv(upper)), mask)
+            return mask
+
+        classes = {f"range_{i}": [r] for i, r in enumerate(ranges)}
+        hsv_classifier = ColorClassifier(classes, mode="hsv")
+        start = time.perf_counter()
+        bgr_classifier = ColorClassifier(classes, mode="bgr")
+        bgr_compile_ms = 1000.0 * (time.perf_counter() - start)
+
+        expected = in_range_loop()
+        for name, classifier in (("hsv", hsv_classifier), ("bgr", bgr_classifier)):
+            if not np.array_equal(classifier.mask(image), expected):
+                logging.warning(f"    {name} LUT mask differs from the cv2.inRange mask for {num_ranges} ranges.")
+
+        logging.info(
+            f"    {num_ranges:>3} ranges: inRange loop {best_time(in_range_loop):.2f} ms | "
+            f"hsv LUT {best_time(lambda: hsv_classifier.mask(image)):.2f} ms | "
+            f"bgr LUT {best_time(lambda: bgr_classifier.mask(image)):.2f} ms (compiled once in {bgr_compile_ms:.0f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks the color classifier against a per-range cv2.inRange loop.")
+    parser.add_argument("--image", default=os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"), help="The image to classify.")
+    parser.add_argument("--ranges", type=int, nargs="+", default=[2, 8, 16], help="The numbers of color ranges to benchmark.")
+    parser.add_argument("--repeat", type=int, default=20, help="How many times each measurement is repeated.")
+    args = parser.parse_args()
+
+    benchmark(args.image, args.ranges, args.repeat)
@@ -0,0 +1,305 @@
+"""Batch runner for the detectors in `imageDetection.py` over a corpus of captures.
+
+The detectors in `imageDetection.py` take a single file. This script runs them
+headlessly over whole directories of screenshots (e.g. the `saveBitmap` debug
+output of the bot) and `.mp4` recordings. The corpus is split into small jobs
+that only carry file paths: chunks of PNGs, and frame ranges of each video so
+that a long recording is spread across workers too. Every job is decoded and
+detected inside a worker process, so frames never cross process boundaries and
+memory stays bounded by the number of workers no matter how large the corpus
+is. Results are written to a JSONL file as jobs finish, one line per frame:
+
+    {"file": "...", "frame": 0, "timestamp_ms": null, "decode_ms": 4.1,
+     "detections": {"detectRectanglesGeneric": {"rects": [[x, y, w, h], ...], "ms": 38.2, "stages": {...}}}}
+
+Files that fail to decode get a line with an "error" instead. With
+`--skip-unchanged`, recording frames that a `FrameChangeGate` finds unchanged
+reuse the detections of the last changed frame, which is named in "reused_from".
+
+Run it with: `python corpusRunner.py DIR_OR_FILE [...] --out results.jsonl`
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import cv2
+
+from detectorBenchmark import TimedStageCache
+from frameGate import FrameChangeGate
+from imageDetection import DETECTOR_DEFAULTS, run_detector
+from videoSource import VideoSource
+
+IMAGE_EXTENSIONS = (".png",)
+VIDEO_EXTENSIONS = (".mp4",)
+
+# Set once per worker process by `_init_worker`.
+_worker_detectors = None
+_worker_params = None
+_worker_skip_unchanged = False
+# One stage cache per detector, so that its working buffers are only allocated once per frame size.
+_worker_caches = {}
+_worker_frame_id = 0
+
+
+def find_inputs(paths: List[str]) -> Tuple[List[str], List[str]]:
+    """Collects the screenshots and recordings to process.
+
+    Args:
+        paths (List[str]): Files and directories. Directories are searched recursively.
+
+    Returns:
+        The sorted image paths and the sorted video paths.
+    """
+    images, videos = [], []
+
+    def add(fp):
+        extension = os.path.splitext(fp)[-1].lower()
+        if extension in IMAGE_EXTENSIONS:
+            images.append(fp)
+        elif extension in VIDEO_EXTENSIONS:
+            videos.append(fp)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                for filename in filenames:
+                    add(os.path.join(root, filename))
+        elif os.path.isfile(path):
+            add(path)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return sorted(images), sorted(videos)
+
+
+def generate_jobs(images: List[str], videos: List[str], images_per_job: int = 16, frames_per_job: int = 300, stride: int = 1) -> Iterator[Tuple]:
+    """Splits the corpus into jobs that only carry paths and frame ranges.
+
+    Args:
+        images (List[str]): The screenshots.
+        videos (List[str]): The recordings.
+        images_per_job (int, optional): How many screenshots one job processes. Defaults to 16.
+        frames_per_job (int, optional): How many video frames one job covers, before the stride. Defaults to 300.
+        stride (int, optional): Only every `stride`-th video frame is processed. Defaults to 1.
+
+    Returns:
+        ("images", paths) and ("video", path, fps, start_frame, end_frame, stride) jobs.
+    """
+    for i in range(0, len(images), images_per_job):
+        yield ("images", images[i : i + images_per_job])
+
+    # Keep the segment boundaries on the stride so that the sampled frames are the same as in one pass.
+    frames_per_job = max(stride, frames_per_job - frames_per_job % stride)
+    for fp in videos:
+        cap = cv2.VideoCapture(fp)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        cap.release()
+        if frame_count <= 0:
+            # Unknown length or unreadable. Let a single job read it to the end or report the error.
+            yield ("video", fp, fps, 0, None, stride)
+            continue
+        for start in range(0, frame_count, frames_per_job):
+            yield ("video", fp, fps, start, min(start + frames_per_job, frame_count), stride)
+
+
+def _init_worker(detectors: List[str], params: Dict[str, Dict[str, Any]], skip_unchanged: bool):
+    """Sets up a worker process."""
+    global _worker_detectors, _worker_params, _worker_skip_unchanged, _worker_caches
+    _worker_detectors = detectors
+    _worker_params = params
+    _worker_skip_unchanged = skip_unchanged
+    _worker_caches = {detector: TimedStageCache() for detector in detectors}
+    # The pool already uses every core. Threads inside OpenCV would only compete with it.
+    cv2.setNumThreads(1)
+
+
+def detect_frame(image) -> Dict[str, Any]:
+    """Runs every detector of the worker on one frame.
+
+    Args:
+        image (cv2.typing.MatLike): The BGR frame.
+
+    Returns:
+        The rectangles, total time and per-stage times of every detector.
+    """
+    global _worker_frame_id
+    # A new frame ID makes the reused caches compute every stage again.
+    _worker_frame_id += 1
+    detections = {}
+    for detector in _worker_detectors:
+        cache = _worker_caches[detector]
+        cache.timings = {}
+        start = time.perf_counter()
+        rects = run_detector(detector, image, cache, _worker_frame_id, **_worker_params.get(detector, {}))
+        detections[detector] = {
+            "rects": [[int(v) for v in rect] for rect in rects],
+            "ms": round(1000.0 * (time.perf_counter() - start), 3),
+            "stages": {stage: round(1000.0 * seconds, 3) for stage, seconds in cache.timings.items()},
+        }
+    return detections
+
+
+def process_job(job: Tuple) -> List[Dict[str, Any]]:
+    """Decodes and detects every frame of one job.
+
+    Args:
+        job (Tuple): A job from `generate_jobs`.
+
+    Returns:
+        One record per frame, or per file that could not be decoded.
+    """
+    records = []
+    if job[0] == "images":
+        for fp in job[1]:
+            start = time.perf_counter()
+            image = cv2.imread(fp)
+            decode_ms = 1000.0 * (time.perf_counter() - start)
+            if image is None:
+                records.append({"file": fp, "error": "Failed to load image."})
+                continue
+            records.append({"file": fp, "frame": 0, "timestamp_ms": None, "decode_ms": round(decode_ms, 3), "detections": detect_frame(image)})
+        return records
+
+    _, fp, fps, start_frame, end_frame, stride = job
+    try:
+        source = VideoSource(fp, stride=stride, start_sec=start_frame / fps, end_sec=end_frame / fps if end_frame is not None else None)
+    except FileNotFoundError as e:
+        return [{"file": fp, "error": str(e)}]
+
+    gate = FrameChangeGate() if _worker_skip_unchanged else None
+    detections = reference_index = None
+    with source:
+        while True:
+            start = time.perf_counter()
+            frame = source.read()
+            decode_ms = 1000.0 * (time.perf_counter() - start)
+            if frame is None:
+                break
+            index, timestamp_ms, image = frame
+            record = {"file": fp, "frame": index, "timestamp_ms": round(timestamp_ms, 3), "decode_ms": round(decode_ms, 3)}
+
+            if gate is None or gate.has_changed(image):
+                detections = detect_frame(image)
+                reference_index = index
+            else:
+                record["reused_from"] = reference_index
+            if gate is not None:
+                record["gate_ms"] = round(1000.0 * gate.check_seconds[-1], 3)
+            record["detections"] = detections
+            records.append(record)
+    return records
+
+
+def run_corpus(
+    paths: List[str],
+    out_fp: str,
+    detectors: List[str] = None,
+    params: Dict[str, Dict[str, Any]] = None,
+    stride: int = 1,
+    images_per_job: int = 16,
+    frames_per_job: int = 300,
+    processes: int = None,
+    skip_unchanged: bool = False,
+) -> Dict[str, Any]:
+    """Runs the detectors over a corpus across a process pool and streams the results to a JSONL file.
+
+    Args:
+        paths (List[str]): Files and directories of screenshots and recordings.
+        out_fp (str): The JSONL file to write. It is overwritten.
+        detectors (List[str], optional): The detectors to run. Defaults to all of them.
+        params (Dict[str, Dict[str, Any]], optional): Parameter overrides per detector.
+        stride (int, optional): Only every `stride`-th video frame is processed. Defaults to 1.
+        images_per_job (int, optional): How many screenshots one job processes. Defaults to 16.
+        frames_per_job (int, optional): How many video frames one job covers. Defaults to 300.
+        processes (int, optional): The number of worker processes. Defaults to the CPU count.
+        skip_unchanged (bool, optional): Whether to reuse the detections of the last changed
+            frame of a recording for frames that did not change. Defaults to False.
+
+    Returns:
+        A summary of the run: frame, reuse and error counts, wall time, throughput and latencies.
+    """
+    detectors = detectors or list(DETECTOR_DEFAULTS.keys())
+    images, videos = find_inputs(paths)
+    logging.info(f"Running {', '.join(detectors)} on {len(images)} screenshot(s) and {len(videos)} recording(s).")
+
+    num_frames = num_reused = num_gated = num_errors = 0
+    detect_ms = gate_ms = 0.0
+    start = time.perf_counter()
+    jobs = generate_jobs(images, videos, images_per_job, frames_per_job, stride)
+    with open(out_fp, "w", encoding="utf-8") as f, multiprocessing.Pool(processes, initializer=_init_worker, initargs=(detectors, params or {}, skip_unchanged)) as pool:
+        for records in pool.imap_unordered(process_job, jobs):
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                if "error" in record:
+                    num_errors += 1
+                    logging.warning(f"{record['file']}: {record['error']}")
+                    continue
+
+                num_frames += 1
+                if "gate_ms" in record:
+                    num_gated += 1
+                    gate_ms += record["gate_ms"]
+                if "reused_from" in record:
+                    num_reused += 1
+                else:
+                    detect_ms += sum(detection["ms"] for detection in record["detections"].values())
+            # Flush after every job so that the output can be followed while the run is going.
+            f.flush()
+
+            if num_frames and num_frames % 500 < len(records):
+                logging.info(f"Processed {num_frames} frames ({num_frames / (time.perf_counter() - start):.1f} frames/s).")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "frames": num_frames,
+        "errors": num_errors,
+        "seconds": elapsed,
+        "frames_per_second": num_frames / elapsed if elapsed > 0 else 0.0,
+        "mean_detect_ms": detect_ms / (num_frames - num_reused) if num_frames > num_reused else 0.0,
+        "reused": num_reused,
+        "skip_rate": num_reused / num_gated if num_gated else 0.0,
+        "mean_gate_ms": gate_ms / num_gated if num_gated else 0.0,
+    }
+    logging.info(
+        f"Processed {num_frames} frames with {num_errors} error(s) in {elapsed:.1f} seconds "
+        f"({summary['frames_per_second']:.1f} frames/s, {summary['mean_detect_ms']:.1f} ms of detection per detected frame). Saved to {out_fp}."
+    )
+    if num_gated:
+        logging.info(
+            f"Reused the detections of {num_reused} of {num_gated} recording frames ({100.0 * summary['skip_rate']:.1f}%) "
+            f"at {summary['mean_gate_ms']:.2f} ms per frame for the change check."
+        )
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Runs the imageDetection.py detectors over directories of screenshots and recordings.")
+    parser.add_argument("paths", nargs="+", help="Screenshots, recordings or directories to search for them.")
+    parser.add_argument("--out", default="corpus_results.jsonl", help="The JSONL file to stream the results to.")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTOR_DEFAULTS.keys()), default=None, help="The detectors to run. Defaults to all of them.")
+    parser.add_argument("--params", default=None, help='Optional JSON of parameter overrides per detector, e.g. \'{"detectRectangles": {"blur_size": 7}}\'.')
+    parser.add_argument("--stride", type=int, default=1, help="Only process every Nth frame of a recording.")
+    parser.add_argument("--images-per-job", type=int, default=16, help="How many screenshots one job processes.")
+    parser.add_argument("--frames-per-job", type=int, default=300, help="How many frames of a recording one job covers.")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes. Defaults to the CPU count.")
+    parser.add_argument("--skip-unchanged", action="store_true", help="Reuse the detections of the last changed frame for unchanged recording frames.")
+    args = parser.parse_args()
+
+    run_corpus(
+        args.paths,
+        args.out,
+        args.detectors,
+        json.loads(args.params) if args.params else None,
+        args.stride,
+        args.images_per_job,
+        args.frames_per_job,
+        args.processes,
+        args.skip_unchanged,
+    )
@@ -0,0 +1,264 @@
+"""Headless benchmark suite for the detectors in `imageDetection.py`.
+
+Every detector pipeline is run without a window on each sample screenshot and
+timed stage by stage (cvtColor, blur, threshold/Canny/floodFill, morphology,
+findContours and the polygon approximation in the "rects" stage). The runs
+reuse one stage cache like a frame loop does, so the working buffers are only
+allocated once; `--fresh-buffers` starts every run from an empty cache instead.
+The suite also records how much memory a run allocates, the latency jitter
+across runs and how many rectangles were detected, and writes everything to a JSON file together with the OpenCV, NumPy
+and Python versions so that results can be compared across commits and OpenCV
+builds. The samples can be rescaled to other screen widths to see how the
+detectors scale to 1440p or 4K captures, and `--target-width` benchmarks the
+scale-normalized mode (`run_detector_scaled`) instead of full resolution.
+
+Run it with: `python detectorBenchmark.py --out benchmark.json` and compare a
+later run against it with `python detectorBenchmark.py --baseline benchmark.json`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+from imageDetection import DETECTOR_DEFAULTS, StageCache, run_detector, run_detector_scaled
+
+DEFAULT_SAMPLES = [
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample2.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample3.png"),
+]
+
+
+class TimedStageCache(StageCache):
+    """A `StageCache` that records how long each stage takes to compute."""
+
+    def __init__(self):
+        super().__init__()
+        self.timings = {}
+
+    def get(self, stage, key, compute):
+        def timed_compute():
+            start = time.perf_counter()
+            value = compute()
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+            return value
+
+        return super().get(stage, key, timed_compute)
+
+
+def get_environment() -> Dict[str, Any]:
+    """Describes the machine and library versions the benchmark ran with."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+        "opencv_optimized": cv2.useOptimized(),
+        "numpy": np.__version__,
+    }
+
+
+def benchmark_detector(
+    detector: str, image: np.ndarray, repeat: int = 10, warmup: int = 2, target_width: int = None, reuse_buffers: bool = True
+) -> Dict[str, Any]:
+    """
+    Benchmarks one detector on one image.
+
+    Every run uses a new frame ID so that every stage is computed.
+
+    Args:
+        detector (str): The detector to run. One of the `DETECTOR_DEFAULTS` keys.
+        image (np.ndarray): The BGR screenshot.
+        repeat (int): How many timed runs to take the statistics over.
+        warmup (int): How many untimed runs to do first.
+        target_width (int): If set, runs the scale-normalized mode at this working width instead of full resolution.
+        reuse_buffers (bool): Whether the runs share one stage cache and its buffers, like
+            the frames of a video. Otherwise every run starts from an empty cache.
+
+    Returns:
+        Dict[str, Any]: The rectangle count, the per-stage and total timings in
+            milliseconds (median and min), the jitter of the total in milliseconds,
+            the megabytes a run allocates, the buffer allocations after the warmup
+            and the peak memory of a run in megabytes, including the working
+            buffers it reuses.
+    """
+    shared_cache = TimedStageCache()
+    frame_ids = iter(range(warmup + 2 * repeat + 1))
+
+    def run():
+        cache = shared_cache if reuse_buffers else TimedStageCache()
+        cache.timings = {}
+        frame_id = next(frame_ids)
+        if target_width is None:
+            return run_detector(detector, image, cache, frame_id), cache
+        return run_detector_scaled(detector, image, target_width, cache, frame_id), cache
+
+    for _ in range(warmup):
+        run()
+
+    stage_times = {}
+    totals = []
+    rects = []
+    allocations = shared_cache.buffers.allocations
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rects, cache = run()
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in cache.timings.items():
+            stage_times.setdefault(stage, []).append(seconds)
+    buffer_allocations = shared_cache.buffers.allocations - allocations if reuse_buffers else None
+
+    # Trace separate runs since tracing slows down allocations. The peak above
+    # what was allocated before a run is what the run allocated on top of it.
+    # The reused buffers were allocated before tracing started, so they are
+    # added to the peak to get the working set of a run.
+    tracemalloc.start()
+    allocated_bytes = []
+    peak_bytes = 0
+    for _ in range(repeat):
+        reused_bytes = shared_cache.buffers.nbytes if reuse_buffers else 0
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        allocated_bytes.append(peak - before)
+        peak_bytes = max(peak_bytes, reused_bytes + peak - before)
+    tracemalloc.stop()
+
+    def summarize(samples: List[float]) -> Dict[str, float]:
+        return {"median_ms": 1000.0 * statistics.median(samples), "min_ms": 1000.0 * min(samples)}
+
+    ordered = sorted(totals)
+    return {
+        "rect_count": len(rects),
+        "rects": [list(rect) for rect in rects],
+        "reuse_buffers": reuse_buffers,
+        "total": summarize(totals),
+        "jitter": {
+            "stdev_ms": 1000.0 * statistics.pstdev(totals),
+            "p95_ms": 1000.0 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+            "max_ms": 1000.0 * ordered[-1],
+        },
+        "stages": {stage: summarize(samples) for stage, samples in stage_times.items()},
+        "allocated_mb_per_run": statistics.median(allocated_bytes) / (1024 * 1024),
+        "buffer_allocations": buffer_allocations,
+        "peak_memory_mb": peak_bytes / (1024 * 1024),
+    }
+
+
+def run_benchmarks(
+    sample_fps: List[str] = DEFAULT_SAMPLES,
+    detectors: List[str] = None,
+    repeat: int = 10,
+    warmup: int = 2,
+    widths: List[int] = None,
+    target_width: int = None,
+    reuse_buffers: bool = True,
+) -> Dict[str, Any]:
+    """
+    Benchmarks every detector on every sample.
+
+    Args:
+        sample_fps (List[str]): The screenshots to run the detectors on.
+        detectors (List[str]): The detectors to benchmark. Defaults to all of them.
+        repeat (int): How many timed runs to take the statistics over.
+        warmup (int): How many untimed runs to do first.
+        widths (List[int]): Screen widths to rescale every sample to, keeping its aspect
+            ratio. Defaults to the native resolution only.
+        target_width (int): If set, benchmarks the scale-normalized mode at this working width.
+        reuse_buffers (bool): Whether the runs share their buffers like the frames of a video.
+
+    Returns:
+        Dict[str, Any]: The environment and a result for every detector, sample and width.
+    """
+    detectors = detectors or list(DETECTOR_DEFAULTS.keys())
+    results = []
+    for sample_fp in sample_fps:
+        source = cv2.imread(sample_fp)
+        if source is None:
+            raise FileNotFoundError(f"Failed to load image: {sample_fp}")
+
+        for width in widths or [source.shape[1]]:
+            height = int(round(source.shape[0] * width / source.shape[1]))
+            image = source if width == source.shape[1] else cv2.resize(source, (width, height), interpolation=cv2.INTER_CUBIC)
+
+            for detector in detectors:
+                result = benchmark_detector(detector, image, repeat, warmup, target_width, reuse_buffers)
+                results.append({"detector": detector, "sample": os.path.basename(sample_fp), "width": width, "target_width": target_width, **result})
+
+                stages = " | ".join(f"{stage} {timing['median_ms']:.2f}" for stage, timing in result["stages"].items())
+                logging.info(
+                    f"{detector} on {os.path.basename(sample_fp)} at {width}x{height}: {result['total']['median_ms']:.2f} ms "
+                    f"(stdev {result['jitter']['stdev_ms']:.2f}, p95 {result['jitter']['p95_ms']:.2f}), {result['rect_count']} rect(s), "
+                    f"allocates {result['allocated_mb_per_run']:.2f} MB per run, peak {result['peak_memory_mb']:.1f} MB ({stages})"
+                )
+
+    return {"environment": get_environment(), "repeat": repeat, "target_width": target_width, "reuse_buffers": reuse_buffers, "results": results}
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Logs how the total time and rectangle count of every result changed against a baseline report."""
+    baseline_results = {(r["detector"], r["sample"], r.get("width")): r for r in baseline["results"]}
+    logging.info(f"Compared to {baseline['environment'].get('commit')} (OpenCV {baseline['environment'].get('opencv')}):")
+    for result in report["results"]:
+        previous = baseline_results.get((result["detector"], result["sample"], result.get("width")))
+        if previous is None:
+            continue
+
+        before, after = previous["total"]["median_ms"], result["total"]["median_ms"]
+        message = f"    {result['detector']} on {result['sample']} at width {result.get('width')}: {before:.2f} ms -> {after:.2f} ms ({before / after:.2f}x)"
+        if "allocated_mb_per_run" in previous:
+            message += f", allocates {previous['allocated_mb_per_run']:.2f} MB -> {result['allocated_mb_per_run']:.2f} MB per run"
+            message += f", stdev {previous['jitter']['stdev_ms']:.2f} ms -> {result['jitter']['stdev_ms']:.2f} ms"
+        if previous["rect_count"] != result["rect_count"]:
+            message += f", rect count changed from {previous['rect_count']} to {result['rect_count']}"
+        logging.info(message)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Headless benchmark suite for the detectors in imageDetection.py.")
+    parser.add_argument("--samples", nargs="+", default=DEFAULT_SAMPLES, help="The screenshots to run the detectors on.")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTOR_DEFAULTS.keys()), default=None, help="The detectors to benchmark.")
+    parser.add_argument("--repeat", type=int, default=10, help="How many timed runs to take the statistics over.")
+    parser.add_argument("--warmup", type=int, default=2, help="How many untimed runs to do first.")
+    parser.add_argument("--out", default=None, help="Optional JSON file to write the results to.")
+    parser.add_argument("--baseline", default=None, help="Optional JSON file of an earlier run to compare against.")
+    parser.add_argument("--widths", nargs="+", type=int, default=None, help="Screen widths to rescale the samples to, e.g. 1080 1440 2160.")
+    parser.add_argument("--target-width", type=int, default=None, help="Benchmark the scale-normalized mode at this working width.")
+    parser.add_argument("--fresh-buffers", action="store_true", help="Start every run from an empty cache instead of reusing the buffers.")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.samples, args.detectors, args.repeat, args.warmup, args.widths, args.target_width, not args.fresh_buffers)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare_to_baseline(report, json.load(f))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        logging.info(f"Saved {len(report['results'])} results to {args.out}.")
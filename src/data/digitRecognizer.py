@@ -0,0 +1,400 @@
+"""Batched recognition of the in-game stat digits.
+
+`CustomImageUtils.determineStatGainFromTraining` reads a number by running
+`processStatGainTemplateWithTransparency` once per digit template (`0`-`9` and
+`+`, in the plain, `_mini` or `_mini_bold` style) over the region and then
+assembling the matches with `constructIntegerFromMatches`. That is eleven
+masked `matchTemplate` searches per row, each repeated until no more matches
+are found.
+
+`DigitRecognizer` loads every digit template once into one stacked feature
+matrix. A region is segmented into glyphs by the orange glyph colors with
+connected components, every glyph is normalized to the same size, and all
+glyphs of all regions are scored against every template with a single matrix
+multiplication. The result is the integer together with a confidence.
+
+Run it with: `python digitRecognizer.py` to benchmark its accuracy and latency
+against the per-template matching loop on numbers rendered from the templates.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from templatePrecompiler import DEFAULT_TEMPLATES_DIR, load_raw_template
+
+DIGIT_CHARACTERS = "0123456789+"
+TEMPLATE_FAMILIES = ("", "_mini", "_mini_bold")
+
+# HSV ranges of the glyph fill and outline. The glyphs are orange to red with a
+# high saturation, unlike the mostly white and pastel UI behind them.
+GLYPH_COLOR_BOUNDARIES = [((0, 80, 140), (30, 255, 255)), ((170, 80, 140), (179, 255, 255))]
+
+# Every glyph is scaled to this height and centered on a canvas of this width before it is compared.
+GLYPH_HEIGHT = 32
+GLYPH_WIDTH = 36
+
+# A recognized number: its value (None if no digit was found), its confidence and the raw recognized text.
+Recognition = Tuple[Optional[int], float, str]
+
+
+def glyph_feature(gray: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Turns a tightly cropped glyph into a zero-mean, unit-length feature vector.
+
+    The glyph is scaled to `GLYPH_HEIGHT` keeping its aspect ratio so that narrow
+    glyphs like "1" stay narrow, and everything outside of its mask is cleared.
+
+    Args:
+        gray (np.ndarray): The grayscale glyph.
+        mask (np.ndarray): The mask of the glyph's pixels.
+
+    Returns:
+        The flattened feature vector.
+    """
+    h, w = gray.shape[:2]
+    scaled_w = min(GLYPH_WIDTH, max(1, int(round(w * GLYPH_HEIGHT / h))))
+    glyph = np.where(mask > 0, gray, 0).astype(np.float32)
+    glyph = cv2.resize(glyph, (scaled_w, GLYPH_HEIGHT), interpolation=cv2.INTER_AREA)
+
+    canvas = np.zeros((GLYPH_HEIGHT, GLYPH_WIDTH), dtype=np.float32)
+    x = (GLYPH_WIDTH - scaled_w) // 2
+    canvas[:, x : x + scaled_w] = glyph
+
+    feature = canvas.ravel()
+    feature -= feature.mean()
+    norm = np.linalg.norm(feature)
+    return feature / norm if norm > 0 else feature
+
+
+def assemble_number(text: str) -> Optional[int]:
+    """Converts recognized glyphs to an integer like `constructIntegerFromMatches`.
+
+    A leading "+" is dropped. Returns None if there are no digits or a "+" appears anywhere else.
+    """
+    digits = text[1:] if text.startswith("+") else text
+    return int(digits) if digits.isdigit() else None
+
+
+class DigitRecognizer:
+    """Recognizes numbers written with the digit templates.
+
+    Args:
+        templates_dir (str, optional): The root template directory.
+        families (Sequence[str], optional): The template styles to load, as the suffixes of
+            the template names. Defaults to all of `TEMPLATE_FAMILIES`.
+        min_glyph_height_ratio (float, optional): Components shorter than this fraction of the
+            tallest component are treated as noise. Defaults to 0.4.
+    """
+
+    def __init__(self, templates_dir: str = DEFAULT_TEMPLATES_DIR, families: Sequence[str] = TEMPLATE_FAMILIES, min_glyph_height_ratio: float = 0.4):
+        self.min_glyph_height_ratio = min_glyph_height_ratio
+
+        features = []
+        self.characters = []
+        self.families = []
+        for family in families:
+            for character in DIGIT_CHARACTERS:
+                gray, mask = load_raw_template(templates_dir, f"{character}{family}")
+                if mask is None:
+                    # Fully opaque templates have no mask, so the whole template is the glyph.
+                    mask = np.full_like(gray, 255)
+                x, y, w, h = cv2.boundingRect(mask)
+                features.append(glyph_feature(gray[y : y + h, x : x + w], mask[y : y + h, x : x + w]))
+                self.characters.append(character)
+                self.families.append(family)
+
+        # One row per template so that every glyph is scored against all of them in one multiplication.
+        self.features = np.stack(features)
+
+    def segment(self, region: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Splits a region into its glyphs from left to right.
+
+        Args:
+            region (np.ndarray): The BGR region containing the number.
+
+        Returns:
+            The tightly cropped (grayscale, mask) pair of every glyph.
+        """
+        hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+        mask = np.zeros(region.shape[:2], dtype=np.uint8)
+        for lower, upper in GLYPH_COLOR_BOUNDARIES:
+            mask = cv2.bitwise_or(mask, cv2.inRange(hsv, lower, upper))
+
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if num_labels <= 1:
+            return []
+
+        # Parts of one glyph (like the arms of the "+") are stacked on top of each
+        # other, so merge components that mostly overlap horizontally.
+        groups = []
+        for label in sorted(range(1, num_labels), key=lambda label: stats[label, cv2.CC_STAT_LEFT]):
+            x, _, w, _ = stats[label, :4]
+            if groups:
+                group_x0, group_x1, group_labels = groups[-1]
+                overlap = min(group_x1, x + w) - max(group_x0, x)
+                if overlap >= 0.5 * min(w, group_x1 - group_x0):
+                    groups[-1] = (min(group_x0, x), max(group_x1, x + w), group_labels + [label])
+                    continue
+            groups.append((x, x + w, [label]))
+
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        boxes = []
+        for _, _, group_labels in groups:
+            group_mask = np.isin(labels, group_labels).astype(np.uint8) * 255
+            boxes.append((cv2.boundingRect(group_mask), group_mask))
+
+        tallest = max(h for (_, _, _, h), _ in boxes)
+        glyphs = []
+        for (x, y, w, h), group_mask in boxes:
+            # Skip specks and slivers of noise. Even a "1" is about half as wide as it is tall.
+            if h >= self.min_glyph_height_ratio * tallest and w >= 0.15 * h:
+                glyphs.extend(self._split_touching(gray[y : y + h, x : x + w], group_mask[y : y + h, x : x + w]))
+        return glyphs
+
+    def _split_touching(self, gray: np.ndarray, mask: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Splits touching glyphs into the pieces that best match the templates.
+
+        Touching glyphs meet at thin necks, so the candidate cuts are the columns
+        where the mask is locally thinnest. Every span between two candidate cuts is
+        scored at once, and dynamic programming picks the partition with the highest
+        score weighted by span width so that splitting into more pieces is not
+        favored by itself.
+        """
+        x, y, w, h = cv2.boundingRect(mask)
+        gray, mask = gray[y : y + h, x : x + w], mask[y : y + h, x : x + w]
+        if w <= 0.9 * h:
+            return [(gray, mask)]
+
+        counts = np.count_nonzero(mask, axis=0)
+        thin = counts <= 0.6 * counts.max()
+        cuts = [0] + [c for c in range(1, w - 1) if thin[c] and counts[c] <= counts[c - 1] and counts[c] <= counts[c + 1]] + [w]
+
+        min_width, max_width = 0.2 * h, 1.2 * h
+        spans = [(i, j) for i in range(len(cuts)) for j in range(i + 1, len(cuts)) if min_width <= cuts[j] - cuts[i] <= max_width or (i == 0 and j == len(cuts) - 1)]
+        crops = {}
+        features = []
+        for i, j in spans:
+            sx, sy, sw, sh = cv2.boundingRect(mask[:, cuts[i] : cuts[j]])
+            sx += cuts[i]
+            crops[(i, j)] = (gray[sy : sy + sh, sx : sx + sw], mask[sy : sy + sh, sx : sx + sw])
+            features.append(glyph_feature(*crops[(i, j)]) if sw else np.zeros(self.features.shape[1], dtype=np.float32))
+        scores = dict(zip(spans, (np.stack(features) @ self.features.T).max(axis=1)))
+
+        # best[j] is the highest total score of a partition of the columns before cuts[j].
+        best = [0.0] + [-np.inf] * (len(cuts) - 1)
+        previous = [None] * len(cuts)
+        for j in range(1, len(cuts)):
+            for i in range(j):
+                if (i, j) in scores and best[i] + (cuts[j] - cuts[i]) * scores[(i, j)] > best[j]:
+                    best[j] = best[i] + (cuts[j] - cuts[i]) * scores[(i, j)]
+                    previous[j] = i
+
+        pieces = []
+        j = len(cuts) - 1
+        while j > 0:
+            pieces.append(crops[(previous[j], j)])
+            j = previous[j]
+        return pieces[::-1]
+
+    def recognize_batch(self, regions: Sequence[np.ndarray], family: Optional[str] = None) -> List[Recognition]:
+        """Recognizes the numbers in many regions with a single scoring pass.
+
+        Args:
+            regions (Sequence[np.ndarray]): The BGR regions, each containing one number.
+            family (str, optional): Only score against templates with this suffix (e.g. "_mini")
+                when the style is known, like the rows of `determineStatGainFromTraining`.
+                Defaults to every loaded style.
+
+        Returns:
+            The (value, confidence, text) of every region. The confidence is the lowest
+            glyph score, where a glyph's score is its correlation with the best template.
+        """
+        glyph_counts = []
+        features = []
+        for region in regions:
+            glyphs = self.segment(region)
+            glyph_counts.append(len(glyphs))
+            features.extend(glyph_feature(gray, mask) for gray, mask in glyphs)
+
+        columns = np.arange(len(self.characters))
+        if family is not None:
+            columns = np.flatnonzero(np.array(self.families) == family)
+
+        results = []
+        if features:
+            scores = np.stack(features) @ self.features[columns].T
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(best)), best]
+        start = 0
+        for count in glyph_counts:
+            if count == 0:
+                results.append((None, 0.0, ""))
+                continue
+
+            text = "".join(self.characters[columns[i]] for i in best[start : start + count])
+            results.append((assemble_number(text), float(best_scores[start : start + count].min()), text))
+            start += count
+        return results
+
+    def recognize(self, region: np.ndarray, family: Optional[str] = None) -> Recognition:
+        """Recognizes the number in one region. See `recognize_batch`."""
+        return self.recognize_batch([region], family)[0]
+
+
+def recognize_with_template_loop(
+    region: np.ndarray, templates: Dict[str, Tuple[np.ndarray, np.ndarray]], threshold: float = 0.9, min_correlation: float = 0.85
+) -> Recognition:
+    """Recognizes a number by matching every template separately like the bot does today.
+
+    Every template is matched with TM_CCORR_NORMED and its alpha mask. Like
+    `processStatGainTemplateWithTransparency`, a match above the threshold only
+    counts if the pixels under the mask also correlate with the template, since the
+    masked score alone is high on flat backgrounds. Each match is blanked out before
+    searching again, and the matches are read from left to right.
+
+    Args:
+        region (np.ndarray): The BGR region containing the number.
+        templates (Dict[str, Tuple[np.ndarray, np.ndarray]]): Maps each template name to its grayscale image and mask.
+        threshold (float, optional): The minimum match score. Defaults to 0.9 like `processStatGainTemplateWithTransparency`.
+        min_correlation (float, optional): The minimum correlation of the masked pixels. Defaults to 0.85 likewise.
+
+    Returns:
+        The (value, confidence, text) of the region. The confidence is the lowest match score.
+    """
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    matches = []
+    for name, (template, mask) in templates.items():
+        h, w = template.shape
+        if h > gray.shape[0] or w > gray.shape[1]:
+            continue
+
+        working = gray.copy()
+        while True:
+            result = cv2.matchTemplate(working, template, cv2.TM_CCORR_NORMED, mask=mask)
+            _, score, _, (x, y) = cv2.minMaxLoc(np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0))
+            if score < threshold:
+                break
+            valid = mask > 0
+            if np.corrcoef(template[valid].astype(np.float64), working[y : y + h, x : x + w][valid].astype(np.float64))[0, 1] >= min_correlation:
+                matches.append((x, name[0], score))
+            working[y : y + h, x : x + w] = 0
+
+    if not matches:
+        return None, 0.0, ""
+    matches.sort()
+    text = "".join(character for _, character, _ in matches)
+    return assemble_number(text), min(score for _, _, score in matches), text
+
+
+def render_number(templates_dir: str, text: str, family: str, rng: np.random.Generator, scale: float = 1.0) -> np.ndarray:
+    """Renders a number from the digit templates onto a noisy, low-saturation background.
+
+    Args:
+        templates_dir (str): The root template directory.
+        text (str): The characters to render.
+        family (str): The template style suffix.
+        rng (np.random.Generator): The random generator for the spacing, background and noise.
+        scale (float, optional): How much to resize the result, like a different screen resolution. Defaults to 1.0.
+
+    Returns:
+        The BGR image of the number.
+    """
+    glyphs = [cv2.imread(os.path.join(templates_dir, f"{character}{family}.png"), cv2.IMREAD_UNCHANGED) for character in text]
+    height = max(glyph.shape[0] for glyph in glyphs) + 12
+    spacings = [int(rng.integers(-1, 4)) for _ in glyphs]
+    width = sum(glyph.shape[1] for glyph in glyphs) + sum(spacings) + 16
+
+    # Any hue, but below the saturation of `GLYPH_COLOR_BOUNDARIES` like the UI behind the numbers.
+    background_hsv = np.uint8([[[rng.integers(0, 180), rng.integers(0, 50), rng.integers(170, 256)]]])
+    background = cv2.cvtColor(background_hsv, cv2.COLOR_HSV2BGR)[0, 0].astype(np.float32)
+    canvas = np.empty((height, width, 3), dtype=np.float32)
+    canvas[:] = background
+    x = 8
+    for glyph, spacing in zip(glyphs, spacings):
+        h, w = glyph.shape[:2]
+        # Align the glyphs on the bottom and center the "+" vertically like in game.
+        y = height - 6 - h if glyph.shape[0] > 0.8 * (height - 12) else (height - h) // 2
+        alpha = glyph[:, :, 3:4].astype(np.float32) / 255.0
+        canvas[y : y + h, x : x + w] = glyph[:, :, :3] * alpha + canvas[y : y + h, x : x + w] * (1.0 - alpha)
+        x += w + spacing
+
+    canvas += rng.normal(0.0, 3.0, canvas.shape)
+    image = np.clip(canvas, 0, 255).astype(np.uint8)
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+    return image
+
+
+def benchmark(templates_dir: str = DEFAULT_TEMPLATES_DIR, num_samples: int = 200, seed: int = 0):
+    """Compares the recognizer against the per-template matching loop.
+
+    Samples are numbers of one to three digits, optionally with a leading "+",
+    rendered in every template style at the native scale and at a random scale
+    between 0.8 and 1.2. The style of every sample is passed to both methods.
+
+    Args:
+        templates_dir (str, optional): The root template directory.
+        num_samples (int, optional): How many samples to render per scale setting. Defaults to 200.
+        seed (int, optional): The random seed. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    recognizer = DigitRecognizer(templates_dir)
+    logging.info(f"Loaded {len(recognizer.characters)} digit templates in {1000.0 * (time.perf_counter() - start):.1f} ms.")
+
+    family_templates = {
+        family: {f"{c}{family}": load_raw_template(templates_dir, f"{c}{family}") for c in DIGIT_CHARACTERS} for family in TEMPLATE_FAMILIES
+    }
+
+    for label, scale_range in (("native scale", (1.0, 1.0)), ("rescaled 0.8-1.2x", (0.8, 1.2))):
+        samples = []
+        for _ in range(num_samples):
+            value = int(rng.integers(1, 1000))
+            family = TEMPLATE_FAMILIES[int(rng.integers(len(TEMPLATE_FAMILIES)))]
+            text = ("+" if rng.random() < 0.5 else "") + str(value)
+            samples.append((render_number(templates_dir, text, family, rng, float(rng.uniform(*scale_range))), family, value))
+
+        start = time.perf_counter()
+        loop_results = [recognize_with_template_loop(image, family_templates[family]) for image, family, _ in samples]
+        loop_ms = 1000.0 * (time.perf_counter() - start) / len(samples)
+
+        start = time.perf_counter()
+        single_results = [recognizer.recognize(image, family) for image, family, _ in samples]
+        single_ms = 1000.0 * (time.perf_counter() - start) / len(samples)
+
+        # Batch every sample of the same style together.
+        start = time.perf_counter()
+        batch_results = [None] * len(samples)
+        for family in TEMPLATE_FAMILIES:
+            indices = [i for i, (_, sample_family, _) in enumerate(samples) if sample_family == family]
+            for i, result in zip(indices, recognizer.recognize_batch([samples[i][0] for i in indices], family)):
+                batch_results[i] = result
+        batch_ms = 1000.0 * (time.perf_counter() - start) / len(samples)
+
+        def accuracy(results: List[Recognition]) -> float:
+            return 100.0 * sum(result[0] == value for result, (_, _, value) in zip(results, samples)) / len(samples)
+
+        logging.info(
+            f"{label} ({len(samples)} samples): template loop {accuracy(loop_results):.1f}% in {loop_ms:.2f} ms/number | "
+            f"recognizer {accuracy(single_results):.1f}% in {single_ms:.2f} ms/number | batched {accuracy(batch_results):.1f}% in {batch_ms:.2f} ms/number"
+        )
+        confidences = [result[1] for result, (_, _, value) in zip(single_results, samples) if result[0] == value]
+        if confidences:
+            logging.info(f"    Recognizer confidence of correct results: min {min(confidences):.3f}, median {float(np.median(confidences)):.3f}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks the batched digit recognizer against per-template matching.")
+    parser.add_argument("--templates-dir", default=DEFAULT_TEMPLATES_DIR, help="Root template directory.")
+    parser.add_argument("--samples", type=int, default=200, help="Number of rendered numbers per scale setting.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the rendered numbers.")
+    args = parser.parse_args()
+
+    benchmark(args.templates_dir, args.samples, args.seed)
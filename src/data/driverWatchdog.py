@@ -0,0 +1,198 @@
+"""Watchdog that keeps a long Selenium scrape from hanging forever.
+
+A single `driver.get` that never finishes or a page that stops responding
+blocks a scrape indefinitely. `DriverWatchdog` wraps the driver of a scraper:
+
+- The driver is created with page-load and script timeouts, so a slow page
+  raises a `TimeoutException` instead of blocking.
+- The scraper calls `heartbeat` whenever it makes progress (e.g. after every
+  training event). A monitor thread quits the driver when no heartbeat arrived
+  for `stall_timeout` seconds, which makes the blocked call fail.
+- `run` calls an operation (e.g. scraping one link) with the driver. If it fails
+  with a driver error or stalls, the driver is replaced by a fresh one with the
+  cookies of the old one restored (so the cookie consent stays accepted) and the
+  operation is retried from the start.
+
+It also keeps the duration of every operation so that the tail latency of a run
+can be logged with `log_summary`.
+
+This is used by `CharacterScraper` and `SupportCardScraper` in `main.py`.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+# Seconds without a heartbeat after which the driver is considered stuck.
+DEFAULT_STALL_TIMEOUT_SEC = 120.0
+# How often the monitor thread checks the heartbeat.
+MONITOR_INTERVAL_SEC = 1.0
+
+
+class DriverStalledError(Exception):
+    """Raised when an operation made no progress for longer than the stall timeout."""
+
+
+class DriverWatchdog:
+    """
+    Runs scraper operations on a Chrome driver and replaces the driver when it hangs or fails.
+
+    Args:
+        create_driver (Callable[[], webdriver.Chrome]): Creates a new driver with its page-load and script timeouts set.
+        stall_timeout (float): Seconds without a heartbeat after which the driver is restarted. Defaults to 120.
+        max_restarts (int): How many times one operation is retried on a fresh driver before giving up. Defaults to 3.
+    """
+
+    def __init__(self, create_driver: Callable[[], webdriver.Chrome], stall_timeout: float = DEFAULT_STALL_TIMEOUT_SEC, max_restarts: int = 3):
+        self.create_driver = create_driver
+        self.stall_timeout = stall_timeout
+        self.max_restarts = max_restarts
+
+        self.driver = create_driver()
+        self.num_restarts = 0
+        self.operation_seconds: List[float] = []
+
+        self._cookies: List[Dict[str, Any]] = []
+        self._cookie_origin = None
+        self._lock = threading.Lock()
+        self._last_heartbeat = time.monotonic()
+        self._last_label = "start"
+        self._stalled = False
+        self._running = False
+        self._stop = threading.Event()
+        self._monitor = threading.Thread(target=self._monitor_loop, name="DriverWatchdog", daemon=True)
+        self._monitor.start()
+
+    def heartbeat(self, label: str = ""):
+        """
+        Records that the scraper made progress.
+
+        Args:
+            label (str): What was just done, for the stall warning.
+        """
+        with self._lock:
+            self._last_heartbeat = time.monotonic()
+            self._last_label = label
+
+    def _monitor_loop(self):
+        while not self._stop.wait(MONITOR_INTERVAL_SEC):
+            with self._lock:
+                idle = time.monotonic() - self._last_heartbeat
+                if not self._running or idle < self.stall_timeout or self._stalled:
+                    continue
+                self._stalled = True
+                label = self._last_label
+                driver = self.driver
+
+            logging.warning(f"No progress for {idle:.0f} seconds since \"{label}\". Quitting the driver to unblock it.")
+            # Quitting from this thread makes the call that is blocked on the driver fail.
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.warning(f"Failed to quit the stalled driver: {e}")
+
+    def save_cookies(self):
+        """Remembers the cookies of the current page so that they can be restored on a new driver."""
+        try:
+            self._cookies = self.driver.get_cookies()
+            parts = urlsplit(self.driver.current_url)
+            self._cookie_origin = f"{parts.scheme}://{parts.netloc}/"
+        except WebDriverException as e:
+            logging.warning(f"Failed to save the cookies: {e}")
+
+    def restart(self):
+        """Replaces the driver with a fresh one and restores the saved cookies."""
+        self.num_restarts += 1
+        try:
+            self.driver.quit()
+        except Exception:
+            # It is usually already dead.
+            pass
+
+        driver = self.create_driver()
+        if self._cookie_origin and self._cookies:
+            # Cookies can only be added for the domain of the current page.
+            try:
+                driver.get(self._cookie_origin)
+                for cookie in self._cookies:
+                    try:
+                        driver.add_cookie(cookie)
+                    except WebDriverException as e:
+                        logging.warning(f"Failed to restore cookie {cookie.get('name')}: {e}")
+            except WebDriverException as e:
+                logging.warning(f"Failed to restore the cookies: {e}")
+
+        with self._lock:
+            self.driver = driver
+            self._stalled = False
+            self._last_heartbeat = time.monotonic()
+        logging.info(f"Restarted the driver with {len(self._cookies)} restored cookie(s) (restart #{self.num_restarts}).")
+
+    def run(self, operation: Callable[..., Any], *args, label: str = "") -> Any:
+        """
+        Runs an operation, restarting the driver and retrying it if it fails or stalls.
+
+        Args:
+            operation (Callable[..., Any]): Called with the driver and `args`. It must be safe to run again from the start.
+            *args: The other arguments of the operation.
+            label (str): Names the operation in the logs, e.g. the link.
+
+        Raises:
+            DriverStalledError: If the operation still stalled after `max_restarts` restarts.
+            WebDriverException: If the operation still failed after `max_restarts` restarts.
+
+        Returns:
+            The result of the operation.
+        """
+        for attempt in range(self.max_restarts + 1):
+            self.heartbeat(label)
+            start = time.perf_counter()
+            try:
+                self._running = True
+                result = operation(self.driver, *args)
+                self._running = False
+                self.operation_seconds.append(time.perf_counter() - start)
+                self.save_cookies()
+                return result
+            except Exception as e:
+                # A driver quit by the monitor fails with whatever the connection raises, not only WebDriverException.
+                with self._lock:
+                    self._running = False
+                    stalled = self._stalled
+                if not stalled and not isinstance(e, WebDriverException):
+                    raise
+                self.operation_seconds.append(time.perf_counter() - start)
+                if attempt == self.max_restarts:
+                    if stalled:
+                        raise DriverStalledError(f"\"{label}\" stalled {attempt + 1} times.") from e
+                    raise
+                logging.warning(f"\"{label}\" {'stalled' if stalled else 'failed'} (attempt {attempt + 1}/{self.max_restarts + 1}): {str(e).strip()[:200]}")
+                self.restart()
+
+    def log_summary(self):
+        """Logs the restarts and the latency percentiles of the operations."""
+        if not self.operation_seconds:
+            return
+        seconds = sorted(self.operation_seconds)
+
+        def percentile(p):
+            return seconds[min(len(seconds) - 1, int(p / 100.0 * len(seconds)))]
+
+        logging.info(
+            f"Ran {len(seconds)} operation(s) with {self.num_restarts} driver restart(s): "
+            f"p50 {percentile(50):.1f} s, p95 {percentile(95):.1f} s, max {seconds[-1]:.1f} s."
+        )
+
+    def quit(self):
+        """Stops the monitor thread and quits the driver."""
+        self._stop.set()
+        self._monitor.join()
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
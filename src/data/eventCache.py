@@ -0,0 +1,171 @@
+"""Cache of the training events already scraped from each character and support card page.
+
+`process_training_events` in `main.py` clicks every training event button of a
+page and reads its tooltip, which costs the click, a 1 second wait for the
+tooltip and the extraction, even when a delta scrape revisits a page whose
+events did not change. This cache remembers, for every page, which tooltip title
+each button label opened and the fingerprint of the page it was scraped from.
+The fingerprint is the Next.js build ID of the site, which changes whenever the
+site is redeployed with new data. A button whose label is known for the same
+fingerprint, and whose event is still in the data, is skipped and its stored
+options are kept, so a page without new events costs a single DOM read.
+
+The cache is keyed on the page path rather than the character or support card
+name because several pages (e.g. the outfits of a character) share one name.
+It is saved as `event_cache/<kind>.json` by `CharacterScraper` and
+`SupportCardScraper` together with their JSON file.
+
+Run it with: `python eventCache.py` to summarize the caches and how much time
+they save a delta scrape.
+"""
+
+import argparse
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "event_cache")
+CACHE_VERSION = 1
+# What scraping an event costs besides the DOM reads: the 1 second wait for its tooltip after the click.
+SECONDS_PER_SCRAPED_EVENT = 1.0
+
+
+class TrainingEventCache:
+    """
+    Remembers the tooltip title of every training event button per page and page fingerprint.
+
+    Args:
+        kind (str): "characters" or "supports". Names the cache file.
+        cache_dir (str): The directory of the cache files.
+    """
+
+    def __init__(self, kind: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.kind = kind
+        self.fp = os.path.join(cache_dir, f"{kind}.json")
+        self.pages: Dict[str, Dict[str, Any]] = self._load()
+        # The (hits, events) of every page visited in this run.
+        self.page_stats: Dict[str, Tuple[int, int]] = {}
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.fp):
+            return {}
+        try:
+            with open(self.fp, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Failed to load the training event cache {self.fp}: {e}. Starting with an empty cache.")
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            logging.info(f"The training event cache {self.fp} has an old version. Starting with an empty cache.")
+            return {}
+        return cache.get("pages", {})
+
+    def known_events(self, page: str, fingerprint: Optional[str]) -> Dict[str, str]:
+        """
+        Gets the events of a page that were scraped from the same version of it.
+
+        Args:
+            page (str): The path of the page.
+            fingerprint (Optional[str]): The fingerprint of the page. Nothing is known without one.
+
+        Returns:
+            The tooltip titles by button label, or an empty dictionary if the page changed.
+        """
+        entry = self.pages.get(page)
+        if fingerprint is None or entry is None or entry.get("fingerprint") != fingerprint:
+            return {}
+        return entry["events"]
+
+    def record(self, page: str, fingerprint: Optional[str], label: str, title: str):
+        """
+        Remembers the tooltip title a button opened. Forgets the other events of the page if its fingerprint changed.
+
+        Args:
+            page (str): The path of the page.
+            fingerprint (Optional[str]): The fingerprint of the page. Nothing is recorded without one.
+            label (str): The text of the button.
+            title (str): The title of the tooltip, i.e. the key of the event in the data.
+        """
+        if fingerprint is None:
+            return
+        entry = self.pages.get(page)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            entry = {"fingerprint": fingerprint, "events": {}}
+            self.pages[page] = entry
+        entry["events"][label] = title
+
+    def record_page(self, page: str, hits: int, events: int):
+        """
+        Records and logs how many events of a page were reused from the cache.
+
+        Args:
+            page (str): The path of the page.
+            hits (int): How many events were skipped.
+            events (int): How many events the page has.
+        """
+        self.page_stats[page] = (hits, events)
+        rate = 100.0 * hits / events if events else 100.0
+        logging.info(f"Reused {hits}/{events} training events ({rate:.0f}%) of {page} from the cache.")
+
+    def save(self):
+        """Writes the cache file."""
+        os.makedirs(os.path.dirname(self.fp), exist_ok=True)
+        with open(self.fp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "kind": self.kind, "pages": dict(sorted(self.pages.items()))}, f, ensure_ascii=False, indent=4)
+
+    def log_summary(self):
+        """Logs the hit rate of the pages visited in this run and the time it saved."""
+        if not self.page_stats:
+            return
+        hits = sum(page_hits for page_hits, _ in self.page_stats.values())
+        events = sum(page_events for _, page_events in self.page_stats.values())
+        unchanged = sum(1 for page_hits, page_events in self.page_stats.values() if page_hits == page_events)
+        logging.info(
+            f"Training event cache for {self.kind}: reused {hits}/{events} events ({100.0 * hits / max(events, 1):.0f}%), "
+            f"{unchanged}/{len(self.page_stats)} pages had no new events, saving about {hits * SECONDS_PER_SCRAPED_EVENT:.0f} seconds."
+        )
+
+
+def summarize(kind: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Summarizes a cache file.
+
+    Args:
+        kind (str): "characters" or "supports".
+        cache_dir (str, optional): The directory of the cache files.
+
+    Returns:
+        The number of pages and events, the fingerprints with their page counts and
+            the seconds a delta scrape of the unchanged pages saves.
+    """
+    cache = TrainingEventCache(kind, cache_dir)
+    fingerprints: Dict[str, int] = {}
+    for entry in cache.pages.values():
+        fingerprints[entry["fingerprint"]] = fingerprints.get(entry["fingerprint"], 0) + 1
+    events = sum(len(entry["events"]) for entry in cache.pages.values())
+    return {
+        "pages": len(cache.pages),
+        "events": events,
+        "fingerprints": fingerprints,
+        "seconds_saved": events * SECONDS_PER_SCRAPED_EVENT,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Summarizes the training event caches of the scrapers.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="The directory of the cache files.")
+    parser.add_argument("--kinds", nargs="+", default=["characters", "supports"], help="The caches to summarize.")
+    args = parser.parse_args()
+
+    for kind in args.kinds:
+        summary = summarize(kind, args.cache_dir)
+        if not summary["pages"]:
+            logging.info(f"No training event cache for {kind} in {args.cache_dir}.")
+            continue
+        logging.info(
+            f"{kind}: {summary['events']} events of {summary['pages']} pages are cached, which saves about "
+            f"{summary['seconds_saved']:.0f} seconds of clicking when none of them changed. Pages by fingerprint: {summary['fingerprints']}"
+        )
@@ -0,0 +1,485 @@
+"""Compiles the training event options into structured stat deltas.
+
+The options in `characters.json` and `supports.json` are the reward text of the
+website, e.g. "Energy -10\\nSpeed +10\\nAgnes Digital bond +5". The bot parses
+that text line by line with string matching every time an event shows up and
+sums a weight per line. This module parses every option once into a fixed
+vector of effects (see `FEATURES`): per-stat deltas, skill points, energy,
+mood, bond, skill hints, statuses and so on. Options of the "Randomly either"
+kind keep one vector per branch, and their delta is the mean of the branches
+weighted by the probability the website states for them ("or (~10%)"), or the
+plain mean when it states none.
+Scoring all options of an event then becomes a single dot product of their
+vectors with a weight vector (`score_options`).
+
+The compiled options are written to `compiled_events/<kind>.json` next to the
+original text of every option. Lines that no rule understands are kept with the
+option in "unparsed" and counted in a coverage report, so new wording on the
+website shows up instead of being silently scored as nothing.
+
+Run it with: `python eventOptionCompiler.py` to compile `characters.json` and
+`supports.json`, print the coverage report and compare scoring every option by
+parsing its text against scoring the compiled vectors.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(__file__), "compiled_events")
+COMPILED_VERSION = 2
+
+SOURCES = {
+    "characters": os.path.join(os.path.dirname(__file__), "characters.json"),
+    "supports": os.path.join(os.path.dirname(__file__), "supports.json"),
+}
+
+STATS = ("speed", "stamina", "power", "guts", "wit")
+
+# The order of the entries of every compiled vector.
+FEATURES = STATS + (
+    "skill_points",
+    "energy",
+    "max_energy",
+    "mood",
+    "bond",
+    "hints",
+    "hint_levels",
+    "skills",
+    "last_trained_stat",
+    "fans",
+    "positive_statuses",
+    "negative_statuses",
+    "other_statuses",
+    "heals",
+    "can_start_dating",
+    "event_chain_ended",
+    "random_effects",
+)
+FEATURE_INDEX = {feature: i for i, feature in enumerate(FEATURES)}
+
+# The same statuses as `TrainingEvent.positiveStatuses`/`negativeStatuses`, plus the ones found in the data since.
+POSITIVE_STATUSES = ("Charming", "Fast Learner", "Practice Perfect", "Hot Topic", "Shining Brightly")
+NEGATIVE_STATUSES = ("Practice Poor", "Migraine", "Night Owl", "Slow Metabolism", "Slacker", "Under the Weather", "Not Ready")
+
+# The per-line weights of `TrainingEvent.handleTrainingEvent` as one vector. Stats and skill points count at face value.
+DEFAULT_WEIGHTS = {
+    **{stat: 1.0 for stat in STATS},
+    "skill_points": 1.0,
+    "energy": 3.0,
+    "mood": 50.0,
+    "bond": 20.0,
+    "hints": 25.0,
+    "positive_statuses": 25.0,
+    "negative_statuses": -25.0,
+    "can_start_dating": 100.0,
+    "event_chain_ended": -300.0,
+    "random_effects": -10.0,
+}
+
+# A signed number, or several of them separated by "/" when the amount depends on something (e.g. "+4/+5/+10").
+_VALUE = r"([+-]?\d+(?:/[+-]?\d+)*)"
+_BRANCH_SEPARATOR = re.compile(r"^(?:-{5,}|or(?: \(~(\d+)%\))?)$")
+_RANDOM_PREFIX = "(random) "
+
+# Lines that describe the event rather than an effect on the trainee.
+_INFO_PATTERNS = [
+    re.compile(r"^※"),
+    re.compile(r"^Randomly either$"),
+    re.compile(r"^Nothing happens$"),
+    re.compile(r"^Standard race rewards$"),
+    re.compile(r"^Objective race changed to .+$"),
+    re.compile(r"^Event 「.+」 will occur next turn$"),
+]
+
+
+def _value(text: str) -> float:
+    """Reads a value like "+10" or "+4/+5/+10".
+
+    Returns:
+        The number, or the mean of the alternatives.
+    """
+    values = [int(v) for v in text.split("/")]
+    return sum(values) / len(values)
+
+
+def _add(feature: str, group: int = 1):
+    """Makes a rule that adds the value in a group of the match to a feature."""
+
+    def rule(vector: np.ndarray, match: re.Match):
+        vector[FEATURE_INDEX[feature]] += _value(match.group(group))
+
+    return rule
+
+
+def _count(feature: str):
+    """Makes a rule that counts the line in a feature."""
+
+    def rule(vector: np.ndarray, match: re.Match):
+        vector[FEATURE_INDEX[feature]] += 1
+
+    return rule
+
+
+def _stat(vector: np.ndarray, match: re.Match):
+    vector[FEATURE_INDEX[match.group(1).lower()]] += _value(match.group(2))
+
+
+def _spread(vector: np.ndarray, match: re.Match):
+    # A gain to N random stats is N/5 of it on every stat on average. "All stats" is all five.
+    num_stats = len(STATS) if match.group(1) == "All" else int(match.group(1))
+    vector[: len(STATS)] += _value(match.group(2)) * num_stats / len(STATS)
+
+
+def _full_energy(vector: np.ndarray, match: re.Match):
+    vector[FEATURE_INDEX["energy"]] += 100
+
+
+def _hint(vector: np.ndarray, match: re.Match):
+    vector[FEATURE_INDEX["hints"]] += 1
+    vector[FEATURE_INDEX["hint_levels"]] += _value(match.group(2))
+
+
+def _status(vector: np.ndarray, match: re.Match):
+    name = match.group(1)
+    if any(status in name for status in POSITIVE_STATUSES):
+        vector[FEATURE_INDEX["positive_statuses"]] += 1
+    elif any(status in name for status in NEGATIVE_STATUSES):
+        vector[FEATURE_INDEX["negative_statuses"]] += 1
+    else:
+        vector[FEATURE_INDEX["other_statuses"]] += 1
+
+
+# The effect rules, first match wins. Each one adds the effect of a line to the vector.
+_EFFECT_RULES = [
+    (re.compile(rf"^(Speed|Stamina|Power|Guts|Wit) {_VALUE}$"), _stat),
+    (re.compile(rf"^(All|\d+) (?:random )?stats? {_VALUE}$"), _spread),
+    (re.compile(rf"^Last trained stat {_VALUE}$"), _add("last_trained_stat")),
+    (re.compile(rf"^Skill points {_VALUE}$"), _add("skill_points")),
+    (re.compile(rf"^Energy {_VALUE}$"), _add("energy")),
+    (re.compile(r"^Full energy recovery$"), _full_energy),
+    (re.compile(rf"^Maximum Energy {_VALUE}$"), _add("max_energy")),
+    (re.compile(rf"^Mood {_VALUE}$"), _add("mood")),
+    (re.compile(rf"^Fans {_VALUE}$"), _add("fans")),
+    (re.compile(rf"^(.+) bond {_VALUE}$"), _add("bond", 2)),
+    (re.compile(rf"^(.+) hint {_VALUE}$"), _hint),
+    (re.compile(r"^Hint for a skill related to the race$"), _count("hints")),
+    (re.compile(r"^Obtain .+ skill$"), _count("skills")),
+    (re.compile(r"^Get (.+) status$"), _status),
+    (re.compile(r"^Heal .+$"), _count("heals")),
+    (re.compile(r"^Can start dating$"), _count("can_start_dating")),
+    (re.compile(r"^Event chain ended$"), _count("event_chain_ended")),
+]
+
+
+def parse_line(line: str, vector: np.ndarray) -> str:
+    """Adds the effect of one line of an option to a vector.
+
+    Args:
+        line (str): One line of the option text.
+        vector (np.ndarray): The vector of the option or branch, modified in place.
+
+    Returns:
+        "effect" if the line was added, "info" if it has no effect on the trainee or "unparsed".
+    """
+    line = line.strip()
+    if not line or any(pattern.match(line) for pattern in _INFO_PATTERNS):
+        return "info"
+
+    is_random = line.startswith(_RANDOM_PREFIX)
+    if is_random:
+        line = line[len(_RANDOM_PREFIX) :]
+    for pattern, rule in _EFFECT_RULES:
+        match = pattern.match(line)
+        if match:
+            rule(vector, match)
+            if is_random:
+                # The effect only happens by chance. Keep it in the vector but let the weights discount it.
+                vector[FEATURE_INDEX["random_effects"]] += 1
+            return "effect"
+    return "unparsed"
+
+
+def split_branches(text: str) -> Tuple[List[List[str]], List[float]]:
+    """Splits an option into the lines of its random branches and their probabilities.
+
+    Args:
+        text (str): The option text.
+
+    Returns:
+        One list of lines per branch, or a single list for options without random outcomes,
+        and the probability of every branch.
+    """
+    lines = text.split("\n")
+    if not lines or lines[0].strip() != "Randomly either":
+        return [lines], [1.0]
+
+    # The branches are separated by "----------" lines, but some pages have an "or (~15%)" line
+    # instead, which states the probability of the branch after it.
+    branches, probabilities, current = [], [], []
+    probability = None
+    for line in lines[1:]:
+        separator = _BRANCH_SEPARATOR.match(line.strip())
+        if separator:
+            if current:
+                branches.append(current)
+                probabilities.append(probability)
+                probability = None
+            current = []
+            if separator.group(1) is not None:
+                probability = int(separator.group(1)) / 100.0
+        elif line.strip():
+            current.append(line)
+    if current:
+        branches.append(current)
+        probabilities.append(probability)
+    if not branches:
+        return [[]], [1.0]
+    return branches, _branch_weights(probabilities)
+
+
+def _branch_weights(probabilities: List[float]) -> List[float]:
+    # The branches without a stated probability share what is left equally.
+    stated = sum(p for p in probabilities if p is not None)
+    unstated = probabilities.count(None)
+    rest = max(0.0, 1.0 - stated) / unstated if unstated else 0.0
+    weights = [rest if p is None else p for p in probabilities]
+    total = sum(weights)
+    if total <= 0:
+        return [1.0 / len(weights)] * len(weights)
+    return [weight / total for weight in weights]
+
+
+def compile_option(text: str) -> Tuple[Dict[str, Any], Counter]:
+    """Compiles one option.
+
+    Args:
+        text (str): The option text.
+
+    Returns:
+        The compiled option with its "text", expected "delta", the "branches" of a random option with
+        their "weights" and the "unparsed" lines if there are any, and the count of "effect", "info"
+        and "unparsed" lines.
+    """
+    counts = Counter()
+    unparsed = []
+    branch_vectors = []
+    branches, weights = split_branches(text)
+    for lines in branches:
+        vector = np.zeros(len(FEATURES), dtype=np.float64)
+        for line in lines:
+            result = parse_line(line, vector)
+            counts[result] += 1
+            if result == "unparsed":
+                unparsed.append(line.strip())
+        branch_vectors.append(vector)
+
+    compiled = {"text": text, "delta": _compact(np.average(branch_vectors, axis=0, weights=weights))}
+    if len(branch_vectors) > 1:
+        compiled["branches"] = [_compact(vector) for vector in branch_vectors]
+        compiled["weights"] = _compact(np.asarray(weights))
+    if unparsed:
+        compiled["unparsed"] = unparsed
+    return compiled, counts
+
+
+def _compact(vector: np.ndarray) -> List[float]:
+    # Integers where possible so the JSON stays short.
+    return [int(v) if float(v).is_integer() else round(float(v), 3) for v in vector]
+
+
+def compile_events(data: Dict[str, Dict[str, List[str]]]) -> Tuple[Dict[str, Dict[str, List[Dict[str, Any]]]], Dict[str, Any]]:
+    """Compiles every option of every event.
+
+    Args:
+        data (Dict[str, Dict[str, List[str]]]): The events by entity, e.g. the contents of `characters.json`.
+
+    Returns:
+        The compiled options in the same layout as `data`, and the parse coverage report.
+    """
+    compiled = {}
+    line_counts = Counter()
+    unparsed_lines = Counter()
+    num_options = num_fully_parsed = 0
+    for name, events in data.items():
+        compiled[name] = {}
+        for event, options in events.items():
+            compiled[name][event] = []
+            for text in options:
+                option, counts = compile_option(text)
+                compiled[name][event].append(option)
+                line_counts.update(counts)
+                num_options += 1
+                if "unparsed" in option:
+                    # Group the same wording with different numbers together.
+                    unparsed_lines.update(re.sub(r"\d+", "N", line) for line in option["unparsed"])
+                else:
+                    num_fully_parsed += 1
+
+    num_lines = sum(line_counts.values())
+    report = {
+        "options": num_options,
+        "fully_parsed_options": num_fully_parsed,
+        "option_coverage": num_fully_parsed / num_options if num_options else 1.0,
+        "lines": num_lines,
+        "effect_lines": line_counts["effect"],
+        "info_lines": line_counts["info"],
+        "unparsed_lines": line_counts["unparsed"],
+        "line_coverage": 1.0 - line_counts["unparsed"] / num_lines if num_lines else 1.0,
+        "top_unparsed": unparsed_lines.most_common(),
+    }
+    return compiled, report
+
+
+def write_compiled_events(data: Dict[str, Dict[str, List[str]]], kind: str, out_dir: str = DEFAULT_OUT_DIR) -> Dict[str, Any]:
+    """Compiles the options of a data file and writes them to `<out_dir>/<kind>.json`.
+
+    Args:
+        data (Dict[str, Dict[str, List[str]]]): The events by entity, e.g. the contents of `characters.json`.
+        kind (str): "characters" or "supports". Names the output file.
+        out_dir (str, optional): The directory to write to.
+
+    Returns:
+        The parse coverage report.
+    """
+    compiled, report = compile_events(data)
+    os.makedirs(out_dir, exist_ok=True)
+    out_fp = os.path.join(out_dir, f"{kind}.json")
+    with open(out_fp, "w", encoding="utf-8") as f:
+        json.dump({"version": COMPILED_VERSION, "features": list(FEATURES), "coverage": report, "entities": compiled}, f, ensure_ascii=False, separators=(",", ":"))
+
+    logging.info(
+        f"Compiled {report['options']} {kind} options to {out_fp}: {100.0 * report['option_coverage']:.1f}% fully parsed, "
+        f"{report['unparsed_lines']} of {report['lines']} lines not understood."
+    )
+    return report
+
+
+def load_compiled_events(kind: str, out_dir: str = DEFAULT_OUT_DIR) -> Dict[str, Any]:
+    """Loads the compiled options of a kind.
+
+    Args:
+        kind (str): "characters" or "supports".
+        out_dir (str, optional): The directory they were written to.
+
+    Returns:
+        The compiled file with its "features", "coverage" and "entities".
+    """
+    with open(os.path.join(out_dir, f"{kind}.json"), "r", encoding="utf-8") as f:
+        compiled = json.load(f)
+    if compiled.get("features") != list(FEATURES):
+        raise ValueError(f"The compiled {kind} options were written with different features. Compile them again.")
+    return compiled
+
+
+def weight_vector(weights: Dict[str, float] = None) -> np.ndarray:
+    """Builds the weight vector for `score_options`.
+
+    Args:
+        weights (Dict[str, float], optional): Weights by feature. Missing features weigh 0. Defaults to `DEFAULT_WEIGHTS`.
+
+    Returns:
+        The weights in the order of `FEATURES`.
+    """
+    vector = np.zeros(len(FEATURES), dtype=np.float64)
+    for feature, weight in (DEFAULT_WEIGHTS if weights is None else weights).items():
+        vector[FEATURE_INDEX[feature]] = weight
+    return vector
+
+
+def score_options(options: List[Dict[str, Any]], weights: np.ndarray) -> np.ndarray:
+    """Scores the compiled options of an event.
+
+    Args:
+        options (List[Dict[str, Any]]): The compiled options of one event.
+        weights (np.ndarray): The weight vector from `weight_vector`.
+
+    Returns:
+        The score of every option.
+    """
+    return np.asarray([option["delta"] for option in options], dtype=np.float64) @ weights
+
+
+def score_option_text(text: str, weights: Dict[str, float] = None) -> float:
+    """Scores an option by parsing its text, the way the bot does it today.
+
+    Args:
+        text (str): The option text.
+        weights (Dict[str, float], optional): Weights by feature. Defaults to `DEFAULT_WEIGHTS`.
+
+    Returns:
+        The score of the option.
+    """
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    branches, probabilities = split_branches(text)
+    score = 0.0
+    for lines, probability in zip(branches, probabilities):
+        vector = np.zeros(len(FEATURES), dtype=np.float64)
+        for line in lines:
+            parse_line(line, vector)
+        score += probability * sum(weight * vector[FEATURE_INDEX[feature]] for feature, weight in weights.items())
+    return score
+
+
+def benchmark(data: Dict[str, Dict[str, List[str]]], compiled: Dict[str, Dict[str, List[Dict[str, Any]]]], repeat: int = 5):
+    """Compares scoring every event by parsing the option text against the compiled vectors.
+
+    Args:
+        data (Dict[str, Dict[str, List[str]]]): The events by entity.
+        compiled (Dict[str, Dict[str, List[Dict[str, Any]]]]): The same events from `compile_events`.
+        repeat (int, optional): How many times each is timed. Defaults to 5.
+    """
+    events = [(options, compiled[name][event]) for name, entity in data.items() for event, options in entity.items()]
+    weights = weight_vector()
+
+    def best_time(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    text_seconds = best_time(lambda: [[score_option_text(text) for text in options] for options, _ in events])
+    vector_seconds = best_time(lambda: [score_options(options, weights) for _, options in events])
+
+    max_difference = max(
+        float(np.max(np.abs(np.array([score_option_text(text) for text in options]) - score_options(compiled_options, weights))))
+        for options, compiled_options in events
+    )
+    logging.info(
+        f"Scored {len(events)} events: {1e6 * text_seconds / len(events):.1f} us per event parsing the text, "
+        f"{1e6 * vector_seconds / len(events):.1f} us with the compiled vectors ({text_seconds / vector_seconds:.1f}x faster, "
+        f"largest score difference {max_difference:.2g})."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Compiles the training event options into stat delta vectors and reports the parse coverage.")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR, help="The directory to write the compiled options to.")
+    parser.add_argument("--top", type=int, default=20, help="How many of the most common unparsed lines to list.")
+    parser.add_argument("--no-benchmark", action="store_true", help="Only compile the options.")
+    args = parser.parse_args()
+
+    for kind, source_fp in SOURCES.items():
+        with open(source_fp, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        report = write_compiled_events(data, kind, args.out_dir)
+        logging.info(
+            f"{kind}: {report['effect_lines']} effect, {report['info_lines']} informational and {report['unparsed_lines']} unparsed lines "
+            f"({100.0 * report['line_coverage']:.2f}% line coverage)."
+        )
+        for line, count in report["top_unparsed"][: args.top]:
+            logging.info(f"    {count:4d}x {line}")
+
+        if not args.no_benchmark:
+            benchmark(data, compile_events(data)[0])
@@ -0,0 +1,206 @@
+"""Per-character and per-support-card shards of the training event data.
+
+`characters.json` and `supports.json` hold the training events of every
+character and support card, but a career only ever needs one trainee and at
+most six support cards. This module splits them into one small JSON file per
+character or support card plus a `manifest.json` with the byte size and SHA-256
+of every shard, so that a reader can load and parse only the entities it needs
+and check that they are intact. Shards whose content did not change keep their
+file untouched, so a delta scrape only rewrites what it touched.
+
+The shards are written by `CharacterScraper` and `SupportCardScraper` after
+they save their JSON file. `load_event_shards` reads them back.
+
+Run it with: `python eventShards.py` to build the shards from the existing
+`characters.json` and `supports.json` and compare the parse time and memory of
+loading a deck from them against loading the whole files.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable
+
+DEFAULT_SHARDS_DIR = os.path.join(os.path.dirname(__file__), "event_shards")
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# The data files that are sharded and the subdirectory of their shards.
+SOURCES = {
+    "characters": os.path.join(os.path.dirname(__file__), "characters.json"),
+    "supports": os.path.join(os.path.dirname(__file__), "supports.json"),
+}
+
+
+def shard_filename(name: str) -> str:
+    """Makes a filesystem-safe, collision-free filename for an entity.
+
+    Args:
+        name (str): The character or support card name.
+
+    Returns:
+        The readable part of the name followed by a short hash of the full name.
+    """
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "entity"
+    return f"{slug}_{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}.json"
+
+
+def load_manifest(kind: str, shards_dir: str = DEFAULT_SHARDS_DIR) -> Dict[str, Any]:
+    """Loads the manifest of a kind of shard.
+
+    Args:
+        kind (str): "characters" or "supports".
+        shards_dir (str, optional): The root directory of the shards.
+
+    Returns:
+        The manifest, or an empty one if there is none yet.
+    """
+    manifest_fp = os.path.join(shards_dir, kind, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_fp):
+        return {"version": MANIFEST_VERSION, "kind": kind, "entities": {}}
+    with open(manifest_fp, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_event_shards(data: Dict[str, Any], kind: str, shards_dir: str = DEFAULT_SHARDS_DIR) -> Dict[str, Any]:
+    """Writes one shard per entity and the manifest.
+
+    Shards whose content did not change are left untouched and shards of entities
+    that are no longer in `data` are removed.
+
+    Args:
+        data (Dict[str, Any]): The entities by name, e.g. the contents of `characters.json`.
+        kind (str): "characters" or "supports". Names the subdirectory of the shards.
+        shards_dir (str, optional): The root directory of the shards.
+
+    Returns:
+        The manifest that was written.
+    """
+    out_dir = os.path.join(shards_dir, kind)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(kind, shards_dir)["entities"]
+
+    entities = {}
+    num_written = 0
+    for name in sorted(data.keys()):
+        # Compact since the shards are only read by code. The full files stay pretty-printed for review.
+        content = json.dumps(data[name], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = {"file": shard_filename(name), "bytes": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+        entities[name] = entry
+
+        shard_fp = os.path.join(out_dir, entry["file"])
+        if previous.get(name) != entry or not os.path.exists(shard_fp):
+            with open(shard_fp, "wb") as f:
+                f.write(content)
+            num_written += 1
+
+    current_files = {entry["file"] for entry in entities.values()}
+    for entry in previous.values():
+        if entry["file"] not in current_files and os.path.exists(os.path.join(out_dir, entry["file"])):
+            os.remove(os.path.join(out_dir, entry["file"]))
+
+    manifest = {"version": MANIFEST_VERSION, "kind": kind, "entities": entities}
+    with open(os.path.join(out_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+    total_bytes = sum(entry["bytes"] for entry in entities.values())
+    logging.info(f"Wrote {num_written} of {len(entities)} {kind} shards ({total_bytes / 1024:.1f} KB in total) to {out_dir}.")
+    return manifest
+
+
+def load_event_shards(kind: str, names: Iterable[str], shards_dir: str = DEFAULT_SHARDS_DIR, verify: bool = False) -> Dict[str, Any]:
+    """Loads only the requested entities from their shards.
+
+    Args:
+        kind (str): "characters" or "supports".
+        names (Iterable[str]): The names of the characters or support cards to load.
+        shards_dir (str, optional): The root directory of the shards.
+        verify (bool, optional): Whether to check every shard against the size and hash in the manifest. Defaults to False.
+
+    Returns:
+        The requested entities by name, like the matching subset of the full JSON file.
+    """
+    entities = load_manifest(kind, shards_dir)["entities"]
+    out_dir = os.path.join(shards_dir, kind)
+
+    loaded = {}
+    for name in names:
+        entry = entities.get(name)
+        if entry is None:
+            raise KeyError(f"No {kind} shard for \"{name}\" in {out_dir}.")
+
+        with open(os.path.join(out_dir, entry["file"]), "rb") as f:
+            content = f.read()
+        if verify and (len(content) != entry["bytes"] or hashlib.sha256(content).hexdigest() != entry["sha256"]):
+            raise ValueError(f"The {kind} shard for \"{name}\" does not match the manifest.")
+        loaded[name] = json.loads(content)
+    return loaded
+
+
+def benchmark(shards_dir: str = DEFAULT_SHARDS_DIR, character: str = None, num_supports: int = 6, repeat: int = 20):
+    """Compares loading a deck from the shards against loading the whole files.
+
+    Args:
+        shards_dir (str, optional): The root directory of the shards.
+        character (str, optional): The trainee to load. Defaults to the first one.
+        num_supports (int, optional): How many support cards to load. Defaults to 6.
+        repeat (int, optional): How many times each load is timed. Defaults to 20.
+    """
+    character = character or next(iter(load_manifest("characters", shards_dir)["entities"]))
+    supports = list(load_manifest("supports", shards_dir)["entities"])[:num_supports]
+
+    def load_full():
+        result = {}
+        for kind, source_fp in SOURCES.items():
+            with open(source_fp, "r", encoding="utf-8") as f:
+                result[kind] = json.load(f)
+        return result
+
+    def load_deck():
+        return {
+            "characters": load_event_shards("characters", [character], shards_dir),
+            "supports": load_event_shards("supports", supports, shards_dir),
+        }
+
+    def measure(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        result = fn()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return 1000.0 * min(times), size / 1024
+
+    full_ms, full_kb = measure(load_full)
+    deck_ms, deck_kb = measure(load_deck)
+    logging.info(f"Whole files: {full_ms:.2f} ms, {full_kb:.0f} KB resident.")
+    logging.info(
+        f"Deck of {character} and {len(supports)} support cards from shards: {deck_ms:.2f} ms, {deck_kb:.0f} KB resident "
+        f"({full_ms / deck_ms:.1f}x faster, {full_kb / max(deck_kb, 1e-9):.1f}x less memory)."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Builds the per-entity training event shards and benchmarks loading them.")
+    parser.add_argument("--shards-dir", default=DEFAULT_SHARDS_DIR, help="The root directory of the shards.")
+    parser.add_argument("--character", default=None, help="The trainee to load in the benchmark. Defaults to the first one.")
+    parser.add_argument("--no-benchmark", action="store_true", help="Only build the shards.")
+    args = parser.parse_args()
+
+    for kind, source_fp in SOURCES.items():
+        with open(source_fp, "r", encoding="utf-8") as f:
+            write_event_shards(json.load(f), kind, args.shards_dir)
+
+    if not args.no_benchmark:
+        benchmark(args.shards_dir, args.character)
@@ -0,0 +1,87 @@
+"""Reusable working buffers for the image detection pipelines.
+
+Every OpenCV call that returns a new image allocates it, so a detector that runs
+on every frame of a recording allocates (and frees) several frame-sized arrays
+per frame. Besides the time spent in the allocator, that churn is what makes the
+latency of the frame loop jitter. `FrameBuffers` hands out named arrays that are
+only allocated when a name is first used or its shape changes, so a pipeline
+that passes them as the `dst` of its OpenCV calls allocates once per frame size.
+
+The arrays are overwritten by the next call that uses the same name, so a result
+that is kept across frames must be copied.
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class FrameBuffers:
+    """
+    Named arrays that are allocated once and reused while their shape stays the same.
+
+    Attributes:
+        allocations (int): How many arrays were allocated so far.
+        allocated_bytes (int): How many bytes were allocated so far.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def _allocate(self, name: str, shape: Tuple[int, ...], dtype) -> Tuple[np.ndarray, bool]:
+        buffer = self._buffers.get(name)
+        if buffer is not None and buffer.shape == shape and buffer.dtype == dtype:
+            return buffer, False
+
+        buffer = np.empty(shape, dtype)
+        self._buffers[name] = buffer
+        self.allocations += 1
+        self.allocated_bytes += buffer.nbytes
+        return buffer, True
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        Gets a buffer with undefined contents, e.g. for the `dst` of an OpenCV call.
+
+        Args:
+            name (str): Identifies the buffer. Buffers that are in use at the same time need different names.
+            shape (Tuple[int, ...]): The shape of the buffer.
+            dtype: The data type of the buffer. Defaults to uint8.
+
+        Returns:
+            np.ndarray: The buffer.
+        """
+        return self._allocate(name, tuple(shape), np.dtype(dtype))[0]
+
+    def zeros(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Gets a buffer like `get` and clears it."""
+        buffer = self.get(name, shape, dtype)
+        buffer.fill(0)
+        return buffer
+
+    def constant(self, name: str, shape: Tuple[int, ...], value, dtype=np.uint8) -> np.ndarray:
+        """
+        Gets a buffer that is filled with a value when it is allocated, e.g. a morphology kernel.
+
+        The buffer must not be written to, as it is not filled again.
+
+        Args:
+            name (str): Identifies the buffer.
+            shape (Tuple[int, ...]): The shape of the buffer.
+            value: The value to fill the buffer with.
+            dtype: The data type of the buffer. Defaults to uint8.
+
+        Returns:
+            np.ndarray: The buffer.
+        """
+        buffer, allocated = self._allocate(name, tuple(shape), np.dtype(dtype))
+        if allocated:
+            buffer.fill(value)
+        return buffer
+
+    @property
+    def nbytes(self) -> int:
+        """How many bytes the buffers currently hold."""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
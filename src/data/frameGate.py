@@ -0,0 +1,286 @@
+"""Frame-change gating for running the detectors on recordings.
+
+Bot recordings mostly show static menus, so consecutive frames are usually the
+same picture and re-running a detector on them only repeats its last result.
+`FrameChangeGate` decides whether a frame changed meaningfully from the last
+frame that was processed, cheapest check first:
+
+1. A frame that is pixel-identical to it is unchanged.
+2. Otherwise both frames are shrunk to a small grayscale thumbnail and compared. If no
+   thumbnail pixel moved by more than a few levels, the frame is unchanged. If
+   one moved a lot, it changed.
+3. Anything in between is escalated to a full-resolution comparison with the
+   metric of `CustomImageUtils.compareBitmapsSSIM`: the fraction of grayscale
+   pixels that are the same in both frames. Despite its name, that function does
+   not compute SSIM, and neither does `compare_frames_ssim` here, so that the
+   thresholds carry over.
+
+Frames are compared against the last frame that was let through rather than the
+previous frame, so a slow drift still counts as a change eventually.
+
+Run it with: `python frameGate.py --video recording.mp4` to measure the skip
+rate, the gate's latency and the detection time saved, and to count the reused
+results that differ from a full detection of their frame. Without `--video` a
+synthetic recording is made from the sample screenshots.
+"""
+
+import argparse
+import collections
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_SAMPLES = [
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample2.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample3.png"),
+]
+
+
+def compare_frames_ssim(frame1: np.ndarray, frame2: np.ndarray, pixel_tolerance: int = 0) -> float:
+    """Scores how similar two frames are like `CustomImageUtils.compareBitmapsSSIM`.
+
+    Args:
+        frame1 (np.ndarray): The first BGR or grayscale frame.
+        frame2 (np.ndarray): The frame to compare against.
+        pixel_tolerance (int, optional): How many gray levels a pixel may differ by and still count
+            as the same. 0 is the Kotlin behavior. Defaults to 0.
+
+    Returns:
+        The fraction of pixels that are the same in both frames, or 0.0 if their sizes differ.
+    """
+    if frame1.shape[:2] != frame2.shape[:2]:
+        return 0.0
+
+    gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY) if frame1.ndim == 3 else frame1
+    gray2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY) if frame2.ndim == 3 else frame2
+    diff = cv2.absdiff(gray1, gray2)
+    if pixel_tolerance > 0:
+        _, diff = cv2.threshold(diff, pixel_tolerance, 255, cv2.THRESH_BINARY)
+    return 1.0 - cv2.countNonZero(diff) / float(diff.size)
+
+
+class FrameChangeGate:
+    """
+    Decides which frames of a stream need to be processed again.
+
+    Args:
+        thumbnail_scale (float): How much the frames are shrunk for the first check. Defaults to 1/8.
+        unchanged_tolerance (int): The largest thumbnail difference in gray levels that
+            is still the same frame without escalating. Absorbs codec noise. Defaults to 2.
+        changed_threshold (int): The thumbnail difference in gray levels from which a frame
+            has changed without escalating. Defaults to 24.
+        pixel_tolerance (int): How many gray levels a pixel may differ by in the full-resolution
+            comparison and still count as the same. Defaults to 8.
+        similarity_threshold (float): The full-resolution similarity from which a frame is
+            unchanged. The default allows about 200 differing pixels in a 1080x1920 frame,
+            less than a single changed digit. Defaults to 0.9999.
+    """
+
+    def __init__(self, thumbnail_scale=0.125, unchanged_tolerance=2, changed_threshold=24, pixel_tolerance=8, similarity_threshold=0.9999):
+        self.thumbnail_scale = thumbnail_scale
+        self.unchanged_tolerance = unchanged_tolerance
+        self.changed_threshold = changed_threshold
+        self.pixel_tolerance = pixel_tolerance
+        self.similarity_threshold = similarity_threshold
+        self.reset()
+
+    def reset(self):
+        """Forgets the reference frame and the statistics."""
+        self._set_reference(None)
+        self.counts = {"frames": 0, "changed": 0, "unchanged": 0, "identical": 0, "escalated": 0}
+        # Bounded since the tuner loops over a recording for as long as its window is open.
+        self.check_seconds = collections.deque(maxlen=10000)
+
+    def has_changed(self, image: np.ndarray) -> bool:
+        """
+        Checks a frame against the last frame that changed.
+
+        A frame that changed becomes the new reference.
+
+        Args:
+            image (np.ndarray): The BGR frame.
+
+        Returns:
+            bool: Whether the frame needs to be processed. Always True for the first frame.
+        """
+        start = time.perf_counter()
+        changed = self._check(image)
+        self.check_seconds.append(time.perf_counter() - start)
+
+        self.counts["frames"] += 1
+        self.counts["changed" if changed else "unchanged"] += 1
+        return changed
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Summarizes the decisions so far.
+
+        Returns:
+            Dict[str, float]: The frame counts, the skip and escalation rates and the mean
+                and 95th percentile latency of the recent checks in milliseconds.
+        """
+        frames = self.counts["frames"]
+        check_ms = 1000.0 * np.array(self.check_seconds) if self.check_seconds else np.zeros(1)
+        return {
+            **self.counts,
+            "skip_rate": self.counts["unchanged"] / frames if frames else 0.0,
+            "escalation_rate": self.counts["escalated"] / frames if frames else 0.0,
+            "mean_check_ms": float(check_ms.mean()),
+            "p95_check_ms": float(np.percentile(check_ms, 95)),
+        }
+
+    def _set_reference(self, image, gray=None, thumbnail=None):
+        self._reference = image
+        # The gray frame and thumbnail of a reference are only made once a check needs them.
+        self._reference_gray = gray
+        self._reference_thumbnail = thumbnail
+
+    def _gray_and_thumbnail(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumbnail = cv2.resize(gray, None, fx=self.thumbnail_scale, fy=self.thumbnail_scale, interpolation=cv2.INTER_AREA)
+        return gray, thumbnail
+
+    def _check(self, image):
+        if self._reference is None or self._reference.shape != image.shape:
+            self._set_reference(image)
+            return True
+
+        # Recordings of static screens are mostly pixel-identical, which one pass over the frame rules out.
+        if cv2.norm(image, self._reference, cv2.NORM_INF) == 0:
+            self.counts["identical"] += 1
+            return False
+
+        gray, thumbnail = self._gray_and_thumbnail(image)
+        if self._reference_thumbnail is None:
+            self._reference_gray, self._reference_thumbnail = self._gray_and_thumbnail(self._reference)
+
+        max_diff = cv2.norm(thumbnail, self._reference_thumbnail, cv2.NORM_INF)
+        if max_diff <= self.unchanged_tolerance:
+            return False
+        if max_diff < self.changed_threshold:
+            self.counts["escalated"] += 1
+            if compare_frames_ssim(gray, self._reference_gray, self.pixel_tolerance) >= self.similarity_threshold:
+                return False
+
+        self._set_reference(image, gray, thumbnail)
+        return True
+
+
+def synthesize_frames(sample_fps: List[str] = DEFAULT_SAMPLES, hold_frames: int = 30, seed: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+    """Makes a synthetic recording that behaves like a bot recording of menus.
+
+    Every screenshot is held for `hold_frames` frames with codec-like noise on
+    some frames, and halfway through each hold a small number on it changes.
+
+    Args:
+        sample_fps (List[str], optional): The screenshots to show in turn.
+        hold_frames (int, optional): How many frames each screenshot is shown for. Defaults to 30.
+        seed (int, optional): The random seed of the noise. Defaults to 0.
+
+    Returns:
+        The frame indices and BGR frames.
+    """
+    rng = np.random.default_rng(seed)
+    index = 0
+    for sample_fp in sample_fps:
+        image = cv2.imread(sample_fp)
+        if image is None:
+            raise FileNotFoundError(f"Failed to load image: {sample_fp}")
+
+        for i in range(hold_frames):
+            frame = image.copy()
+            cv2.putText(frame, "+12" if i >= hold_frames // 2 else "+8", (60, 120), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (40, 40, 40), 3)
+            if i % 3 == 1:
+                # Re-encoded frames of a static screen differ by a gray level here and there.
+                noise = rng.integers(-1, 2, size=frame.shape, dtype=np.int16)
+                frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+            yield index, frame
+            index += 1
+
+
+def benchmark(frames: Iterator[Tuple[int, np.ndarray]], detectors: List[str], gate: FrameChangeGate = None) -> Dict[str, Any]:
+    """Runs the detectors on every frame with and without the gate.
+
+    Args:
+        frames (Iterator[Tuple[int, np.ndarray]]): The frame indices and BGR frames.
+        detectors (List[str]): The `imageDetection.py` detectors to run.
+        gate (FrameChangeGate, optional): The gate to measure. Defaults to the default gate.
+
+    Returns:
+        The gate statistics, the detection time per frame with and without the gate,
+        how many reused results differ from a full detection and, for comparison, how
+        often a full detection differs from the one of the previous frame.
+    """
+    # Imported here since imageDetection imports this module.
+    from imageDetection import run_detector
+
+    gate = gate or FrameChangeGate()
+    full_seconds = gated_seconds = 0.0
+    mismatches = full_changes = 0
+    num_frames = 0
+    previous = previous_full = None
+    for _, frame in frames:
+        num_frames += 1
+        start = time.perf_counter()
+        full = {detector: run_detector(detector, frame) for detector in detectors}
+        full_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if gate.has_changed(frame):
+            previous = {detector: run_detector(detector, frame) for detector in detectors}
+        gated_seconds += time.perf_counter() - start
+
+        mismatches += sum(previous[detector] != full[detector] for detector in detectors)
+        if previous_full is not None:
+            full_changes += sum(previous_full[detector] != full[detector] for detector in detectors)
+        previous_full = full
+
+    return {
+        "gate": gate.stats(),
+        "full_ms_per_frame": 1000.0 * full_seconds / max(num_frames, 1),
+        "gated_ms_per_frame": 1000.0 * gated_seconds / max(num_frames, 1),
+        "mismatches": mismatches,
+        "full_changes": full_changes,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    # Imported here since imageDetection imports this module.
+    from imageDetection import DETECTOR_DEFAULTS
+    from videoSource import VideoSource
+
+    parser = argparse.ArgumentParser(description="Measures the frame-change gate on a recording.")
+    parser.add_argument("--video", default=None, help="The recording to run on. Defaults to a synthetic one made from the sample screenshots.")
+    parser.add_argument("--stride", type=int, default=1, help="Only check every Nth frame of the recording.")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTOR_DEFAULTS.keys()), default=None, help="The detectors to run. Defaults to all of them.")
+    parser.add_argument("--pixel-tolerance", type=int, default=8, help="Gray levels a pixel may differ by in the full-resolution comparison.")
+    parser.add_argument("--similarity-threshold", type=float, default=0.9999, help="Full-resolution similarity from which a frame is unchanged.")
+    args = parser.parse_args()
+
+    gate = FrameChangeGate(pixel_tolerance=args.pixel_tolerance, similarity_threshold=args.similarity_threshold)
+    detectors = args.detectors or list(DETECTOR_DEFAULTS.keys())
+    if args.video:
+        with VideoSource(args.video, stride=args.stride) as source:
+            result = benchmark(((index, frame) for index, _, frame in source), detectors, gate)
+    else:
+        result = benchmark(synthesize_frames(), detectors, gate)
+
+    stats = result["gate"]
+    logging.info(
+        f"{stats['frames']} frames: {stats['unchanged']} skipped ({100.0 * stats['skip_rate']:.1f}%, {stats['identical']} pixel-identical), "
+        f"{stats['escalated']} escalated to the full-resolution comparison ({100.0 * stats['escalation_rate']:.1f}%)."
+    )
+    logging.info(f"Gate latency: mean {stats['mean_check_ms']:.2f} ms | p95 {stats['p95_check_ms']:.2f} ms per frame.")
+    logging.info(
+        f"Detection per frame: {result['full_ms_per_frame']:.1f} ms every frame -> {result['gated_ms_per_frame']:.1f} ms gated "
+        f"({result['full_ms_per_frame'] / max(result['gated_ms_per_frame'], 1e-9):.1f}x). "
+        f"{result['mismatches']} reused result(s) differ from a full detection of their frame. "
+        f"Without the gate, the results changed {result['full_changes']} time(s) from one frame to the next."
+    )
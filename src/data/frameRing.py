@@ -0,0 +1,481 @@
+"""Shared-memory frame ring buffer for running several detectors on the same frames.
+
+Running `detectRectangles`, `detectRectanglesGeneric` and `detectScrollBar` in
+separate processes normally means decoding every frame once per process, or
+pickling it through a pipe once per process. `FrameRing` instead keeps a fixed
+number of frame slots in one `multiprocessing.shared_memory` block. One writer
+decodes each frame once straight into a slot (`cv2.VideoCapture.read` decodes
+into the slot's NumPy view), and every reader gets a zero-copy NumPy view of
+the same slot. The cost of fanning a frame out therefore does not grow with the
+number of readers.
+
+Writer and readers synchronize through sequence numbers in the shared block:
+the writer publishes frame `n` by bumping the published count after filling
+slot `n % slots`, every reader records the next sequence number it wants once
+it is done with a frame, and the writer only reuses a slot once every reader
+has moved past it. Slow readers therefore hold the writer back instead of
+losing frames, and memory stays at `slots` frames.
+
+Run it with: `python frameRing.py --consumers 1 2 4 8` to compare the fan-out
+cost of the ring with one pickling queue per reader, or
+`python frameRing.py --video recording.mp4` to run every detector on a
+recording through the ring.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from imageDetection import DETECTOR_DEFAULTS, DetectorPipeline
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(__file__), "imageDetectionSample.png")
+
+# How long a blocked writer or reader sleeps between checks of the sequence numbers.
+POLL_INTERVAL_SEC = 0.0002
+# How often a blocked writer or a waiting parent checks that the readers are still alive.
+STALL_CHECK_SEC = 1.0
+
+# The fields at the start of the shared block before the per-reader sequence numbers.
+_PUBLISHED = 0
+_FINISHED = 1
+_HEADER_FIELDS = 2
+# The sequence number of a reader that left the ring, so that the writer no longer waits for it.
+_DETACHED = np.iinfo(np.int64).max
+
+
+class FrameRing:
+    """
+    A ring of frame slots in shared memory for one writer and several readers.
+
+    The process that creates the ring owns it and must `unlink()` it when done.
+    Other processes attach to it by passing its `spec` to the constructor.
+
+    Args:
+        shape (Tuple[int, ...]): The shape of every frame, e.g. (1920, 1080, 3).
+        slots (int): How many frames fit in the ring. Defaults to 8.
+        consumers (int): How many readers must see every frame. Defaults to 1.
+        name (str): The name of an existing ring to attach to. Creates a new ring if not specified.
+    """
+
+    def __init__(self, shape, slots=8, consumers=1, name=None):
+        if slots < 1 or consumers < 1:
+            raise ValueError(f"A ring needs at least one slot and one consumer. Got: {slots} slot(s) and {consumers} consumer(s).")
+
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.consumers = consumers
+        self.owner = name is None
+
+        header_size = 8 * (_HEADER_FIELDS + consumers)
+        meta_size = 8 * 3 * slots
+        frame_size = int(np.prod(self.shape))
+        size = header_size + meta_size + slots * frame_size
+        self._shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+
+        buffer = self._shm.buf
+        self._header = np.ndarray((_HEADER_FIELDS + consumers,), dtype=np.int64, buffer=buffer)
+        # Per slot: its sequence number, the frame index and the timestamp in milliseconds.
+        self._slot_seqs = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=header_size)
+        self._slot_indices = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=header_size + 8 * slots)
+        self._slot_timestamps = np.ndarray((slots,), dtype=np.float64, buffer=buffer, offset=header_size + 16 * slots)
+        self._frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=buffer, offset=header_size + meta_size)
+
+        if self.owner:
+            self._header[:] = 0
+            self._slot_seqs[:] = -1
+
+    @property
+    def spec(self) -> Dict[str, Any]:
+        """The arguments that attach another process to this ring."""
+        return {"shape": self.shape, "slots": self.slots, "consumers": self.consumers, "name": self._shm.name}
+
+    def acquire(self, timeout: float = None) -> Tuple[int, np.ndarray]:
+        """
+        Waits for the next slot to be free for the writer.
+
+        Fill the returned view and then call `publish()`.
+
+        Args:
+            timeout (float): How long to wait in seconds. Waits forever if not specified.
+
+        Returns:
+            Tuple[int, np.ndarray]: The sequence number of the frame and the view of its slot.
+        """
+        seq = int(self._header[_PUBLISHED])
+        # The slot is free once every reader has moved past the frame that was in it.
+        self._wait(lambda: self._header[_HEADER_FIELDS:].min() > seq - self.slots, timeout)
+        return seq, self._frames[seq % self.slots]
+
+    def publish(self, seq: int, frame_index: int = 0, timestamp_ms: float = 0.0):
+        """
+        Makes the frame written into an acquired slot visible to the readers.
+
+        Args:
+            seq (int): The sequence number returned by `acquire()`.
+            frame_index (int): The index of the frame in its source.
+            timestamp_ms (float): The timestamp of the frame in milliseconds.
+        """
+        slot = seq % self.slots
+        self._slot_indices[slot] = frame_index
+        self._slot_timestamps[slot] = timestamp_ms
+        self._slot_seqs[slot] = seq
+        # Bumped last so that a reader never sees a slot before it is complete.
+        self._header[_PUBLISHED] = seq + 1
+
+    def write(self, frame: np.ndarray, frame_index: int = 0, timestamp_ms: float = 0.0, timeout: float = None) -> int:
+        """
+        Copies a frame into the ring and publishes it.
+
+        Args:
+            frame (np.ndarray): The frame. Must have the ring's shape.
+            frame_index (int): The index of the frame in its source.
+            timestamp_ms (float): The timestamp of the frame in milliseconds.
+            timeout (float): How long to wait for a free slot in seconds. Waits forever if not specified.
+
+        Returns:
+            int: The sequence number of the frame.
+        """
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the ring's shape {self.shape}.")
+        seq, slot = self.acquire(timeout)
+        np.copyto(slot, frame)
+        self.publish(seq, frame_index, timestamp_ms)
+        return seq
+
+    def finish(self):
+        """Tells the readers that no more frames will be published."""
+        self._header[_FINISHED] = 1
+
+    def read(self, consumer: int, timeout: float = None) -> Optional[Tuple[int, int, float, np.ndarray]]:
+        """
+        Waits for the next frame of a reader.
+
+        The frame is a view into the ring. It stays valid until the reader calls `release()`.
+
+        Args:
+            consumer (int): The index of the reader.
+            timeout (float): How long to wait in seconds. Waits forever if not specified.
+
+        Returns:
+            The sequence number, frame index, timestamp in milliseconds and frame, or
+                None once the writer finished and every frame was read.
+        """
+        seq = int(self._header[_HEADER_FIELDS + consumer])
+        self._wait(lambda: self._header[_PUBLISHED] > seq or self._header[_FINISHED], timeout)
+        if self._header[_PUBLISHED] <= seq:
+            return None
+
+        slot = seq % self.slots
+        if self._slot_seqs[slot] != seq:
+            raise RuntimeError(f"Slot {slot} holds frame {self._slot_seqs[slot]} instead of frame {seq}.")
+        return seq, int(self._slot_indices[slot]), float(self._slot_timestamps[slot]), self._frames[slot]
+
+    def release(self, consumer: int):
+        """Tells the writer that a reader is done with its current frame."""
+        self._header[_HEADER_FIELDS + consumer] += 1
+
+    def detach(self, consumer: int):
+        """Tells the writer that a reader will not read any more frames, so that it stops waiting for it."""
+        self._header[_HEADER_FIELDS + consumer] = _DETACHED
+
+    def is_detached(self, consumer: int) -> bool:
+        """Whether a reader left the ring."""
+        return bool(self._header[_HEADER_FIELDS + consumer] == _DETACHED)
+
+    def close(self):
+        """Detaches this process from the ring."""
+        # The views must go before the shared memory can be closed.
+        self._header = self._slot_seqs = self._slot_indices = self._slot_timestamps = self._frames = None
+        self._shm.close()
+
+    def unlink(self):
+        """Detaches from and frees the ring. Only the owner should call this."""
+        self.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.owner:
+            self.unlink()
+        else:
+            self.close()
+
+    @staticmethod
+    def _wait(condition, timeout):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not condition():
+            if deadline is not None and time.perf_counter() > deadline:
+                raise TimeoutError("Timed out waiting on the frame ring.")
+            time.sleep(POLL_INTERVAL_SEC)
+
+
+def decode_into_ring(ring: FrameRing, fp: str, stride: int = 1, max_frames: int = None, on_stall: Callable[[], None] = None) -> int:
+    """
+    Decodes a video straight into the slots of a ring and finishes the ring.
+
+    Args:
+        ring (FrameRing): The ring to write to.
+        fp (str): The filepath of the video.
+        stride (int): Only every `stride`-th frame is decoded. Defaults to 1.
+        max_frames (int): Stop after this many frames. Defaults to the whole video.
+        on_stall (Callable[[], None]): Called every `STALL_CHECK_SEC` while no slot is free,
+            e.g. to raise if a reader died. Waits forever if not specified.
+
+    Returns:
+        int: How many frames were published.
+    """
+    cap = cv2.VideoCapture(fp)
+    if not cap.isOpened():
+        ring.finish()
+        raise FileNotFoundError(f"Failed to open video: {fp}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = published = 0
+    try:
+        while max_frames is None or published < max_frames:
+            while True:
+                try:
+                    seq, slot = ring.acquire(None if on_stall is None else STALL_CHECK_SEC)
+                    break
+                except TimeoutError:
+                    on_stall()
+            ret, _ = cap.read(slot)
+            if not ret:
+                break
+            ring.publish(seq, index, index * 1000.0 / fps)
+            published += 1
+            index += 1
+
+            # Skip over the frames in between without decoding them.
+            for _ in range(stride - 1):
+                if not cap.grab():
+                    break
+                index += 1
+    finally:
+        cap.release()
+        ring.finish()
+    return published
+
+
+def _detector_worker(spec: Dict[str, Any], consumer: int, detector: str, params: Dict[str, Any], results):
+    """Runs one detector on every frame of a ring and sends its rectangles back, or the error it failed with."""
+    ring = FrameRing(**spec)
+    error = None
+    try:
+        pipeline = DetectorPipeline(detector, **params)
+        while True:
+            item = ring.read(consumer)
+            if item is None:
+                break
+            _, frame_index, timestamp_ms, frame = item
+            start = time.perf_counter()
+            rects = pipeline.run(frame)
+            elapsed_ms = 1000.0 * (time.perf_counter() - start)
+            ring.release(consumer)
+            results.put((detector, frame_index, timestamp_ms, rects, elapsed_ms))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Detach first so that the writer does not wait for this worker once the ring is full.
+        ring.detach(consumer)
+        results.put((detector, None, None, None, error))
+        ring.close()
+
+
+def run_detectors(fp: str, detectors: List[str] = None, params: Dict[str, Dict[str, Any]] = None, stride: int = 1, slots: int = 8) -> Dict[int, Dict[str, Any]]:
+    """
+    Runs several detectors on a video, each in its own process, decoding every frame only once.
+
+    Args:
+        fp (str): The filepath of the video.
+        detectors (List[str]): The detectors to run. Defaults to all of them.
+        params (Dict[str, Dict[str, Any]]): Parameter overrides per detector.
+        stride (int): Only every `stride`-th frame is processed. Defaults to 1.
+        slots (int): How many frames the ring holds. Defaults to 8.
+
+    Returns:
+        Dict[int, Dict[str, Any]]: For every frame index, its timestamp and the
+            rectangles and time of every detector.
+
+    Raises:
+        RuntimeError: If a detector failed or its process died.
+    """
+    detectors = detectors or list(DETECTOR_DEFAULTS.keys())
+    params = params or {}
+
+    cap = cv2.VideoCapture(fp)
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
+    if shape[0] <= 0 or shape[1] <= 0:
+        raise FileNotFoundError(f"Failed to open video: {fp}")
+
+    frames = {}
+    results = multiprocessing.Queue()
+    with FrameRing(shape, slots, len(detectors)) as ring:
+        workers = [
+            multiprocessing.Process(target=_detector_worker, args=(ring.spec, consumer, detector, params.get(detector, {}), results), daemon=True)
+            for consumer, detector in enumerate(detectors)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def check_workers():
+            # A worker that exits on its own detaches first, so only one that was killed is still attached.
+            for consumer, worker in enumerate(workers):
+                if not worker.is_alive() and not ring.is_detached(consumer):
+                    raise RuntimeError(f"The {detectors[consumer]} worker died with exit code {worker.exitcode}.")
+
+        try:
+            decode_into_ring(ring, fp, stride, on_stall=check_workers)
+            remaining = len(detectors)
+            while remaining:
+                try:
+                    message = results.get(timeout=STALL_CHECK_SEC)
+                except queue.Empty:
+                    check_workers()
+                    continue
+                detector, frame_index, timestamp_ms, rects, elapsed_ms = message
+                if frame_index is None:
+                    # The message a worker ends with carries its error, if any, instead of a time.
+                    error = message[4]
+                    if error is not None:
+                        raise RuntimeError(f"The {detector} worker failed: {error}")
+                    remaining -= 1
+                    continue
+                frame = frames.setdefault(frame_index, {"timestamp_ms": timestamp_ms, "detections": {}})
+                frame["detections"][detector] = {"rects": rects, "ms": elapsed_ms}
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+    return frames
+
+
+def _ring_consumer(spec: Dict[str, Any], consumer: int, checksums):
+    ring = FrameRing(**spec)
+    total = 0
+    while True:
+        item = ring.read(consumer)
+        if item is None:
+            break
+        # Touch the frame without doing real work so that only the fan-out is measured.
+        total += int(item[3][::64, ::64].sum())
+        ring.release(consumer)
+    checksums.put(total)
+    ring.close()
+
+
+def _queue_consumer(frames, checksums):
+    total = 0
+    while True:
+        frame = frames.get()
+        if frame is None:
+            break
+        total += int(frame[::64, ::64].sum())
+    checksums.put(total)
+
+
+def benchmark_fanout(frame: np.ndarray, num_frames: int, num_consumers: int, slots: int = 8) -> Dict[str, float]:
+    """
+    Fans the same frame out to readers that do no work, through the ring and through one queue per reader.
+
+    Args:
+        frame (np.ndarray): The frame to send.
+        num_frames (int): How many times it is sent.
+        num_consumers (int): How many readers receive every frame.
+        slots (int): How many frames the ring and each queue hold. Defaults to 8.
+
+    Returns:
+        Dict[str, float]: The writer's time per frame and the wall time per frame until
+            every reader got every frame, in milliseconds, for both approaches.
+    """
+    expected = int(frame[::64, ::64].sum()) * num_frames
+    checksums = multiprocessing.Queue()
+    result = {}
+
+    with FrameRing(frame.shape, slots, num_consumers) as ring:
+        readers = [multiprocessing.Process(target=_ring_consumer, args=(ring.spec, consumer, checksums)) for consumer in range(num_consumers)]
+        for reader in readers:
+            reader.start()
+        start = time.perf_counter()
+        write_seconds = 0.0
+        for i in range(num_frames):
+            write_start = time.perf_counter()
+            ring.write(frame, i)
+            write_seconds += time.perf_counter() - write_start
+        ring.finish()
+        totals = [checksums.get() for _ in readers]
+        result["ring_write_ms"] = 1000.0 * write_seconds / num_frames
+        result["ring_total_ms"] = 1000.0 * (time.perf_counter() - start) / num_frames
+        for reader in readers:
+            reader.join()
+    if any(total != expected for total in totals):
+        raise RuntimeError("A ring reader saw a corrupted frame.")
+
+    queues = [multiprocessing.Queue(maxsize=slots) for _ in range(num_consumers)]
+    readers = [multiprocessing.Process(target=_queue_consumer, args=(frames, checksums)) for frames in queues]
+    for reader in readers:
+        reader.start()
+    start = time.perf_counter()
+    write_seconds = 0.0
+    for _ in range(num_frames):
+        write_start = time.perf_counter()
+        for frames in queues:
+            frames.put(frame)
+        write_seconds += time.perf_counter() - write_start
+    for frames in queues:
+        frames.put(None)
+    totals = [checksums.get() for _ in readers]
+    result["queue_write_ms"] = 1000.0 * write_seconds / num_frames
+    result["queue_total_ms"] = 1000.0 * (time.perf_counter() - start) / num_frames
+    for reader in readers:
+        reader.join()
+    if any(total != expected for total in totals):
+        raise RuntimeError("A queue reader saw a corrupted frame.")
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks the shared-memory frame ring or runs the detectors on a recording through it.")
+    parser.add_argument("--consumers", nargs="+", type=int, default=[1, 2, 4, 8], help="The numbers of readers to benchmark the fan-out with.")
+    parser.add_argument("--frames", type=int, default=200, help="How many frames to fan out per benchmark.")
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE, help="The screenshot to fan out.")
+    parser.add_argument("--video", default=None, help="Run the detectors on this recording through the ring instead of benchmarking.")
+    parser.add_argument("--detectors", nargs="+", choices=list(DETECTOR_DEFAULTS.keys()), default=None, help="The detectors to run on the recording.")
+    parser.add_argument("--stride", type=int, default=1, help="Only process every Nth frame of the recording.")
+    parser.add_argument("--slots", type=int, default=8, help="How many frames the ring holds.")
+    args = parser.parse_args()
+
+    if args.video:
+        start = time.perf_counter()
+        frames = run_detectors(args.video, args.detectors, stride=args.stride, slots=args.slots)
+        elapsed = time.perf_counter() - start
+        logging.info(f"Ran the detectors on {len(frames)} frames in {elapsed:.1f} seconds ({len(frames) / elapsed:.1f} frames/s).")
+        for detector in args.detectors or DETECTOR_DEFAULTS.keys():
+            times = [frame["detections"][detector]["ms"] for frame in frames.values() if detector in frame["detections"]]
+            logging.info(f"    {detector}: {np.mean(times):.1f} ms per frame.")
+    else:
+        image = cv2.imread(args.sample)
+        if image is None:
+            raise FileNotFoundError(f"Failed to load image: {args.sample}")
+
+        for num_consumers in args.consumers:
+            result = benchmark_fanout(image, args.frames, num_consumers, args.slots)
+            logging.info(
+                f"{num_consumers} reader(s): ring {result['ring_write_ms']:.2f} ms to write | {result['ring_total_ms']:.2f} ms until read per frame, "
+                f"queues {result['queue_write_ms']:.2f} ms to write | {result['queue_total_ms']:.2f} ms until read per frame."
+            )
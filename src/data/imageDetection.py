@@ -1,30 +1,125 @@
 import os
+import threading
 
 import cv2
 import numpy as np
 import tkinter as tk
 
-root = tk.Tk()
-SCREEN_WIDTH = root.winfo_screenwidth()
-SCREEN_HEIGHT = root.winfo_screenheight()
+from frameBuffers import FrameBuffers
+from frameGate import FrameChangeGate
+from rectMorphology import morphology_rect
+from videoSource import VideoSource
+
+# Queried lazily by `get_screen_size` so the pipelines can run without a display.
+_screen_size = None
+
+# How long the tuner windows wait for input each iteration. Keeps the GUI
+# thread idle while nothing changes instead of spinning every millisecond.
+GUI_WAIT_MS = 15
+
+# Hex color ranges of the scrollbar thumb and bar.
+SCROLLBAR_COLOR_BOUNDARIES = [
+    ("#787388", "#7d788e"),
+    ("#d3d1db", "#d3d1db"),
+]
+
+# The parameters each detector was tuned with on the sample screenshots.
+DETECTOR_DEFAULTS = {
+    "detectRectangles": {
+        "min_area": 200 * 900,
+        "max_area": 300 * 1050,
+        "blur_size": 5,
+        "epsilon_scalar": 0.02,
+        "canny_lower_threshold": 30,
+        "canny_upper_threshold": 50,
+        "use_adaptive_threshold": True,
+        "adaptive_threshold_block_size": 11,
+        "adaptive_threshold_constant": 2.0,
+    },
+    "detectRectanglesGeneric": {
+        "min_area": 0,
+        "max_area": 1e7,
+        "blur_size": 7,
+        "lo_diff_val": 1,
+        "up_diff_val": 1,
+        "kernel_size": 100,
+        "crop_x": 10,
+        "crop_y": 700,
+        "crop_w": 1055,
+        "crop_h": 840,
+    },
+    "detectScrollBar": {
+        "min_area": 0,
+        "max_area": 1e7,
+        "kernel_size": 100,
+        "crop_x": 10,
+        "crop_y": 700,
+        "crop_w": 1055,
+        "crop_h": 840,
+    },
+}
+
+# The (width, height) of the screenshots `DETECTOR_DEFAULTS` were tuned on.
+REFERENCE_SCREEN_SIZE = (1080, 1920)
+
+# How the detector parameters that depend on the resolution scale with it. In
+# relative form, "x" and "y" values are fractions of the screen width and height,
+# "kernel" sizes are fractions of the screen width and "area" values are fractions
+# of the screen area. Every other parameter is the same at any resolution. That
+# includes the adaptive threshold block size: the thin borders it picks out stay
+# a few pixels wide at every working width, and scaling it down loses them.
+PARAMETER_SCALING = {
+    "min_area": "area",
+    "max_area": "area",
+    "blur_size": "kernel",
+    "kernel_size": "kernel",
+    "crop_x": "x",
+    "crop_w": "x",
+    "crop_y": "y",
+    "crop_h": "y",
+}
+
+# The working width of the scale-normalized mode. Half the reference width keeps
+# the tuned kernels large enough to behave the same.
+DEFAULT_TARGET_WIDTH = 540
+
+
+def get_screen_size():
+    """
+    Gets the size of the screen the tuner windows are shown on.
+
+    Returns:
+        tuple: The (width, height) of the screen.
+    """
+    global _screen_size
+    if _screen_size is None:
+        root = tk.Tk()
+        _screen_size = (root.winfo_screenwidth(), root.winfo_screenheight())
+        root.destroy()
+    return _screen_size
 
 
 def get_fullscreen_image_keep_aspect(
     img: cv2.typing.MatLike,
-    screen_width: int = SCREEN_WIDTH,
-    screen_height: int = SCREEN_HEIGHT,
+    screen_width: int = None,
+    screen_height: int = None,
+    buffers: FrameBuffers = None,
 ) -> cv2.typing.MatLike:
     """
     Resizes an image to fill the screen while maintaining aspect ratio.
 
     Args:
         img: The image to display.
-        screen_width: The width of the screen.
-        screen_height: The height of the screen.
+        screen_width: The width of the screen. Defaults to the actual screen width.
+        screen_height: The height of the screen. Defaults to the actual screen height.
+        buffers: Buffers to resize and pad into. New ones are allocated if not specified.
 
     Returns:
         cv2.typing.MatLike: The resized image.
     """
+    if screen_width is None or screen_height is None:
+        screen_width, screen_height = get_screen_size()
+    buffers = buffers if buffers is not None else FrameBuffers()
 
     img_height, img_width = img.shape[:2]
 
@@ -42,7 +137,12 @@ def get_fullscreen_image_keep_aspect(
 
     # 3. Resize the image.
     # INTER_AREA is good for shrinking; INTER_CUBIC or INTER_LINEAR for enlarging.
-    resized_img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    resized_img = cv2.resize(
+        img,
+        (new_width, new_height),
+        dst=buffers.get("display_resized", (new_height, new_width) + img.shape[2:]),
+        interpolation=cv2.INTER_AREA,
+    )
 
     # 4. (Optional) Pad the image with black borders to fill the whole screen.
     # Calculate padding for top/bottom or left/right
@@ -51,7 +151,16 @@ def get_fullscreen_image_keep_aspect(
     left_pad = (screen_width - new_width) // 2
     right_pad = screen_width - new_width - left_pad
 
-    padded_img = cv2.copyMakeBorder(resized_img, top_pad, bottom_pad, left_pad, right_pad, cv2.BORDER_CONSTANT, value=[0, 0, 0])
+    padded_img = cv2.copyMakeBorder(
+        resized_img,
+        top_pad,
+        bottom_pad,
+        left_pad,
+        right_pad,
+        cv2.BORDER_CONSTANT,
+        dst=buffers.get("display_padded", (screen_height, screen_width) + img.shape[2:]),
+        value=[0, 0, 0],
+    )
 
     return padded_img
 
@@ -61,6 +170,568 @@ def nothing(x):
     pass
 
 
+class StageCache:
+    """Caches the output of each pipeline stage keyed on its inputs.
+
+    Every stage is stored under its name together with the key it was computed
+    for. A stage's key extends the key of the stage it depends on, so moving a
+    slider only recomputes the stages downstream of that slider.
+
+    The stages write their outputs into the `buffers` of the cache, so a cache
+    that is reused across frames of the same size allocates them only once. A
+    stage output is overwritten when the stage is computed again, so copy it to
+    keep it across frames.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self.buffers = FrameBuffers()
+
+    def get(self, stage, key, compute):
+        """
+        Returns the cached output of a stage or computes it.
+
+        Args:
+            stage (str): The name of the stage.
+            key (tuple): Everything the stage output depends on.
+            compute (Callable[[], Any]): Computes the stage output on a cache miss.
+
+        Returns:
+            The output of the stage.
+        """
+        cached = self._stages.get(stage)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        value = compute()
+        self._stages[stage] = (key, value)
+        return value
+
+
+class ImageSource:
+    """
+    Reads frames from an image or a looping video.
+
+    Images are decoded once and the same frame is returned on every read.
+    Videos are decoded ahead of time on a background thread by `VideoSource`.
+    Video frames that did not change meaningfully from the last one returned are
+    dropped by a `FrameChangeGate`, so the last frame and its ID are returned again
+    and every cached stage is reused.
+
+    Args:
+        fp (str): The filepath of the image (or video) to load.
+        frame_stride (int): Only every Nth video frame is decoded. Defaults to 1.
+        start_sec (float): Where the video starts looping from in seconds.
+        end_sec (float): Where the video loops back in seconds.
+        skip_unchanged_frames (bool): Whether to gate video frames on change. Defaults to True.
+    """
+
+    def __init__(self, fp, frame_stride=1, start_sec=None, end_sec=None, skip_unchanged_frames=True):
+        self.fp = fp
+        self.is_video = os.path.splitext(fp)[-1] == ".mp4"
+        self.frame_id = 0
+        self.video = None
+        self.image = None
+        self.gate = FrameChangeGate() if self.is_video and skip_unchanged_frames else None
+
+        if self.is_video:
+            self.video = VideoSource(fp, stride=frame_stride, start_sec=start_sec, end_sec=end_sec, loop=True)
+        else:
+            self.image = cv2.imread(fp)
+            if self.image is None:
+                raise FileNotFoundError(f"Failed to load image: {fp}")
+
+    def read(self):
+        """
+        Reads the next frame.
+
+        Returns:
+            tuple: The ID of the frame and the frame itself. The ID only changes
+                when the frame does.
+        """
+        if self.is_video:
+            frame = self.video.read()
+            if frame is None:
+                raise ValueError(f"No frames could be decoded from {self.fp}.")
+            frame_id, _, image = frame
+            if self.gate is None or self.gate.has_changed(image):
+                self.frame_id, self.image = frame_id, image
+        return self.frame_id, self.image
+
+    def release(self):
+        """Stops decoding the video if there is one."""
+        if self.video is not None:
+            self.video.stop()
+
+
+class TunerWorker:
+    """
+    Runs a processing function on a background thread.
+
+    Only the most recently submitted job is kept so the worker never falls
+    behind the sliders, and the GUI thread only has to show finished results.
+
+    Args:
+        process (Callable): The function to run for each submitted job.
+    """
+
+    def __init__(self, process):
+        self.process = process
+        self._condition = threading.Condition()
+        self._pending = None
+        self._result = None
+        self._error = None
+        self._busy = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, *args):
+        """Queues a job, replacing any job that has not started yet."""
+        with self._condition:
+            self._pending = args
+            self._condition.notify()
+
+    def is_idle(self):
+        """Whether the worker has nothing queued, running or finished but not taken yet."""
+        with self._condition:
+            return self._pending is None and not self._busy and self._result is None
+
+    def take_result(self):
+        """
+        Takes the newest finished result.
+
+        Returns:
+            The result or None if nothing finished since the last call.
+        """
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            result, self._result = self._result, None
+            return result
+
+    def stop(self):
+        """Stops the worker thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                args, self._pending = self._pending, None
+                self._busy = True
+
+            try:
+                result = self.process(*args)
+            except Exception as exc:
+                with self._condition:
+                    self._error = exc
+                    self._busy = False
+                return
+
+            with self._condition:
+                self._result = result
+                self._busy = False
+
+
+def run_tuner(fp, window_name, create_trackbars, read_params, process, frame_stride=1, start_sec=None, end_sec=None):
+    """
+    Runs the interactive tuning loop shared by the detectors.
+
+    The source is decoded once (or read frame by frame for videos) and handed to
+    `process` on a background worker along with the current slider values. A new
+    job is only submitted when a slider moved or a new video frame is needed, so
+    the window sits idle otherwise.
+
+    Args:
+        fp (str): The filepath of the image (or video) to load.
+        window_name (str): The name of the cv2 window.
+        create_trackbars (Callable[[str], None]): Creates the sliders on the window.
+        read_params (Callable[[str], tuple]): Reads the current slider values.
+        process (Callable[[int, cv2.typing.MatLike, tuple, tuple], cv2.typing.MatLike]):
+            Returns the image to display for a frame ID, frame, slider values and screen size.
+        frame_stride (int): Only every Nth video frame is processed.
+        start_sec (float): Where the video starts looping from in seconds.
+        end_sec (float): Where the video loops back in seconds.
+    """
+    source = ImageSource(fp, frame_stride, start_sec, end_sec)
+
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    # Set the window to fullscreen mode.
+    cv2.setWindowProperty(window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+    create_trackbars(window_name)
+
+    # Tk must only be used on the main thread, so the screen size is queried here
+    # and handed to the worker instead of being queried while drawing.
+    screen_size = get_screen_size()
+    worker = TunerWorker(process)
+    last_params = None
+    try:
+        while True:
+            # Show the finished result before submitting the next job, since the
+            # worker reuses the buffer the result was drawn into. A result that
+            # finishes after this keeps the worker from being idle until it is shown.
+            res = worker.take_result()
+            if res is not None:
+                cv2.imshow(window_name, res)
+
+            params = read_params(window_name)
+            if worker.is_idle() and (source.is_video or params != last_params):
+                frame_id, image = source.read()
+                worker.submit(frame_id, image, params, screen_size)
+                last_params = params
+
+            if cv2.waitKey(GUI_WAIT_MS) & 0xFF == ord("q"):
+                break
+    finally:
+        worker.stop()
+        source.release()
+        cv2.destroyAllWindows()
+
+
+def sanitize_odd_size(size, minimum=1):
+    """
+    Clamps a kernel size to a minimum and bumps it to the next odd number.
+
+    Args:
+        size (int): The kernel size read from a slider.
+        minimum (int): The smallest allowed size.
+
+    Returns:
+        int: The sanitized kernel size.
+    """
+    size = max(minimum, size)
+    if size % 2 == 0:
+        size += 1
+    return size
+
+
+def is_touching_border(rect, image_w, image_h):
+    """Whether a bounding rect touches the edge of the searched region."""
+    x, y, w, h = rect
+    return x <= 0 or y <= 0 or x + w >= image_w - 1 or y + h >= image_h - 1
+
+
+def find_rectangle_candidates(contours, min_area, max_area, epsilon_scalar):
+    """
+    Filters contours down to the bounding rects of four-sided shapes.
+
+    Args:
+        contours (Sequence[cv2.typing.MatLike]): The contours to filter.
+        min_area (int): Contours with an area smaller than this will be ignored.
+        max_area (int): Contours with an area larger than this will be ignored.
+        epsilon_scalar (float): Scaling factor for the epsilon component when
+            calculating polygons.
+
+    Returns:
+        list: The (x, y, w, h) bounding rect of every candidate.
+    """
+    rects = []
+    for cnt in contours:
+        # Filter out invalid sized contours.
+        area = cv2.contourArea(cnt)
+        if area < min_area or area > max_area:
+            continue
+
+        # Use Convex Hull to ignore rounded corners.
+        hull = cv2.convexHull(cnt)
+
+        # Approximate the hull shape.
+        peri = cv2.arcLength(hull, True)
+        approx = cv2.approxPolyDP(hull, epsilon_scalar * peri, True)
+
+        # If 4 vertices are found, it's a candidate for a rounded rectangle.
+        if len(approx) == 4:
+            rects.append(cv2.boundingRect(cnt))
+    return rects
+
+
+def draw_rectangles(img, rects, thickness, buffers=None, screen_size=None):
+    """
+    Draws rects on a copy of an image and fits it to the screen.
+
+    Args:
+        img (cv2.typing.MatLike): The image to draw on. Grayscale images are converted to BGR.
+        rects (list): The (x, y, w, h) rects to draw.
+        thickness (int): The line thickness.
+        buffers (FrameBuffers): Buffers to draw into. New ones are allocated if not specified.
+        screen_size (tuple): The (width, height) to fit the image to. Defaults to the actual
+            screen size, which must then be queried on the main thread first.
+
+    Returns:
+        cv2.typing.MatLike: The image to display.
+    """
+    buffers = buffers if buffers is not None else FrameBuffers()
+    out_img = buffers.get("display_bgr", img.shape[:2] + (3,))
+    if len(img.shape) == 2 or img.shape[2] == 1:
+        cv2.cvtColor(img, cv2.COLOR_GRAY2BGR, dst=out_img)
+    else:
+        np.copyto(out_img, img)
+
+    for x, y, w, h in rects:
+        # Draw rectangle for visualization.
+        cv2.rectangle(out_img, (x, y), (x + w, y + h), (0, 255, 0), thickness)
+
+    screen_width, screen_height = screen_size if screen_size is not None else (None, None)
+    return get_fullscreen_image_keep_aspect(out_img, screen_width, screen_height, buffers)
+
+
+def process_rectangles(
+    cache,
+    frame_id,
+    image,
+    min_area,
+    max_area,
+    blur_size,
+    epsilon_scalar,
+    canny_lower_threshold,
+    canny_upper_threshold,
+    use_adaptive_threshold,
+    adaptive_threshold_block_size,
+    adaptive_threshold_constant,
+):
+    """
+    Runs the `detectRectangles` pipeline through a stage cache.
+
+    Args:
+        cache (StageCache): The cache holding the previous stage outputs.
+        frame_id (int): The ID of the frame. Changes whenever the frame does.
+        image (cv2.typing.MatLike): The BGR frame.
+        See `detectRectangles` for the remaining parameters.
+
+    Returns:
+        tuple: The edge/threshold image, the detected rects and the cache key of the result.
+    """
+    buffers = cache.buffers
+    image_h, image_w = image.shape[:2]
+
+    key = (frame_id,)
+    gray = cache.get("gray", key, lambda: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=buffers.get("gray", (image_h, image_w))))
+
+    key += (blur_size,)
+    blurred = cache.get("blur", key, lambda: cv2.GaussianBlur(gray, (blur_size, blur_size), 0, dst=buffers.get("blur", (image_h, image_w))))
+
+    if use_adaptive_threshold:
+        key += ("adaptive", adaptive_threshold_block_size, adaptive_threshold_constant)
+        edges = cache.get(
+            "edges",
+            key,
+            lambda: cv2.adaptiveThreshold(
+                blurred,
+                255,
+                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                cv2.THRESH_BINARY_INV,
+                adaptive_threshold_block_size,
+                adaptive_threshold_constant,
+                dst=buffers.get("edges", (image_h, image_w)),
+            ),
+        )
+    else:
+        key += ("canny", canny_lower_threshold, canny_upper_threshold)
+        edges = cache.get(
+            "edges",
+            key,
+            lambda: cv2.Canny(
+                image=blurred,
+                threshold1=canny_lower_threshold,
+                threshold2=canny_upper_threshold,
+                edges=buffers.get("edges", (image_h, image_w)),
+            ),
+        )
+
+    # Find and filter contours.
+    contours = cache.get("contours", key, lambda: cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+
+    key += (min_area, max_area, epsilon_scalar)
+    rects = cache.get("rects", key, lambda: find_rectangle_candidates(contours, min_area, max_area, epsilon_scalar))
+    return edges, rects, key
+
+
+def flood_fill_mask(image, lo_diff_val, up_diff_val, buffers=None):
+    """
+    Masks everything that is not connected to the background.
+
+    Args:
+        image (cv2.typing.MatLike): The (blurred) BGR image. It is not modified.
+        lo_diff_val (int): The lower bounds for the "paint bucket" threshold.
+        up_diff_val (int): The upper bounds for the "paint bucket" threshold.
+        buffers (FrameBuffers): Buffers to fill into. New ones are allocated if not specified.
+
+    Returns:
+        cv2.typing.MatLike: The inverted fill mask, 2px larger than the image in each dimension.
+    """
+    buffers = buffers if buffers is not None else FrameBuffers()
+    image_h, image_w = image.shape[:2]
+    mask = buffers.zeros("fill_mask", (image_h + 2, image_w + 2))
+
+    loDiff = (lo_diff_val, lo_diff_val, lo_diff_val)
+    upDiff = (up_diff_val, up_diff_val, up_diff_val)
+    # floodFill paints into its input so work on a copy of the cached image.
+    painted = buffers.get("fill_image", image.shape)
+    np.copyto(painted, image)
+    cv2.floodFill(painted, mask, (15, 15), (0, 0, 0), loDiff, upDiff)
+
+    # Everything that was not filled becomes 255 and the fill becomes 0.
+    cv2.threshold(mask, 0, 255, cv2.THRESH_BINARY_INV, dst=mask)
+    return mask
+
+
+def process_rectangles_generic(
+    cache,
+    frame_id,
+    image,
+    min_area,
+    max_area,
+    blur_size,
+    lo_diff_val,
+    up_diff_val,
+    kernel_size,
+    crop_x,
+    crop_y,
+    crop_w,
+    crop_h,
+):
+    """
+    Runs the `detectRectanglesGeneric` pipeline through a stage cache.
+
+    Args:
+        cache (StageCache): The cache holding the previous stage outputs.
+        frame_id (int): The ID of the frame. Changes whenever the frame does.
+        image (cv2.typing.MatLike): The BGR frame.
+        See `detectRectanglesGeneric` for the remaining parameters.
+
+    Returns:
+        tuple: The fill mask, the detected rects and the cache key of the result.
+    """
+    key = (frame_id, crop_x, crop_y, crop_w, crop_h)
+    cropped = cache.get("crop", key, lambda: image[crop_y : crop_y + crop_h, crop_x : crop_x + crop_w])
+    image_h, image_w = cropped.shape[:2]
+
+    buffers = cache.buffers
+
+    key += (blur_size,)
+    blurred = cache.get("blur", key, lambda: cv2.GaussianBlur(cropped, (blur_size, blur_size), 0, dst=buffers.get("blur", cropped.shape)))
+
+    key += (lo_diff_val, up_diff_val)
+    mask = cache.get("mask", key, lambda: flood_fill_mask(blurred, lo_diff_val, up_diff_val, buffers))
+
+    key += (kernel_size,)
+    morphed = cache.get("morph", key, lambda: morphology_rect(mask, cv2.MORPH_OPEN, kernel_size, buffers, "morph"))
+
+    # Find and filter contours.
+    contours = cache.get("contours", key, lambda: cv2.findContours(morphed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+
+    def filter_rects():
+        # Do not include any rects that are touching the bounding region.
+        candidates = find_rectangle_candidates(contours, min_area, max_area, 0.02)
+        return [rect for rect in candidates if not is_touching_border(rect, image_w, image_h)]
+
+    key += (min_area, max_area)
+    rects = cache.get("rects", key, filter_rects)
+    return mask, rects, key
+
+
+def color_range_mask(hsv_img, color_boundaries, buffers=None):
+    """
+    Masks the pixels of an HSV image that fall within any of the given ranges.
+
+    Args:
+        hsv_img (cv2.typing.MatLike): The HSV image.
+        color_boundaries (list): (lower, upper) HSV bounds for each color range.
+        buffers (FrameBuffers): Buffers to mask into. New ones are allocated if not specified.
+
+    Returns:
+        cv2.typing.MatLike: The combined mask.
+    """
+    buffers = buffers if buffers is not None else FrameBuffers()
+    mask = buffers.zeros("color_mask", hsv_img.shape[:2])
+    tmp_mask = buffers.get("color_range", hsv_img.shape[:2])
+    for lower, upper in color_boundaries:
+        cv2.inRange(hsv_img, lower, upper, dst=tmp_mask)
+        cv2.bitwise_or(tmp_mask, mask, dst=mask)
+    return mask
+
+
+def find_scrollbar_rects(contours, min_area, max_area, image_w, image_h):
+    """
+    Filters contours down to the bounding rects of scrollbar candidates.
+
+    Args:
+        contours (Sequence[cv2.typing.MatLike]): The contours to filter.
+        min_area (int): Regions with an area smaller than this will be ignored.
+        max_area (int): Regions with an area larger than this will be ignored.
+        image_w (int): The width of the searched region.
+        image_h (int): The height of the searched region.
+
+    Returns:
+        list: The unique (x, y, w, h) bounding rects.
+    """
+    rects = []
+    for cnt in contours:
+        # Filter out invalid sized contours.
+        area = cv2.contourArea(cnt)
+        if area < min_area or area > max_area:
+            continue
+
+        rect = cv2.boundingRect(cnt)
+        # Do not include any rects that are touching the bounding region.
+        if rect not in rects and not is_touching_border(rect, image_w, image_h):
+            rects.append(rect)
+    return rects
+
+
+def process_scrollbar(
+    cache,
+    frame_id,
+    image,
+    color_boundaries,
+    min_area,
+    max_area,
+    kernel_size,
+    crop_x,
+    crop_y,
+    crop_w,
+    crop_h,
+):
+    """
+    Runs the `detectScrollBar` pipeline through a stage cache.
+
+    Args:
+        cache (StageCache): The cache holding the previous stage outputs.
+        frame_id (int): The ID of the frame. Changes whenever the frame does.
+        image (cv2.typing.MatLike): The BGR frame.
+        color_boundaries (list): (lower, upper) HSV bounds of the scrollbar colors.
+        See `detectScrollBar` for the remaining parameters.
+
+    Returns:
+        tuple: The cropped image, the detected rects and the cache key of the result.
+    """
+    key = (frame_id, crop_x, crop_y, crop_w, crop_h)
+    cropped = cache.get("crop", key, lambda: image[crop_y : crop_y + crop_h, crop_x : crop_x + crop_w])
+    image_h, image_w = cropped.shape[:2]
+
+    buffers = cache.buffers
+    hsv_img = cache.get("hsv", key, lambda: cv2.cvtColor(cropped, cv2.COLOR_BGR2HSV, dst=buffers.get("hsv", cropped.shape)))
+    mask = cache.get("mask", key, lambda: color_range_mask(hsv_img, color_boundaries, buffers))
+    opened = cache.get("open", key, lambda: morphology_rect(mask, cv2.MORPH_OPEN, 5, buffers, "open"))
+
+    key += (kernel_size,)
+    morphed = cache.get("close", key, lambda: morphology_rect(opened, cv2.MORPH_CLOSE, kernel_size, buffers, "close"))
+
+    # Find and filter contours.
+    contours = cache.get("contours", key, lambda: cv2.findContours(morphed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+
+    key += (min_area, max_area)
+    rects = cache.get("rects", key, lambda: find_scrollbar_rects(contours, min_area, max_area, image_w, image_h))
+    return cropped, rects, key
+
+
 def detectRectangles(
     fp: str,  # can be .png or .mp4
     min_area: int = 0,
@@ -73,6 +744,9 @@ def detectRectangles(
     adaptive_threshold_block_size: int = 11,
     adaptive_threshold_constant: float = 2.0,
     window_name: str = "detectRectangles",
+    frame_stride: int = 1,
+    start_sec: float = None,
+    end_sec: float = None,
 ):
     """
     Detects rectangles in an image.
@@ -95,109 +769,62 @@ def detectRectangles(
         adaptive_threshold_constant (float): The constant parameter value of the
             cv2.adaptiveThreshold function.
         window_name (string): The name of the cv2 window.
+        frame_stride (int): For videos, only every Nth frame is decoded and processed.
+        start_sec (float): For videos, where to start playback in seconds.
+        end_sec (float): For videos, where to loop back to `start_sec` in seconds.
     """
 
-    is_video = os.path.splitext(fp)[-1] == ".mp4"
-
-    if is_video:
-        cap = cv2.VideoCapture(fp)
-
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    # Set the window to fullscreen mode
-    cv2.setWindowProperty(window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-    cv2.createTrackbar("Blur Size", window_name, blur_size, 32, nothing)
-    # Trackbar doesn't allow float values. Need to scale this value back down later.
-    cv2.createTrackbar("Epsilon", window_name, int(epsilon_scalar * 100), 100, nothing)
-
-    if use_adaptive_threshold:
-        cv2.createTrackbar("Block Size", window_name, adaptive_threshold_block_size, 255, nothing)
-    else:
-        cv2.createTrackbar("Threshold1", window_name, canny_lower_threshold, 255, nothing)
-        cv2.createTrackbar("Threshold2", window_name, canny_upper_threshold, 255, nothing)
-
-    while True:
-        blur_size = cv2.getTrackbarPos("Blur Size", window_name)
-        epsilon_scalar = cv2.getTrackbarPos("Epsilon", window_name)
+    def create_trackbars(window_name):
+        cv2.createTrackbar("Blur Size", window_name, blur_size, 32, nothing)
+        # Trackbar doesn't allow float values. Need to scale this value back down later.
+        cv2.createTrackbar("Epsilon", window_name, int(epsilon_scalar * 100), 100, nothing)
 
         if use_adaptive_threshold:
-            adaptive_threshold_block_size = cv2.getTrackbarPos("Block Size", window_name)
-
-            adaptive_threshold_block_size = max(3, adaptive_threshold_block_size)
-            if adaptive_threshold_block_size % 2 == 0:
-                adaptive_threshold_block_size += 1
+            cv2.createTrackbar("Block Size", window_name, adaptive_threshold_block_size, 255, nothing)
         else:
-            canny_lower_threshold = cv2.getTrackbarPos("Threshold1", window_name)
-            canny_upper_threshold = cv2.getTrackbarPos("Threshold2", window_name)
-
-        blur_size = max(1, blur_size)
-        if blur_size % 2 == 0:
-            blur_size += 1
-
-        # Scale back to decimal range.
-        epsilon_scalar = float(epsilon_scalar) / 100.0
-
-        if is_video:
-            ret, image = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, image = cap.read()
-        else:
-            image = cv2.imread(fp)
-
-        # Process Image
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+            cv2.createTrackbar("Threshold1", window_name, canny_lower_threshold, 255, nothing)
+            cv2.createTrackbar("Threshold2", window_name, canny_upper_threshold, 255, nothing)
 
+    def read_params(window_name):
+        block_size = adaptive_threshold_block_size
+        lower_threshold = canny_lower_threshold
+        upper_threshold = canny_upper_threshold
         if use_adaptive_threshold:
-            tmp = cv2.adaptiveThreshold(
-                blurred,
-                255,
-                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY_INV,
-                adaptive_threshold_block_size,
-                adaptive_threshold_constant,
-            )
+            block_size = sanitize_odd_size(cv2.getTrackbarPos("Block Size", window_name), minimum=3)
         else:
-            tmp = cv2.Canny(
-                image=blurred,
-                threshold1=canny_lower_threshold,
-                threshold2=canny_upper_threshold,
-            )
-
-        out_img = tmp
-        if len(out_img.shape) == 2 or out_img.shape[2] == 1:
-            out_img = cv2.cvtColor(out_img, cv2.COLOR_GRAY2BGR)
-
-        # Find and filter contours
-        contours, _ = cv2.findContours(tmp, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for cnt in contours:
-            # Filter out invalid sized contours.
-            area = cv2.contourArea(cnt)
-            if area < min_area or area > max_area:
-                continue
-
-            # Use Convex Hull to ignore rounded corners
-            hull = cv2.convexHull(cnt)
-
-            # Approximate the hull shape
-            peri = cv2.arcLength(hull, True)
-            approx = cv2.approxPolyDP(hull, epsilon_scalar * peri, True)
-
-            # If 4 vertices are found, it's a candidate for a rounded rectangle
-            if len(approx) == 4:
-                x, y, w, h = cv2.boundingRect(cnt)
-                # Draw rectangle for visualization.
-                cv2.rectangle(out_img, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        res = get_fullscreen_image_keep_aspect(out_img, SCREEN_WIDTH, SCREEN_HEIGHT)
-        cv2.imshow(window_name, res)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-    if is_video:
-        cap.release()
-    cv2.destroyAllWindows()
+            lower_threshold = cv2.getTrackbarPos("Threshold1", window_name)
+            upper_threshold = cv2.getTrackbarPos("Threshold2", window_name)
+
+        return (
+            sanitize_odd_size(cv2.getTrackbarPos("Blur Size", window_name)),
+            # Scale back to decimal range.
+            float(cv2.getTrackbarPos("Epsilon", window_name)) / 100.0,
+            lower_threshold,
+            upper_threshold,
+            block_size,
+        )
+
+    cache = StageCache()
+
+    def process(frame_id, image, params, screen_size):
+        blur, epsilon, lower_threshold, upper_threshold, block_size = params
+        edges, rects, key = process_rectangles(
+            cache,
+            frame_id,
+            image,
+            min_area,
+            max_area,
+            blur,
+            epsilon,
+            lower_threshold,
+            upper_threshold,
+            use_adaptive_threshold,
+            block_size,
+            adaptive_threshold_constant,
+        )
+        return cache.get("display", key, lambda: draw_rectangles(edges, rects, 2, cache.buffers, screen_size))
+
+    run_tuner(fp, window_name, create_trackbars, read_params, process, frame_stride, start_sec, end_sec)
 
 
 def detectRectanglesGeneric(
@@ -213,6 +840,9 @@ def detectRectanglesGeneric(
     crop_w=1055,
     crop_h=840,
     window_name="detectRectanglesGeneric",
+    frame_stride=1,
+    start_sec=None,
+    end_sec=None,
 ):
     """
     Detects rectangles in an image using a more generalized approach.
@@ -241,98 +871,47 @@ def detectRectanglesGeneric(
         crop_w (int): The width of the cropped image region.
         crop_h (int): The height of the cropped image region.
         window_name (string): The name of the cv2 window.
+        frame_stride (int): For videos, only every Nth frame is decoded and processed.
+        start_sec (float): For videos, where to start playback in seconds.
+        end_sec (float): For videos, where to loop back to `start_sec` in seconds.
     """
-    is_video = os.path.splitext(fp)[-1] == ".mp4"
-
-    if is_video:
-        cap = cv2.VideoCapture(fp)
-
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    # Set the window to fullscreen mode.
-    cv2.setWindowProperty(window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-    cv2.createTrackbar("Blur Size", window_name, blur_size, 32, nothing)
-    cv2.createTrackbar("loDiff", window_name, lo_diff_val, 100, nothing)
-    cv2.createTrackbar("upDiff", window_name, up_diff_val, 100, nothing)
-    cv2.createTrackbar("Kernel", window_name, kernel_size, 1000, nothing)
-
-    while True:
-        blur_size = cv2.getTrackbarPos("Blur Size", window_name)
-        lo_diff_val = cv2.getTrackbarPos("loDiff", window_name)
-        up_diff_val = cv2.getTrackbarPos("upDiff", window_name)
-        kernel_size = cv2.getTrackbarPos("Kernel", window_name)
-
-        blur_size = max(1, blur_size)
-        if blur_size % 2 == 0:
-            blur_size += 1
-
-        # Process Image.
-        if is_video:
-            ret, image = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, image = cap.read()
-        else:
-            image = cv2.imread(fp)
-
-        image = image[crop_y : crop_y + crop_h, crop_x : crop_x + crop_w]
-        image = cv2.GaussianBlur(image, (blur_size, blur_size), 0)
-        # image = cv2.bilateralFilter(image, blur_size, 75, 75)
-        image_h, image_w = image.shape[:2]
-        mask = np.zeros((image_h + 2, image_w + 2), np.uint8)
-
-        loDiff = (lo_diff_val, lo_diff_val, lo_diff_val)
-        upDiff = (up_diff_val, up_diff_val, up_diff_val)
-        cv2.floodFill(image, mask, (15, 15), (0, 0, 0), loDiff, upDiff)
-
-        mask[mask != 0] = 255
-        mask = cv2.bitwise_not(mask)
-
-        kernel = np.ones((kernel_size, kernel_size), np.uint8)
-        morphed = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-        # closed = cv2.erode(mask, kernel, iterations=1)
 
-        # edges = cv2.Canny(morphed, canny_lower_threshold, canny_upper_threshold)
-
-        tmp = morphed
-
-        out_img = mask
-        if len(out_img.shape) == 2 or out_img.shape[2] == 1:
-            out_img = cv2.cvtColor(out_img, cv2.COLOR_GRAY2BGR)
-
-        # Find and filter contours.
-        contours, _ = cv2.findContours(tmp, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for cnt in contours:
-            # Filter out invalid sized contours.
-            area = cv2.contourArea(cnt)
-            if area < min_area or area > max_area:
-                continue
-
-            # Use Convex Hull to ignore rounded corners.
-            hull = cv2.convexHull(cnt)
-
-            # Approximate the hull shape.
-            peri = cv2.arcLength(hull, True)
-            approx = cv2.approxPolyDP(hull, 0.02 * peri, True)
-
-            # If 4 vertices are found, it's a candidate for a rounded rectangle.
-            if len(approx) == 4:
-                x, y, w, h = cv2.boundingRect(cnt)
-                # Do not include any rects that are touching the bounding region.
-                if x <= 0 or y <= 0 or x + w >= image_w - 1 or y + h >= image_h - 1:
-                    continue
-
-                # Draw rectangle for visualization.
-                cv2.rectangle(out_img, (x, y), (x + w, y + h), (0, 255, 0), 1)
-
-        res = get_fullscreen_image_keep_aspect(out_img, SCREEN_WIDTH, SCREEN_HEIGHT)
-        cv2.imshow(window_name, res)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-    if is_video:
-        cap.release()
-    cv2.destroyAllWindows()
+    def create_trackbars(window_name):
+        cv2.createTrackbar("Blur Size", window_name, blur_size, 32, nothing)
+        cv2.createTrackbar("loDiff", window_name, lo_diff_val, 100, nothing)
+        cv2.createTrackbar("upDiff", window_name, up_diff_val, 100, nothing)
+        cv2.createTrackbar("Kernel", window_name, kernel_size, 1000, nothing)
+
+    def read_params(window_name):
+        return (
+            sanitize_odd_size(cv2.getTrackbarPos("Blur Size", window_name)),
+            cv2.getTrackbarPos("loDiff", window_name),
+            cv2.getTrackbarPos("upDiff", window_name),
+            cv2.getTrackbarPos("Kernel", window_name),
+        )
+
+    cache = StageCache()
+
+    def process(frame_id, image, params, screen_size):
+        blur, lo_diff, up_diff, kernel = params
+        mask, rects, key = process_rectangles_generic(
+            cache,
+            frame_id,
+            image,
+            min_area,
+            max_area,
+            blur,
+            lo_diff,
+            up_diff,
+            kernel,
+            crop_x,
+            crop_y,
+            crop_w,
+            crop_h,
+        )
+        return cache.get("display", key, lambda: draw_rectangles(mask, rects, 1, cache.buffers, screen_size))
+
+    run_tuner(fp, window_name, create_trackbars, read_params, process, frame_stride, start_sec, end_sec)
 
 
 def hex_to_hsv(hex_color):
@@ -364,6 +943,218 @@ def hex_to_hsv(hex_color):
     return color_hsv[0][0]
 
 
+def get_scrollbar_color_boundaries():
+    """
+    Converts `SCROLLBAR_COLOR_BOUNDARIES` to HSV.
+
+    Returns:
+        list: (lower, upper) HSV bounds for each scrollbar color.
+    """
+    return [(hex_to_hsv(lower), hex_to_hsv(upper)) for lower, upper in SCROLLBAR_COLOR_BOUNDARIES]
+
+
+def run_detector(detector, image, cache=None, frame_id=0, **params):
+    """
+    Runs a detector pipeline without a window.
+
+    Args:
+        detector (str): The detector to run. One of the `DETECTOR_DEFAULTS` keys.
+        image (cv2.typing.MatLike): The BGR frame.
+        cache (StageCache): Cache to reuse stage outputs across calls. A fresh
+            cache is used if not specified.
+        frame_id (int): The ID of the frame. Only matters when reusing a cache.
+        **params: Overrides for the detector's `DETECTOR_DEFAULTS`.
+
+    Returns:
+        list: The detected (x, y, w, h) rects in the coordinates of `image`.
+    """
+    if detector not in DETECTOR_DEFAULTS:
+        raise ValueError(f"Unknown detector: {detector}")
+
+    cache = cache if cache is not None else StageCache()
+    params = {**DETECTOR_DEFAULTS[detector], **params}
+
+    if detector == "detectRectangles":
+        _, rects, _ = process_rectangles(cache, frame_id, image, **params)
+        return rects
+
+    if detector == "detectRectanglesGeneric":
+        _, rects, _ = process_rectangles_generic(cache, frame_id, image, **params)
+    else:
+        color_boundaries = cache.get("color_boundaries", (), get_scrollbar_color_boundaries)
+        _, rects, _ = process_scrollbar(cache, frame_id, image, color_boundaries, **params)
+
+    # Map the rects from the cropped region back to the frame.
+    return [(x + params["crop_x"], y + params["crop_y"], w, h) for x, y, w, h in rects]
+
+
+def to_relative_params(params, screen_size=REFERENCE_SCREEN_SIZE):
+    """
+    Expresses detector parameters relative to the screen size.
+
+    Args:
+        params (dict): Absolute detector parameters.
+        screen_size (tuple): The (width, height) the parameters are meant for.
+
+    Returns:
+        dict: The parameters with every one in `PARAMETER_SCALING` relative to the screen.
+    """
+    screen_w, screen_h = screen_size
+    divisors = {"x": screen_w, "y": screen_h, "kernel": screen_w, "area": screen_w * screen_h}
+    return {name: value / divisors[PARAMETER_SCALING[name]] if name in PARAMETER_SCALING else value for name, value in params.items()}
+
+
+def to_absolute_params(relative_params, screen_size):
+    """
+    Resolves relative detector parameters for a screen size.
+
+    Args:
+        relative_params (dict): Detector parameters as returned by `to_relative_params`.
+        screen_size (tuple): The (width, height) of the image the detector will run on.
+
+    Returns:
+        dict: The absolute parameters.
+    """
+    screen_w, screen_h = screen_size
+    params = {}
+    for name, value in relative_params.items():
+        scaling = PARAMETER_SCALING.get(name)
+        if scaling == "area":
+            params[name] = value * screen_w * screen_h
+        elif scaling == "x":
+            params[name] = int(round(value * screen_w))
+        elif scaling == "y":
+            params[name] = int(round(value * screen_h))
+        elif scaling == "kernel":
+            size = value * screen_w
+            # Blur kernels must be odd, so round those to the nearest odd size instead.
+            params[name] = 2 * int(size // 2) + 1 if name == "blur_size" else max(1, int(round(size)))
+        else:
+            params[name] = value
+    return params
+
+
+def choose_pyramid_level(image_w, target_width=DEFAULT_TARGET_WIDTH):
+    """
+    Picks how many times to halve an image to get as close to a working width as possible without going below it.
+
+    Args:
+        image_w (int): The width of the source image.
+        target_width (int): The width to work at.
+
+    Returns:
+        int: The number of halvings. 0 keeps the source resolution.
+    """
+    level = 0
+    while (image_w + 1) // 2 >= target_width:
+        image_w = (image_w + 1) // 2
+        level += 1
+    return level
+
+
+def run_detector_scaled(detector, image, target_width=DEFAULT_TARGET_WIDTH, cache=None, frame_id=0, **relative_params):
+    """
+    Runs a detector pipeline on a downscaled pyramid level of a frame.
+
+    The crops, kernel sizes and area limits are relative to the screen (see
+    `PARAMETER_SCALING`) and default to the tuned `DETECTOR_DEFAULTS` relative to
+    `REFERENCE_SCREEN_SIZE`, so the detector behaves the same on any resolution and
+    a 1440p or 4K capture is processed at about the cost of a 1080p one.
+
+    Args:
+        detector (str): The detector to run. One of the `DETECTOR_DEFAULTS` keys.
+        image (cv2.typing.MatLike): The BGR frame of any resolution.
+        target_width (int): The smallest width to work at. The frame is halved while it stays at least this wide.
+        cache (StageCache): Cache to reuse stage outputs across calls. A fresh
+            cache is used if not specified.
+        frame_id (int): The ID of the frame. Only matters when reusing a cache.
+        **relative_params: Overrides for the detector's relative parameters.
+
+    Returns:
+        list: The detected (x, y, w, h) rects in the coordinates of `image`.
+    """
+    if detector not in DETECTOR_DEFAULTS:
+        raise ValueError(f"Unknown detector: {detector}")
+
+    cache = cache if cache is not None else StageCache()
+    image_h, image_w = image.shape[:2]
+    level = choose_pyramid_level(image_w, target_width)
+
+    def build_level():
+        scaled = image
+        for i in range(level):
+            # Halving with a 2x2 box filter is several times cheaper than cv2.pyrDown on large frames.
+            scaled_h, scaled_w = scaled.shape[:2]
+            size = ((scaled_w + 1) // 2, (scaled_h + 1) // 2)
+            dst = cache.buffers.get(f"pyramid_{i}", size[::-1] + image.shape[2:])
+            scaled = cv2.resize(scaled, size, dst=dst, interpolation=cv2.INTER_AREA)
+        return scaled
+
+    scaled = cache.get("pyramid", (frame_id, level), build_level)
+    scaled_h, scaled_w = scaled.shape[:2]
+
+    relative = {**to_relative_params(DETECTOR_DEFAULTS[detector]), **relative_params}
+    params = to_absolute_params(relative, (scaled_w, scaled_h))
+    # Key the stages on the level too so that a shared cache never mixes resolutions.
+    rects = run_detector(detector, scaled, cache, (frame_id, level), **params)
+
+    # Map the rects from the pyramid level back to the frame.
+    scale_x, scale_y = image_w / scaled_w, image_h / scaled_h
+    return [(int(round(x * scale_x)), int(round(y * scale_y)), int(round(w * scale_x)), int(round(h * scale_y))) for x, y, w, h in rects]
+
+
+class DetectorPipeline:
+    """
+    Runs a detector on a sequence of frames, reusing its working buffers.
+
+    `run_detector` starts from an empty stage cache unless it is given one, so
+    every call allocates new images for every stage. A pipeline keeps one cache,
+    so its buffers are only allocated for the first frame and whenever the frame
+    size changes. Use one pipeline per detector and frame loop.
+
+    Args:
+        detector (str): The detector to run. One of the `DETECTOR_DEFAULTS` keys.
+        target_width (int): If set, runs the scale-normalized mode (`run_detector_scaled`)
+            at this working width and `params` are relative.
+        **params: Overrides for the detector's `DETECTOR_DEFAULTS`.
+    """
+
+    def __init__(self, detector, target_width=None, **params):
+        if detector not in DETECTOR_DEFAULTS:
+            raise ValueError(f"Unknown detector: {detector}")
+        self.detector = detector
+        self.target_width = target_width
+        self.params = params
+        self.cache = StageCache()
+        self._frame_count = 0
+
+    @property
+    def buffers(self):
+        """The `FrameBuffers` the stages write into."""
+        return self.cache.buffers
+
+    def run(self, image, frame_id=None):
+        """
+        Detects the rects of a frame.
+
+        Args:
+            image (cv2.typing.MatLike): The BGR frame.
+            frame_id (int): The ID of the frame. Passing the ID of the previous frame
+                reuses its results. Every call is treated as a new frame if not specified.
+
+        Returns:
+            list: The detected (x, y, w, h) rects in the coordinates of `image`.
+        """
+        if frame_id is None:
+            # Never equal to an ID given by the caller, so every stage is computed.
+            frame_id = ("frame", self._frame_count)
+        self._frame_count += 1
+
+        if self.target_width is None:
+            return run_detector(self.detector, image, self.cache, frame_id, **self.params)
+        return run_detector_scaled(self.detector, image, self.target_width, self.cache, frame_id, **self.params)
+
+
 def detectScrollBar(
     fp,  # can be .png or .mp4
     min_area=0,
@@ -374,6 +1165,9 @@ def detectScrollBar(
     crop_w=1055,
     crop_h=840,
     window_name="detectScrollBar",
+    frame_stride=1,
+    start_sec=None,
+    end_sec=None,
 ):
     """
     Detects a scrollbar in an image.
@@ -389,131 +1183,45 @@ def detectScrollBar(
         crop_w (int): The width of the cropped image region.
         crop_h (int): The height of the cropped image region.
         window_name (string): The name of the cv2 window.
+        frame_stride (int): For videos, only every Nth frame is decoded and processed.
+        start_sec (float): For videos, where to start playback in seconds.
+        end_sec (float): For videos, where to loop back to `start_sec` in seconds.
     """
-    is_video = os.path.splitext(fp)[-1] == ".mp4"
 
-    if is_video:
-        cap = cv2.VideoCapture(fp)
+    def create_trackbars(window_name):
+        cv2.createTrackbar("Kernel", window_name, kernel_size, 1000, nothing)
 
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    # Set the window to fullscreen mode.
-    cv2.setWindowProperty(window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+    def read_params(window_name):
+        return (cv2.getTrackbarPos("Kernel", window_name),)
 
-    cv2.createTrackbar("Kernel", window_name, kernel_size, 1000, nothing)
+    # The scrollbar colors never change so only convert them once.
+    color_boundaries = get_scrollbar_color_boundaries()
+    cache = StageCache()
 
-    epsilon = 0.02
-    cv2.createTrackbar("Epsilon", window_name, int(epsilon * 100), 100, nothing)
+    def process(frame_id, image, params, screen_size):
+        (kernel,) = params
+        cropped, rects, key = process_scrollbar(
+            cache,
+            frame_id,
+            image,
+            color_boundaries,
+            min_area,
+            max_area,
+            kernel,
+            crop_x,
+            crop_y,
+            crop_w,
+            crop_h,
+        )
+        return cache.get("display", key, lambda: draw_rectangles(cropped, rects, 1, cache.buffers, screen_size))
 
-    while True:
-        kernel_size = cv2.getTrackbarPos("Kernel", window_name)
-        epsilon = cv2.getTrackbarPos("Epsilon", window_name)
-
-        # Scale back to decimal range.
-        epsilon = float(epsilon) / 100.0
-
-        # Process Image.
-        if is_video:
-            ret, image = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, image = cap.read()
-        else:
-            image = cv2.imread(fp)
-
-        image = image[crop_y : crop_y + crop_h, crop_x : crop_x + crop_w]
-        image_h, image_w = image.shape[:2]
-
-        hsv_img = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        color_boundaries = [
-            (hex_to_hsv("#787388"), hex_to_hsv("#7d788e")),
-            (hex_to_hsv("#d3d1db"), hex_to_hsv("#d3d1db")),
-        ]
-
-        mask = np.zeros(hsv_img.shape[:2], dtype=np.uint8)
-        for lower, upper in color_boundaries:
-            lower = np.array(lower, dtype=np.uint8)
-            upper = np.array(upper, dtype=np.uint8)
-
-            tmp_mask = cv2.inRange(hsv_img, lower, upper)
-            mask = cv2.bitwise_or(tmp_mask, mask)
-
-        kernel = np.ones((kernel_size, kernel_size), np.uint8)
-        morphed = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
-        morphed = cv2.morphologyEx(morphed, cv2.MORPH_CLOSE, kernel)
-        tmp = morphed
-
-        out_img = image
-        if len(out_img.shape) == 2 or out_img.shape[2] == 1:
-            out_img = cv2.cvtColor(out_img, cv2.COLOR_GRAY2BGR)
-
-        found_rects = []
-        # Find and filter contours.
-        contours, _ = cv2.findContours(tmp, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for cnt in contours:
-            # Filter out invalid sized contours.
-            area = cv2.contourArea(cnt)
-            if area < min_area or area > max_area:
-                continue
-
-            # If 4 vertices are found, it's a candidate for a rounded rectangle.
-            x, y, w, h = cv2.boundingRect(cnt)
-            if cnt not in found_rects:
-                found_rects.append(cnt)
-
-                # Do not include any rects that are touching the bounding region.
-                if x <= 0 or y <= 0 or x + w >= image_w - 1 or y + h >= image_h - 1:
-                    continue
-                # Draw rectangle for visualization.
-                cv2.rectangle(out_img, (x, y), (x + w, y + h), (0, 255, 0), 1)
-
-        res = get_fullscreen_image_keep_aspect(out_img, SCREEN_WIDTH, SCREEN_HEIGHT)
-        cv2.imshow(window_name, res)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-    if is_video:
-        cap.release()
-    cv2.destroyAllWindows()
+    run_tuner(fp, window_name, create_trackbars, read_params, process, frame_stride, start_sec, end_sec)
 
 
 if __name__ == "__main__":
     fp = "./imageDetectionSample.png"
     # fp = "./imageDetectionSample2.png"
 
-    detectRectangles(
-        fp,
-        min_area=200 * 900,
-        max_area=300 * 1050,
-        blur_size=5,
-        epsilon_scalar=0.02,
-        canny_lower_threshold=30,
-        canny_upper_threshold=50,
-        use_adaptive_threshold=True,
-        adaptive_threshold_block_size=11,
-        adaptive_threshold_constant=2.0,
-    )
-
-    detectRectanglesGeneric(
-        fp,
-        min_area=0,
-        max_area=1e7,
-        blur_size=7,
-        lo_diff_val=1,
-        up_diff_val=1,
-        kernel_size=100,
-        crop_x=10,
-        crop_y=700,
-        crop_w=1055,
-        crop_h=840,
-    )
-
-    detectScrollBar(
-        fp,
-        min_area=0,
-        max_area=1e7,
-        kernel_size=100,
-        crop_x=10,
-        crop_y=700,
-        crop_w=1055,
-        crop_h=840,
-    )
+    detectRectangles(fp, **DETECTOR_DEFAULTS["detectRectangles"])
+    detectRectanglesGeneric(fp, **DETECTOR_DEFAULTS["detectRectanglesGeneric"])
+    detectScrollBar(fp, **DETECTOR_DEFAULTS["detectScrollBar"])
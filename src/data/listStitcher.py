@@ -0,0 +1,371 @@
+"""Stitching of scrolled lists from screenshot sequences and recordings.
+
+The bot scrolls long lists (skills, races, support cards) and analyzes every
+screenshot on its own, so every row that is visible in several screenshots is
+detected several times. This tool estimates the vertical scroll offset between
+consecutive screenshots with phase correlation on the list region and pastes
+the crops into one tall image of the whole list. Every row of the stitched
+image comes from exactly one frame, and the segments record which frame and
+which row of it, so anything detected on the stitched image can be traced back
+to a screenshot. Rows can then be detected once over the stitched image, and
+the list height shows how many scroll steps are actually needed.
+
+The crops are zero-padded to twice their height before the phase correlation,
+which removes the wrap-around of the circular correlation. Offsets of up to
+about three quarters of the list height per step are found this way instead of
+only up to half of it.
+
+Run it with: `python listStitcher.py screenshots_dir_or_recording.mp4 --out stitched.png`
+Without a path it checks itself on a synthetic scrolled list made from the
+sample screenshots.
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from imageDetection import DETECTOR_DEFAULTS, run_detector
+from videoSource import VideoSource
+
+# The list region of the sample screenshots as (x, y, w, h), the same crop as the list detectors.
+DEFAULT_LIST_REGION = tuple(DETECTOR_DEFAULTS["detectRectanglesGeneric"][key] for key in ("crop_x", "crop_y", "crop_w", "crop_h"))
+DEFAULT_SCALE = 0.5
+# Correlation peaks below this are not treated as the same list.
+DEFAULT_MIN_RESPONSE = 0.05
+# The overlap between consecutive screenshots that the estimate is reliable with, as a fraction of the list height.
+DEFAULT_MIN_OVERLAP = 0.25
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+class ListStitcher:
+    """
+    Assembles consecutive screenshots of a scrolled list into one tall image.
+
+    Args:
+        region (Tuple[int, int, int, int]): The (x, y, w, h) of the list in the screenshots.
+        scale (float): The scale the offsets are estimated at. Defaults to 0.5.
+        min_response (float): Frames whose correlation peak with the previous frame is weaker than
+            this are skipped as not showing the same list. Defaults to 0.05.
+    """
+
+    def __init__(self, region: Tuple[int, int, int, int] = DEFAULT_LIST_REGION, scale: float = DEFAULT_SCALE, min_response: float = DEFAULT_MIN_RESPONSE):
+        self.region = region
+        self.scale = scale
+        self.min_response = min_response
+
+        self.crops: List[np.ndarray] = []
+        self.sources: List[Any] = []
+        self.positions: List[float] = []
+        self.responses: List[float] = []
+        self.num_skipped = 0
+        self.estimate_seconds: List[float] = []
+
+        self._previous = None
+        self._window = None
+
+    def _prepare(self, crop: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        h, w = gray.shape
+        if self._window is None:
+            # Taper the sides only. Tapering the top and bottom would hide the overlap of large scroll steps.
+            self._window = np.tile(np.hanning(w).astype(np.float32), (h, 1))
+
+        # Pad to twice the height so that the correlation does not wrap around.
+        padded = np.zeros((2 * h, w), dtype=np.float32)
+        gray = gray.astype(np.float32)
+        padded[:h] = (gray - gray.mean()) * self._window
+        return padded
+
+    def estimate_offset(self, previous: np.ndarray, current: np.ndarray) -> Tuple[float, float]:
+        """
+        Estimates how far the list scrolled between two prepared crops.
+
+        Args:
+            previous (np.ndarray): The padded crop of the previous frame.
+            current (np.ndarray): The padded crop of the current frame.
+
+        Returns:
+            (Tuple[float, float]): How many pixels of the list the view moved down (negative when
+                scrolling up) at full resolution, and the correlation peak response.
+        """
+        (_, dy), response = cv2.phaseCorrelate(previous, current)
+        # Scrolling down moves the content up in the current frame.
+        return -dy / self.scale, response
+
+    def add(self, image: np.ndarray, source: Any = None) -> bool:
+        """
+        Adds the next screenshot of the list.
+
+        Args:
+            image (np.ndarray): The BGR screenshot.
+            source (Any): Identifies the screenshot in the segments, e.g. its path or frame index.
+
+        Returns:
+            (bool): Whether the frame was added. Frames that do not match the previous one are skipped.
+        """
+        x, y, w, h = self.region
+        crop = image[y : y + h, x : x + w]
+        if crop.shape[:2] != (h, w):
+            raise ValueError(f"The list region {self.region} does not fit in a {image.shape[1]}x{image.shape[0]} frame.")
+
+        start = time.perf_counter()
+        prepared = self._prepare(crop)
+        if self._previous is None:
+            position, response = 0.0, 1.0
+        else:
+            offset, response = self.estimate_offset(self._previous, prepared)
+            position = self.positions[-1] + offset
+        self.estimate_seconds.append(time.perf_counter() - start)
+
+        if response < self.min_response:
+            self.num_skipped += 1
+            logging.warning(f"Skipped {source}: it does not match the previous frame (response {response:.3f}).")
+            return False
+
+        self._previous = prepared
+        self.crops.append(crop.copy())
+        self.sources.append(source)
+        self.positions.append(position)
+        self.responses.append(response)
+        return True
+
+    def stitch(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Assembles the tall list image.
+
+        Every row of the list is taken from the first frame that showed it.
+
+        Returns:
+            (Tuple[np.ndarray, List[Dict[str, Any]]]): The stitched BGR image and its segments. Each segment
+                has the "y0" and "y1" rows of the stitched image it covers, the "frame" index and "source" it
+                was taken from, and "source_y", the row of that screenshot that "y0" was at.
+        """
+        if not self.crops:
+            raise ValueError("No frames were added.")
+
+        _, region_y, w, h = self.region
+        tops = [int(round(position)) for position in self.positions]
+        origin = min(tops)
+        height = max(tops) - origin + h
+
+        stitched = np.zeros((height, w, 3), dtype=np.uint8)
+        covered = np.zeros(height, dtype=bool)
+        segments = []
+        for i, (crop, top) in enumerate(zip(self.crops, tops)):
+            top -= origin
+            new_rows = np.flatnonzero(~covered[top : top + h])
+            if len(new_rows) == 0:
+                continue
+            # Split the new rows into contiguous runs. A frame can add rows above and below already covered ones.
+            breaks = np.flatnonzero(np.diff(new_rows) > 1)
+            for run in np.split(new_rows, breaks + 1):
+                y0, y1 = top + run[0], top + run[-1] + 1
+                stitched[y0:y1] = crop[run[0] : run[-1] + 1]
+                segments.append({"y0": int(y0), "y1": int(y1), "frame": i, "source": self.sources[i], "source_y": int(region_y + run[0])})
+            covered[top : top + h] = True
+        return stitched, sorted(segments, key=lambda segment: segment["y0"])
+
+    def stats(self, min_overlap: float = DEFAULT_MIN_OVERLAP) -> Dict[str, Any]:
+        """
+        Summarizes the scroll.
+
+        Args:
+            min_overlap (float): The overlap between consecutive screenshots to assume for the
+                number of screenshots needed, as a fraction of the list height. Defaults to 0.25.
+
+        Returns:
+            (Dict[str, Any]): The number of frames added, skipped and contributing new rows, the list height,
+                the fewest screenshots that cover the list with `min_overlap` and the mean estimate time.
+        """
+        _, _, _, h = self.region
+        tops = [int(round(position)) for position in self.positions]
+        list_height = max(tops) - min(tops) + h if tops else 0
+        _, segments = self.stitch() if self.crops else (None, [])
+        return {
+            "frames": len(self.crops),
+            "skipped": self.num_skipped,
+            "contributing_frames": len({segment["frame"] for segment in segments}),
+            "list_height": list_height,
+            "min_frames": 1 + math.ceil(max(0, list_height - h) / (h * (1.0 - min_overlap))) if tops else 0,
+            "mean_estimate_ms": 1000.0 * float(np.mean(self.estimate_seconds)) if self.estimate_seconds else 0.0,
+        }
+
+
+def detect_rows(stitched: np.ndarray, segments: List[Dict[str, Any]], detector: str = "detectRectanglesGeneric", **params) -> List[Dict[str, Any]]:
+    """Detects the list rows once over the stitched image.
+
+    Args:
+        stitched (np.ndarray): The stitched list from `ListStitcher.stitch`.
+        segments (List[Dict[str, Any]]): Its segments.
+        detector (str, optional): The detector to run. Defaults to "detectRectanglesGeneric".
+        **params: Overrides for the detector's parameters. The crop of detectors that have one always covers the whole stitched image.
+
+    Returns:
+        Every detected rectangle with the frame and source its center was taken from.
+    """
+    h, w = stitched.shape[:2]
+    if "crop_x" in DETECTOR_DEFAULTS[detector]:
+        params = {**params, "crop_x": 0, "crop_y": 0, "crop_w": w, "crop_h": h}
+    rects = run_detector(detector, stitched, **params)
+    starts = [segment["y0"] for segment in segments]
+
+    rows = []
+    for x, y, rect_w, rect_h in sorted(rects, key=lambda rect: rect[1]):
+        segment = segments[max(0, int(np.searchsorted(starts, y + rect_h // 2, side="right")) - 1)]
+        rows.append({"rect": [int(x), int(y), int(rect_w), int(rect_h)], "frame": segment["frame"], "source": segment["source"]})
+    return rows
+
+
+def iter_frames(paths: List[str], stride: int = 1) -> Iterator[Tuple[str, np.ndarray]]:
+    """Reads the screenshots or recording frames of a scroll in order.
+
+    Args:
+        paths (List[str]): Screenshots, directories of screenshots (read in name order) or recordings.
+        stride (int, optional): Only every `stride`-th frame of a recording is read. Defaults to 1.
+
+    Returns:
+        The source of every frame (its path, or path and frame index) and the BGR image.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_frames(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS)))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(path)
+            if image is None:
+                logging.warning(f"Failed to load image: {path}")
+                continue
+            yield path, image
+        else:
+            with VideoSource(path, stride=stride) as source:
+                for index, _, image in source:
+                    yield f"{path}#{index}", image
+
+
+def stitch_frames(frames: Iterable[Tuple[Any, np.ndarray]], region: Tuple[int, int, int, int] = DEFAULT_LIST_REGION, scale: float = DEFAULT_SCALE) -> ListStitcher:
+    """Adds a sequence of frames to a new `ListStitcher`.
+
+    Args:
+        frames (Iterable[Tuple[Any, np.ndarray]]): The source and BGR image of every frame, in scroll order.
+        region (Tuple[int, int, int, int], optional): The (x, y, w, h) of the list in the frames.
+        scale (float, optional): The scale the offsets are estimated at. Defaults to 0.5.
+
+    Returns:
+        The stitcher with every matching frame added.
+    """
+    stitcher = ListStitcher(region, scale)
+    for source, image in frames:
+        stitcher.add(image, source)
+    return stitcher
+
+
+def synthesize_scroll(step: int = 100, view_h: int = 420, noise: float = 1.5, seed: int = 0) -> Tuple[List[Tuple[int, np.ndarray]], Tuple[int, int, int, int], np.ndarray, List[int]]:
+    """Makes screenshots of a synthetic scroll through the skill list of `imageDetectionSample.png`.
+
+    The list region of the sample is the list, and a shorter view at the top of it is scrolled
+    through the list by `step` pixels per screenshot.
+
+    Args:
+        step (int, optional): The scroll offset between screenshots. Defaults to 100.
+        view_h (int, optional): The height of the view. Defaults to 420.
+        noise (float, optional): The standard deviation of the noise added to every screenshot. Defaults to 1.5.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        The (frame index, screenshot) pairs, the view region, the full list and the true offset of every screenshot.
+    """
+    sample = cv2.imread(os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"))
+    x, y, w, h = DEFAULT_LIST_REGION
+    full_list = sample[y : y + h, x : x + w].copy()
+
+    rng = np.random.default_rng(seed)
+    offsets = list(range(0, h - view_h + 1, step))
+    if offsets[-1] != h - view_h:
+        offsets.append(h - view_h)
+    frames = []
+    for i, offset in enumerate(offsets):
+        frame = sample.copy()
+        frame[y : y + view_h, x : x + w] = full_list[offset : offset + view_h]
+        frame = np.clip(frame + rng.normal(0.0, noise, frame.shape), 0, 255).astype(np.uint8)
+        frames.append((i, frame))
+    return frames, (x, y, w, view_h), full_list, offsets
+
+
+def self_check(steps: Iterable[int] = (20, 60, 150, 300)):
+    """Stitches synthetic scrolls and compares them against the true list.
+
+    Args:
+        steps (Iterable[int], optional): The scroll offsets per screenshot to check.
+    """
+    for step in steps:
+        frames, region, full_list, offsets = synthesize_scroll(step)
+        stitcher = stitch_frames(frames, region)
+        stitched, segments = stitcher.stitch()
+        errors = np.abs(np.array(stitcher.positions) - np.array(offsets))
+        stats = stitcher.stats()
+
+        same_size = stitched.shape == full_list.shape
+        difference = float(np.mean(np.abs(stitched.astype(np.float32) - full_list))) if same_size else float("nan")
+        logging.info(
+            f"Step {step} px: {len(frames)} frames, offset error max {errors.max():.2f} px, stitched {stitched.shape[0]} px "
+            f"(true {full_list.shape[0]} px, mean abs difference {difference:.2f}), {len(segments)} segments, "
+            f"{stats['contributing_frames']} contributing frames, {stats['min_frames']} needed, {stats['mean_estimate_ms']:.1f} ms per estimate."
+        )
+
+    # Detecting once over the stitched list against detecting every screenshot.
+    frames, region, full_list, _ = synthesize_scroll(60)
+    x, y, w, h = region
+    start = time.perf_counter()
+    per_frame = sum(len(run_detector("detectRectanglesGeneric", image, crop_x=x, crop_y=y, crop_w=w, crop_h=h)) for _, image in frames)
+    per_frame_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stitched, segments = stitch_frames(frames, region).stitch()
+    stitch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = detect_rows(stitched, segments)
+    detect_seconds = time.perf_counter() - start
+    expected = len(detect_rows(full_list, [{"y0": 0, "y1": full_list.shape[0], "frame": 0, "source": None}]))
+    logging.info(
+        f"Detection at 60 px per step: {per_frame} rectangles in {1000.0 * per_frame_seconds:.0f} ms over {len(frames)} screenshots, "
+        f"{len(rows)} distinct rows ({expected} in the true list) in {1000.0 * detect_seconds:.0f} ms on the stitched list "
+        f"(stitching took {1000.0 * stitch_seconds:.0f} ms)."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Stitches screenshots of a scrolled list into one tall image.")
+    parser.add_argument("paths", nargs="*", help="Screenshots, directories of screenshots or a recording, in scroll order. Omit to run the self-check.")
+    parser.add_argument("--region", type=int, nargs=4, default=list(DEFAULT_LIST_REGION), metavar=("X", "Y", "W", "H"), help="The list region of the screenshots.")
+    parser.add_argument("--scale", type=float, default=DEFAULT_SCALE, help="The scale the offsets are estimated at.")
+    parser.add_argument("--stride", type=int, default=1, help="Only use every Nth frame of a recording.")
+    parser.add_argument("--out", default="stitched_list.png", help="Where to save the stitched list. The segments and rows are saved next to it as JSON.")
+    parser.add_argument("--detector", default="detectRectanglesGeneric", choices=list(DETECTOR_DEFAULTS.keys()), help="The detector to find the rows with.")
+    args = parser.parse_args()
+
+    if not args.paths:
+        self_check()
+    else:
+        stitcher = stitch_frames(iter_frames(args.paths, args.stride), tuple(args.region), args.scale)
+        stitched, segments = stitcher.stitch()
+        rows = detect_rows(stitched, segments, args.detector)
+        stats = stitcher.stats()
+
+        cv2.imwrite(args.out, stitched)
+        with open(os.path.splitext(args.out)[0] + ".json", "w", encoding="utf-8") as f:
+            json.dump({"region": args.region, "stats": stats, "segments": segments, "rows": rows}, f, indent=4)
+        logging.info(
+            f"Stitched {stats['frames']} frames ({stats['skipped']} skipped) into a {stats['list_height']} px list with {len(rows)} rows. "
+            f"{stats['contributing_frames']} frames added new rows; {stats['min_frames']} would cover the list. Saved to {args.out}."
+        )
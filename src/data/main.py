@@ -10,12 +10,32 @@ import time
 import logging
 import os
 from typing import List, Dict, Any
-from difflib import SequenceMatcher
-import bisect
 import requests
 
+from driverWatchdog import DriverWatchdog
+from eventCache import TrainingEventCache
+from eventOptionCompiler import write_compiled_events
+from eventShards import write_event_shards
+from raceRecords import RACE_RECORDS_SCRIPT, compare_races, normalize_race_records
+from scraperTransforms import build_race_entries, format_event_option, get_skill_activation_conditions, link_skill_versions, write_sorted_json
+from skillIconAtlas import build_skill_icon_atlas
+
 IS_DELTA = True
 DELTA_BACKLOG_COUNT = 5
+# Also write the character and support card events as one shard per entity (see eventShards.py).
+WRITE_EVENT_SHARDS = True
+# Also compile the training event options into stat delta vectors (see eventOptionCompiler.py).
+COMPILE_EVENT_OPTIONS = True
+# Skip the training events that were already scraped from an unchanged page (see eventCache.py).
+USE_EVENT_CACHE = True
+# Read all races from the data the races page already loaded instead of opening every race dialog (see raceRecords.py).
+USE_BULK_RACE_EXTRACTION = True
+# The share of the existing races.json the bulk races must agree with to be used instead of the dialogs.
+MIN_BULK_RACE_AGREEMENT = 0.95
+# Seconds before a page load or injected script is abandoned, and without progress before the driver is restarted (see driverWatchdog.py).
+PAGE_LOAD_TIMEOUT_SEC = 30
+SCRIPT_TIMEOUT_SEC = 30
+STALL_TIMEOUT_SEC = 120
 
 # Event name patterns that belong to the "After a Race" section.
 AFTER_RACE_EVENT_PATTERNS = [
@@ -36,6 +56,34 @@ AFTER_RACE_EVENT_PATTERNS = [
     "Etsuko's Exhaustive Coverage (Pre/OP)",
 ]
 
+# Reads the training event buttons of a character or support card page in one round trip.
+# It uses the XPaths of the page layout and leaves out the buttons in the "Events Without Choices"
+# section and, if arguments[0] is true, the "After a Race" section. The section counts are null
+# when the section is not on the page. The fingerprint is the Next.js build ID of the site.
+TRAINING_EVENT_BUTTONS_SCRIPT = """
+const xpath = (expression, context) => {
+    const result = document.evaluate(expression, context || document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    return Array.from({ length: result.snapshotLength }, (_, i) => result.snapshotItem(i));
+};
+const sectionButtons = (title) => {
+    const header = xpath(`//div[contains(@class, 'sc-') and contains(@class, '-0 ') and contains(text(), '${title}')]`)[0];
+    const grid = header && xpath("./following-sibling::div[contains(@class, 'sc-') and contains(@class, '-2 ')][1]", header)[0];
+    return grid ? xpath(".//button[contains(@class, 'sc-') and contains(@class, '-0 ')]", grid) : null;
+};
+const all = xpath("//button[contains(@class, 'sc-') and contains(@class, '-0 ')]");
+const withoutChoices = sectionButtons("Events Without Choices");
+const afterRace = arguments[0] ? sectionButtons("After a Race") : null;
+const excluded = new Set([...(withoutChoices || []), ...(afterRace || [])]);
+return {
+    fingerprint: window.__NEXT_DATA__ ? window.__NEXT_DATA__.buildId : null,
+    page: window.location.pathname,
+    unfiltered: all.length,
+    without_choices: withoutChoices && withoutChoices.length,
+    after_race: afterRace && afterRace.length,
+    events: all.filter((button) => !excluded.has(button)).map((button) => [button, button.innerText.trim()]),
+};
+"""
+
 
 def load_after_race_events() -> Dict[str, List[str]]:
     """Load "After a Race" events from characters.json.
@@ -91,114 +139,12 @@ def create_chromedriver():
     chrome_options.add_argument("--no-sandbox") # Bypass OS security model (needed for some environments like Docker)
     chrome_options.add_argument("--window-size=1920,1080") # Set a default window size for consistent rendering
     driver = webdriver.Chrome(options=chrome_options)
+    # Fail instead of blocking forever on a page or script that never finishes.
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT_SEC)
+    driver.set_script_timeout(SCRIPT_TIMEOUT_SEC)
     return driver
 
 
-def calculate_turn_number(date_string: str) -> int:
-    """Calculates the turn number for a race based on its date string.
-
-    This function parses race date strings in the format "Senior Class January, Second Half"
-    and converts them to turn numbers using the same logic as the Kotlin GameDate.
-
-    Args:
-        date_string: The date string to parse (e.g., "Senior Class January, Second Half").
-
-    Returns:
-        The calculated turn number for the race.
-    """
-    if not date_string or date_string.strip() == "":
-        logging.warning("Received empty date string, defaulting to Senior Year Early Jan (turn 49).")
-        return 49
-
-    # Handle Pre-Debut dates (though they shouldn't appear in race data).
-    if "debut" in date_string.lower():
-        logging.warning("Pre-Debut date detected in race data, this shouldn't happen.")
-        return 1
-
-    # Define mappings for years and months.
-    years = {"Junior Class": 1, "Classic Class": 2, "Senior Class": 3}
-
-    months = {
-        "January": 1,
-        "Jan": 1,
-        "February": 2,
-        "Feb": 2,
-        "March": 3,
-        "Mar": 3,
-        "April": 4,
-        "Apr": 4,
-        "May": 5,
-        "June": 6,
-        "Jun": 6,
-        "July": 7,
-        "Jul": 7,
-        "August": 8,
-        "Aug": 8,
-        "September": 9,
-        "Sep": 9,
-        "October": 10,
-        "Oct": 10,
-        "November": 11,
-        "Nov": 11,
-        "December": 12,
-        "Dec": 12,
-    }
-
-    # Parse the date string.
-    # Expected format: "Senior Class January, Second Half"
-    parts = date_string.strip().split()
-    if len(parts) < 3:
-        logging.warning(f"Invalid date string format: {date_string}, defaulting to Senior Year Early Jan (turn 49).")
-        return 49
-
-    # Extract year part (first two words).
-    year_part = f"{parts[0]} {parts[1]}"
-    month_part = parts[2].rstrip(",")  # Remove trailing comma if present.
-
-    # Extract phase part (last two words combined).
-    phase_part = f"{parts[-2]} {parts[-1]}"  # "First Half" or "Second Half"
-
-    # Find the best match for year using similarity scoring.
-    year = years.get(year_part)
-    if year is None:
-        best_year_score = 0.0
-        best_year = 3  # Default to Senior Year.
-
-        for year_key in years.keys():
-            score = SequenceMatcher(None, year_part, year_key).ratio()
-            if score > best_year_score:
-                best_year_score = score
-                best_year = years[year_key]
-
-        logging.info(f"Year not found in mapping, using best match: {year_part} -> {best_year}")
-        year = best_year
-
-    # Find the best match for month using similarity scoring.
-    month = months.get(month_part)
-    if month is None:
-        best_month_score = 0.0
-        best_month = 1  # Default to January.
-
-        for month_key in months.keys():
-            score = SequenceMatcher(None, month_part, month_key).ratio()
-            if score > best_month_score:
-                best_month_score = score
-                best_month = months[month_key]
-
-        logging.info(f"Month not found in mapping, using best match: {month_part} -> {best_month}")
-        month = best_month
-
-    # Determine phase (Early = First Half, Late = Second Half).
-    phase = "Early" if "First" in phase_part else "Late"
-
-    # Calculate the turn number.
-    # Each year has 24 turns (12 months x 2 phases each).
-    # Each month has 2 turns (Early and Late).
-    turn_number = ((year - 1) * 24) + ((month - 1) * 2) + (1 if phase == "Early" else 2)
-
-    return turn_number
-
-
 def download_image(url: str, out_fp: str):
     """
     Downloads an image from the given URL and saves it to the specified file path.
@@ -222,14 +168,27 @@ class BaseScraper:
     Args:
         url (str): The URL to scrape.
         output_filename (str): The filename to save the scraped data to.
+        shard_kind (str, optional): If set, the data is also saved as one shard per entity and compiled into stat delta vectors under this kind.
     """
 
-    def __init__(self, url: str, output_filename: str):
+    def __init__(self, url: str, output_filename: str, shard_kind: str = None):
         self.url = url
         self.output_filename = output_filename
+        self.shard_kind = shard_kind
         self.data = self.load_existing_data()
         self.initial_data_count = len(self.data) if IS_DELTA else 0
         self.cookie_accepted = False
+        self.watchdog = None
+        self.event_cache = TrainingEventCache(shard_kind) if USE_EVENT_CACHE and shard_kind else None
+
+    def heartbeat(self, label: str = ""):
+        """Tells the driver watchdog, if there is one, that the scraper made progress.
+
+        Args:
+            label (str, optional): What was just done, for the stall warning.
+        """
+        if self.watchdog is not None:
+            self.watchdog.heartbeat(label)
 
     def safe_click(self, driver: webdriver.Chrome, element: WebElement, retries: int = 3, delay: float = 0.5):
         """Try clicking an element normally and falls back to JS click if blocked by ads/overlays.
@@ -282,11 +241,14 @@ class BaseScraper:
 
     def save_data(self):
         """Saves the scraped data to a file."""
-        # Sort keys alphabetically to maintain consistent ordering.
-        sorted_data = {key: self.data[key] for key in sorted(self.data.keys())}
+        sorted_data = write_sorted_json(self.data, self.output_filename)
 
-        with open(self.output_filename, "w", encoding="utf-8") as f:
-            json.dump(sorted_data, f, ensure_ascii=False, indent=4)
+        if WRITE_EVENT_SHARDS and self.shard_kind:
+            write_event_shards(sorted_data, self.shard_kind)
+        if COMPILE_EVENT_OPTIONS and self.shard_kind:
+            write_compiled_events(sorted_data, self.shard_kind)
+        if self.event_cache is not None:
+            self.event_cache.save()
 
         if IS_DELTA and self.initial_data_count > 0:
             new_or_updated = len(self.data) - self.initial_data_count
@@ -353,28 +315,7 @@ class BaseScraper:
             event_result_divs = event_option_div.find_elements(By.XPATH, ".//div")
             text_fragments = [div.text.strip() for div in event_result_divs]
 
-            # Handle events where it offers random outcomes.
-            if text_fragments and "Randomly either" in text_fragments[0]:
-                option_text = "Randomly either\n----------\n"
-
-                # Group the outcomes by dividers.
-                current_group = []
-                for fragment in text_fragments[1:]:
-                    if fragment == "or":
-                        option_text += "\n".join(current_group) + "\n----------\n"
-                        current_group = []
-                    else:
-                        current_group.append(fragment)
-                # Add the last group to the option text.
-                if current_group:
-                    option_text += "\n".join(current_group)
-            else:
-                # Otherwise, just join the text fragments for regular event outcomes.
-                option_text = "\n".join(text_fragments)
-
-            # Replace all instances of "Wisdom" with "Wit" to match the in-game terminology.
-            option_text = option_text.replace("Wisdom", "Wit")
-            options.append(option_text)
+            options.append(format_event_option(text_fragments))
         return options
 
     def process_training_events(self, driver: webdriver.Chrome, item_name: str, data_dict: Dict[str, List[str]], include_after_race_events: bool = False):
@@ -386,60 +327,42 @@ class BaseScraper:
             data_dict (Dict[str, List[str]]): The data dictionary to modify.
             include_after_race_events (bool): Whether to include 'After a Race' events (only for characters).
         """
-        # Find all training events first.
-        all_training_events_unfiltered = driver.find_elements(By.XPATH, "//button[contains(@class, 'sc-') and contains(@class, '-0 ')]")
-        logging.info(f"Found {len(all_training_events_unfiltered)} unfiltered training events for {item_name}.")
-
-        # Find the "Events Without Choices" section header and exclude events from its following grid.
-        # The section header is a div with class 'sc-*-0' containing the text "Events Without Choices".
-        # The grid following it (sc-*-2) contains training events we want to exclude.
-        events_to_exclude = set()
-        try:
-            # Find the div containing "Events Without Choices" text.
-            no_choices_header = driver.find_element(
-                By.XPATH,
-                "//div[contains(@class, 'sc-') and contains(@class, '-0 ') and contains(text(), 'Events Without Choices')]"
-            )
-            # Find the next sibling div which should be the grid containing events without choices.
-            no_choices_grid = no_choices_header.find_element(By.XPATH, "./following-sibling::div[contains(@class, 'sc-') and contains(@class, '-2 ')][1]")
-            # Get all training event buttons within this grid.
-            events_without_choices = no_choices_grid.find_elements(By.XPATH, ".//button[contains(@class, 'sc-') and contains(@class, '-0 ')]")
-            events_to_exclude = set(events_without_choices)
-            logging.info(f"Found {len(events_to_exclude)} events without choices to exclude for {item_name}.")
-        except NoSuchElementException:
+        # Read every training event button and its label in one round trip, without the
+        # "Events Without Choices" and (for characters) the "After a Race" sections.
+        page = driver.execute_script(TRAINING_EVENT_BUTTONS_SCRIPT, include_after_race_events)
+        logging.info(f"Found {page['unfiltered']} unfiltered training events for {item_name}.")
+
+        if page["without_choices"] is None:
             logging.info(f"No \"Events Without Choices\" section found for {item_name}. Including all events.")
+        else:
+            logging.info(f"Found {page['without_choices']} events without choices to exclude for {item_name}.")
 
-        # Filter out the events without choices.
-        all_training_events = [event for event in all_training_events_unfiltered if event not in events_to_exclude]
+        all_training_events = page["events"]
         logging.info(f"Found {len(all_training_events)} training events (after filtering) for {item_name}.")
 
-        # Find the "After a Race" section and exclude its events from scraping.
         # These events are identical across all characters, so we copy them from characters.json.
         if include_after_race_events:
-            after_race_events = set()
-            try:
-                after_race_header = driver.find_element(
-                    By.XPATH,
-                    "//div[contains(@class, 'sc-') and contains(@class, '-0 ') and contains(text(), 'After a Race')]"
-                )
-                after_race_grid = after_race_header.find_element(By.XPATH, "./following-sibling::div[contains(@class, 'sc-') and contains(@class, '-2 ')][1]")
-                after_race_buttons = after_race_grid.find_elements(By.XPATH, ".//button[contains(@class, 'sc-') and contains(@class, '-0 ')]")
-                after_race_events = set(after_race_buttons)
-                logging.info(f"Found {len(after_race_events)} \"After a Race\" events to copy for {item_name}.")
-            except NoSuchElementException:
+            if page["after_race"] is None:
                 logging.info(f"No \"After a Race\" section found for {item_name}.")
-
-            # Filter out the "After a Race" events from the list to scrape.
-            all_training_events = [event for event in all_training_events if event not in after_race_events]
-            logging.info(f"Found {len(all_training_events)} training events (after excluding \"After a Race\") for {item_name}.")
+            else:
+                logging.info(f"Found {page['after_race']} \"After a Race\" events to copy for {item_name}.")
 
             # Copy the "After a Race" events from the preloaded cache.
             data_dict.update(self.after_race_events)
             logging.info(f"Copied {len(self.after_race_events)} \"After a Race\" events for {item_name}.")
 
+        # The events already scraped from this version of the page, by button label.
+        known_events = self.event_cache.known_events(page["page"], page["fingerprint"]) if self.event_cache is not None else {}
+        cache_hits = 0
+
         ad_banner_closed = False
 
-        for j, training_event in enumerate(all_training_events):
+        for j, (training_event, label) in enumerate(all_training_events):
+            # Skip the events that were scraped from this version of the page before and keep their options.
+            if known_events.get(label) in data_dict:
+                cache_hits += 1
+                continue
+
             self.safe_click(driver, training_event)
             time.sleep(1.0)
 
@@ -460,9 +383,15 @@ class BaseScraper:
             logging.info(f"Found {len(tooltip_rows)} options for training event {tooltip_title} ({j + 1}/{len(all_training_events)}).")
             options = self.extract_training_event_options(tooltip_rows)
             data_dict[tooltip_title] = options
+            if self.event_cache is not None:
+                self.event_cache.record(page["page"], page["fingerprint"], label, tooltip_title)
+            self.heartbeat(f"{item_name}: {tooltip_title}")
 
             ad_banner_closed = self.handle_ad_banner(driver, ad_banner_closed)
 
+        if self.event_cache is not None:
+            self.event_cache.record_page(page["page"], cache_hits, len(all_training_events))
+
     def _sort_by_value(self, driver: webdriver.Chrome, value_key: str):
         """Sorts the list elements by the given value key.
 
@@ -685,112 +614,6 @@ class SkillScraper(BaseScraper):
         # It then assigns the skill data to tmp.exports and we return it as a dictionary.
         skill_data = driver.execute_script("let tmp = { exports: null }; window.webpackChunk_N_E.find(chunk => chunk[1] && chunk[1][60930])[1][60930](tmp); return tmp.exports")
         
-        def get_skill_activation_conditions(skill_object: Dict[str, Any], get_preconditions: bool = False):
-            """ Gets the activation condition/precondition string for a skill.
-
-            `skill_data` is a very complex and deeply nested JSON object.
-            For each skill entry in this JSON, we need to extract the conditions
-            and preconditions string values. However, these can be in one of a few places.
-
-            The following is one of the more complex examples from the data:
-
-            {
-                "name_en": "Arrows Whistle, Shadows Disperse",
-                "condition_groups": [
-                    {
-                        "condition": "is_finalcorner==1",
-                        "precondition": "phase>=2&order_rate<=50&overtake_target_time>=2",
-                    }
-                ],
-                "gene_version": {
-                    "condition_groups": [
-                        {
-                            "condition": "is_finalcorner==1",
-                            "precondition": "phase>=2&order_rate<=50&overtake_target_time>=2",
-                        }
-                    ],
-                },
-                "loc": {
-                    "en": {     // Global version
-                        "condition_groups": [
-                            {
-                                "condition": "is_finalcorner==1&order_rate<=40&overtake_target_time>=2",
-                            }
-                        ],
-                        "gene_version": {
-                            "condition_groups": [
-                                {
-                                    "condition": "is_finalcorner==1&order_rate<=40&overtake_target_time>=2",
-                                }
-                            ]
-                        }
-                    }
-                }
-            }
-
-            In this example, we have a unique skill. Since this is a unique skill,
-            it has properties called "gene_version". The "gene_version" is the inherited
-            version that can be purchased when inherited from legacy umamusume.
-
-            If a skill has a gene_version, then we always want to use that data since
-            the non-inherited version can't be purchased.
-
-            However, in these entries we also have the "loc" property. This is the
-            localization (i.e. JP, KO, Global). These localizations may be on different
-            patches and thus may have different values. So we want to make sure to use
-            the Global (en) localization.
-
-            Then within the localization, we can extract our "condition" string.
-            Take note that the "precondition" field is not in the localization.
-            Not every entry contains all of these structures so we have to combine
-            data across the existing fields to get everything we need.
-
-            To do this, we try to get data using the following priority order:
-            1) loc -> en -> gene_version -> condition_groups -> condition/precondition
-            2) loc -> en -> condition_groups -> condition/precondition
-            3) gene_version -> condition_groups -> condition/precondition
-            4) condition_groups -> condition/precondition
-
-            To sum up, we just need to get the most accurate data possible for the
-            global release by combining the best data we can extract from the entry.
-            Not every entry has all these fields so we just take what we can get.
-
-            Args:
-                skill_object (Dict[str, Any]) A single entry from skill_data. This is a complex nested dict.
-                get_preconditions (bool, optional) Whether to get the "preconditions" entry
-                    instead of the "conditions" entry. Defaults to False.
-
-            Returns:
-                The condition string.
-            """
-            # Prioritize getting the english version of the condition group since it
-            # should be the current global patch data.
-            # Always try the gene_version first.
-            groups = skill_object.get("loc", {}).get("en", {}).get("gene_version", None)
-            if groups is not None:
-                groups = skill_object.get("loc", {}).get("en", {}).get("gene_version", {}).get("condition_groups", None)
-            else:
-                groups = skill_object.get("loc", {}).get("en", {}).get("condition_groups", None)
-            
-            # Fall back to main condition_groups field.
-            if groups is None:
-                if "gene_version" in skill_object:
-                    groups = skill_object["gene_version"].get("condition_groups", None)
-                else:
-                    groups = skill_object.get("condition_groups", None)
-    
-            # Just return now if we still havent found anything.
-            if groups is None:
-                return ""
-            
-            res = []
-            for group in groups:
-                condition = group.get("precondition" if get_preconditions else "condition", None)
-                if condition is not None:
-                    res.append(condition)
-
-            return "@".join(res)
-
         skill_id_to_name = {}
         for skill in skill_data:
             try:
@@ -878,32 +701,7 @@ class SkillScraper(BaseScraper):
                 continue
         
         # Populate the upgrade/downgrade versions for every skill.
-        for skill_name, skill in self.data.items():
-            # If skill has no other versions, skip.
-            if skill["versions"] == []:
-                continue
-
-            # Now determine the upgrades/downgrades of this skill.
-            index = bisect.bisect_left(skill["versions"], skill["id"])
-            if index == 0:
-                # This is the highest level of this skill.
-                downgrade_version = skill["versions"][0]
-                if downgrade_version in skill_id_to_name:
-                    self.data[skill_name]["downgrade"] = downgrade_version
-            elif index == len(skill["versions"]):
-                # This is the lowest level of this skill.
-                upgrade_version = skill["versions"][-1]
-                if upgrade_version in skill_id_to_name:
-                    self.data[skill_name]["upgrade"] = upgrade_version
-            else:
-                # Skill has both an upgraded and downgraded variant.
-                upgrade_version = skill["versions"][index - 1]
-                if upgrade_version in skill_id_to_name:
-                    self.data[skill_name]["upgrade"] = upgrade_version
-                
-                downgrade_version = skill["versions"][index]
-                if downgrade_version in skill_id_to_name:
-                    self.data[skill_name]["downgrade"] = downgrade_version
+        link_skill_versions(self.data, skill_id_to_name)
 
         # Save the skill icons
         icon_ids = set(x["icon_id"] for x in self.data.values())
@@ -912,6 +710,9 @@ class SkillScraper(BaseScraper):
             out_fp = f"../pages/SkillSettings/icons/utx_ico_skill_{icon_id}.png"
             download_image(url, out_fp)
 
+        # Pack the icons into sprite sheets so the app decodes a few sheets instead of every icon.
+        build_skill_icon_atlas("../pages/SkillSettings/icons")
+
         self.save_data()
         driver.quit()
 
@@ -924,12 +725,18 @@ class CharacterScraper(BaseScraper):
     """
 
     def __init__(self, after_race_events: Dict[str, List[str]]):
-        super().__init__("https://gametora.com/umamusume/characters", "characters.json")
+        super().__init__("https://gametora.com/umamusume/characters", "characters.json", shard_kind="characters")
         self.after_race_events = after_race_events
 
-    def start(self):
-        """Starts the scraping process."""
-        driver = create_chromedriver()
+    def get_character_links(self, driver: webdriver.Chrome) -> List[str]:
+        """Gets the links of the characters to scrape.
+
+        Args:
+            driver (webdriver.Chrome): The Chrome driver.
+
+        Returns:
+            The character links, newest first.
+        """
         driver.get(self.url)
         time.sleep(5)
 
@@ -953,38 +760,65 @@ class CharacterScraper(BaseScraper):
             logging.info(
                 f"Scraping the first {DELTA_BACKLOG_COUNT} characters for the delta scrape as the list is now sorted by descending release date."
             )
+        return character_links
 
-        # Iterate through each character.
-        for i, link in enumerate(character_links):
-            logging.info(f"Navigating to {link} ({i + 1}/{len(character_links)})")
-            driver.get(link)
-            time.sleep(3)
+    def scrape_character(self, driver: webdriver.Chrome, link: str):
+        """Scrapes the training events of one character.
 
-            character_name = driver.find_element(By.XPATH, "//main//h1").text
-            character_name = character_name.replace("(Original)", "").strip()
-            # Remove any other parentheses that denote different forms of the character like "Wedding" or "Swimsuit".
-            character_name = re.sub(r"\s*\(.*?\)", "", character_name).strip()
+        Args:
+            driver (webdriver.Chrome): The Chrome driver.
+            link (str): The link to the character's page.
+        """
+        driver.get(link)
+        time.sleep(3)
 
-            # Initialize an empty object to store the following character data if it doesn't exist yet.
-            if character_name not in self.data:
-                self.data[character_name] = {}
+        character_name = driver.find_element(By.XPATH, "//main//h1").text
+        character_name = character_name.replace("(Original)", "").strip()
+        # Remove any other parentheses that denote different forms of the character like "Wedding" or "Swimsuit".
+        character_name = re.sub(r"\s*\(.*?\)", "", character_name).strip()
 
-            # Scrape all the Training Events (including "After a Race" events for characters).
-            self.process_training_events(driver, character_name, self.data[character_name], include_after_race_events=True)
+        # Initialize an empty object to store the following character data if it doesn't exist yet.
+        if character_name not in self.data:
+            self.data[character_name] = {}
 
-        self.save_data()
-        driver.quit()
+        # Scrape all the Training Events (including "After a Race" events for characters).
+        self.process_training_events(driver, character_name, self.data[character_name], include_after_race_events=True)
+
+    def start(self):
+        """Starts the scraping process."""
+        # The watchdog restarts the driver and retries the current link if a page hangs or the driver dies.
+        self.watchdog = DriverWatchdog(create_chromedriver, STALL_TIMEOUT_SEC)
+        try:
+            character_links = self.watchdog.run(self.get_character_links, label=self.url)
+
+            # Iterate through each character.
+            for i, link in enumerate(character_links):
+                logging.info(f"Navigating to {link} ({i + 1}/{len(character_links)})")
+                self.watchdog.run(self.scrape_character, link, label=link)
+
+            self.save_data()
+            self.watchdog.log_summary()
+            if self.event_cache is not None:
+                self.event_cache.log_summary()
+        finally:
+            self.watchdog.quit()
 
 
 class SupportCardScraper(BaseScraper):
     """Scrapes the support cards from the website."""
 
     def __init__(self):
-        super().__init__("https://gametora.com/umamusume/supports", "supports.json")
+        super().__init__("https://gametora.com/umamusume/supports", "supports.json", shard_kind="supports")
 
-    def start(self):
-        """Starts the scraping process."""
-        driver = create_chromedriver()
+    def get_support_card_links(self, driver: webdriver.Chrome) -> List[str]:
+        """Gets the links of the support cards to scrape.
+
+        Args:
+            driver (webdriver.Chrome): The Chrome driver.
+
+        Returns:
+            The support card links, newest first.
+        """
         driver.get(self.url)
         time.sleep(5)
 
@@ -1008,36 +842,57 @@ class SupportCardScraper(BaseScraper):
             logging.info(
                 f"Scraping the first {DELTA_BACKLOG_COUNT} support cards for the delta scrape as the list is now sorted by descending release date."
             )
+        return support_card_links
 
-        # Iterate through each support card.
-        for i, link in enumerate(support_card_links):
-            logging.info(f"Navigating to {link} ({i + 1}/{len(support_card_links)})")
-            driver.get(link)
-            time.sleep(3)
-
-            support_card_name = driver.find_element(By.XPATH, "//main//h1").text
-            support_card_name = support_card_name.replace("Support Card", "").strip()
-            # Remove any other parentheses that denote different forms of the support card.
-            support_card_name = re.sub(r"\s*\(.*?\)", "", support_card_name).strip()
-
-            # Initialize an empty object to store the following support card data if it doesn't exist yet.
-            if support_card_name not in self.data:
-                self.data[support_card_name] = {}
-
-            # Extract the rarity from the parentheses.
-            rarity_match = re.search(r"\((SSR|SR|R)\)", support_card_name)
-            if rarity_match:
-                support_card_rarity = rarity_match.group(1)
-                support_card_name = support_card_name.replace(f" ({support_card_rarity})", "").strip()
-            else:
-                # Fallback to a more basic method.
-                support_card_rarity = support_card_name.split(" ")[-1].replace(")", "").replace("(", "").strip()
+    def scrape_support_card(self, driver: webdriver.Chrome, link: str):
+        """Scrapes the training events of one support card.
 
-            # Scrape all the Training Events.
-            self.process_training_events(driver, support_card_name, self.data[support_card_name])
+        Args:
+            driver (webdriver.Chrome): The Chrome driver.
+            link (str): The link to the support card's page.
+        """
+        driver.get(link)
+        time.sleep(3)
+
+        support_card_name = driver.find_element(By.XPATH, "//main//h1").text
+        support_card_name = support_card_name.replace("Support Card", "").strip()
+        # Remove any other parentheses that denote different forms of the support card.
+        support_card_name = re.sub(r"\s*\(.*?\)", "", support_card_name).strip()
+
+        # Initialize an empty object to store the following support card data if it doesn't exist yet.
+        if support_card_name not in self.data:
+            self.data[support_card_name] = {}
+
+        # Extract the rarity from the parentheses.
+        rarity_match = re.search(r"\((SSR|SR|R)\)", support_card_name)
+        if rarity_match:
+            support_card_rarity = rarity_match.group(1)
+            support_card_name = support_card_name.replace(f" ({support_card_rarity})", "").strip()
+        else:
+            # Fallback to a more basic method.
+            support_card_rarity = support_card_name.split(" ")[-1].replace(")", "").replace("(", "").strip()
 
-        self.save_data()
-        driver.quit()
+        # Scrape all the Training Events.
+        self.process_training_events(driver, support_card_name, self.data[support_card_name])
+
+    def start(self):
+        """Starts the scraping process."""
+        # The watchdog restarts the driver and retries the current link if a page hangs or the driver dies.
+        self.watchdog = DriverWatchdog(create_chromedriver, STALL_TIMEOUT_SEC)
+        try:
+            support_card_links = self.watchdog.run(self.get_support_card_links, label=self.url)
+
+            # Iterate through each support card.
+            for i, link in enumerate(support_card_links):
+                logging.info(f"Navigating to {link} ({i + 1}/{len(support_card_links)})")
+                self.watchdog.run(self.scrape_support_card, link, label=link)
+
+            self.save_data()
+            self.watchdog.log_summary()
+            if self.event_cache is not None:
+                self.event_cache.log_summary()
+        finally:
+            self.watchdog.quit()
 
 
 class RaceScraper(BaseScraper):
@@ -1046,14 +901,62 @@ class RaceScraper(BaseScraper):
     def __init__(self):
         super().__init__("https://gametora.com/umamusume/races", "races.json")
 
-    def start(self):
-        """Starts the scraping process."""
-        driver = create_chromedriver()
-        driver.get(self.url)
-        time.sleep(5)
+    def scrape_races_bulk(self, driver: webdriver.Chrome) -> Dict[str, Any]:
+        """Reads every race from the data the races page already loaded, in one call.
 
-        self.handle_cookie_consent(driver)
+        The races are only used if they agree with the existing races.json (see `MIN_BULK_RACE_AGREEMENT`),
+        so every race is opened when there is no races.json to check them against.
+
+        Args:
+            driver (webdriver.Chrome): The Chrome driver on the races page.
+
+        Returns:
+            The races by their unique key, or None if they were not found or do not agree with the existing data.
+        """
+        start = time.perf_counter()
+        reference = self.data
+        if not reference and os.path.exists(self.output_filename):
+            with open(self.output_filename, "r", encoding="utf-8") as f:
+                reference = json.load(f)
+        if not reference:
+            logging.info("No existing races to check the race records against. Falling back to opening every race.")
+            return None
+        known_race_names = sorted({race["name"] for race in reference.values()})[:20]
+
+        records_json = driver.execute_script(RACE_RECORDS_SCRIPT, known_race_names)
+        if not records_json:
+            logging.warning("No race records were found in the page data. Falling back to opening every race.")
+            return None
+
+        normalized, errors = normalize_race_records(json.loads(records_json))
+        for error in errors[:5]:
+            logging.warning(f"Failed to read race record: {error}")
+
+        races = {}
+        for name, info_map, schedules in normalized:
+            for race_data in build_race_entries(name, info_map, schedules):
+                # Create a unique key that combines race name and date to handle duplicate race names.
+                races[f"{race_data['name']} ({race_data['date']})"] = race_data
+
+        report = compare_races(races, reference)
+        logging.info(
+            f"Read {len(races)} races from {len(normalized)} race records in {time.perf_counter() - start:.1f} seconds with {len(errors)} error(s). "
+            f"Against the existing data: {report['matching']} matching, {report['differing']} differing, {report['missing']} missing and {report['new']} new."
+        )
+        for example in report["examples"]:
+            logging.info(f"Differs: {example}")
 
+        if not races or report["agreement"] < MIN_BULK_RACE_AGREEMENT or len(errors) > 0.05 * (len(normalized) + len(errors)):
+            logging.warning("The race records do not match the existing races. Falling back to opening every race.")
+            return None
+        return races
+
+    def scrape_race_dialogs(self, driver: webdriver.Chrome):
+        """Scrapes every race by opening its dialog.
+
+        Args:
+            driver (webdriver.Chrome): The Chrome driver on the races page.
+        """
         # Get references to all the races in the list.
         race_items = driver.find_elements(By.XPATH, ".//div[contains(@class, 'sc-5615e33d-0')]")
 
@@ -1084,42 +987,23 @@ class RaceScraper(BaseScraper):
             dialog = driver.find_element(By.XPATH, "//div[@role='dialog']").find_element(By.XPATH, ".//div[contains(@class, 'races_det_wrapper')]")
             dialog_infobox = dialog.find_element(By.XPATH, ".//div[contains(@class, 'races_det_infobox')]")
             dialog_schedules = dialog.find_elements(By.XPATH, ".//div[contains(@class, 'races_det_schedule')]")
-            for dialog_schedule in dialog_schedules:
-                dialog_schedule_items = dialog_schedule.find_elements(By.XPATH, ".//div[contains(@class, 'races_schedule_item')]")
 
-                # Extract all caption-value pairs for the elements.
-                captions = dialog_infobox.find_elements(By.XPATH, ".//div[contains(@class, 'races_det_item_caption')]")
-                values = dialog_infobox.find_elements(By.XPATH, ".//div[contains(@class, 'races_det_item__')]")
-                info_map = {}
-                for cap, val in zip(captions, values):
-                    info_map[cap.text.strip()] = val.text.strip()
-
-                race_data = {
-                    "name": dialog.find_element(By.XPATH, ".//div[contains(@class, 'races_det_header')]").text,
-                    "date": dialog_schedule.find_element(By.XPATH, ".//div[contains(@class, 'races_schedule_header')]").text.replace("\n", " "),
-                    "raceTrack": info_map.get("Racetrack"),
-                    "course": info_map.get("Course"),
-                    "direction": "Right" if info_map.get("Direction") and info_map.get("Direction") == "Clockwise" else "Left",
-                    "grade": info_map.get("Grade"),
-                    "terrain": info_map.get("Terrain"),
-                    "distanceType": info_map.get("Distance (type)"),
-                    "distanceMeters": int(info_map.get("Distance (meters)")),
-                    "fans": int(
-                        dialog_schedule_items[-1].text.replace("Fans gained", "").replace("for 1st place", "").replace("See all", "").strip()
-                    ),
-                }
+            # Extract all caption-value pairs for the elements.
+            captions = dialog_infobox.find_elements(By.XPATH, ".//div[contains(@class, 'races_det_item_caption')]")
+            values = dialog_infobox.find_elements(By.XPATH, ".//div[contains(@class, 'races_det_item__')]")
+            info_map = {}
+            for cap, val in zip(captions, values):
+                info_map[cap.text.strip()] = val.text.strip()
 
-                # Calculate turn number based on the race date.
-                race_data["turnNumber"] = calculate_turn_number(race_data["date"])
-
-                # Construct the in-game formatted name of the race.
-                distance_type_formatted = "Med" if info_map.get("Distance (type)") == "Medium" else info_map.get("Distance (type)")
-                race_data["nameFormatted"] = (
-                    f"{race_data['raceTrack']} {race_data['terrain']} {race_data['distanceMeters']}m ({distance_type_formatted}) {race_data['direction']}"
-                )
-                if race_data["course"]:
-                    race_data["nameFormatted"] += f" / {race_data['course']}"
+            schedules = []
+            for dialog_schedule in dialog_schedules:
+                dialog_schedule_items = dialog_schedule.find_elements(By.XPATH, ".//div[contains(@class, 'races_schedule_item')]")
+                date = dialog_schedule.find_element(By.XPATH, ".//div[contains(@class, 'races_schedule_header')]").text.replace("\n", " ")
+                fans = int(dialog_schedule_items[-1].text.replace("Fans gained", "").replace("for 1st place", "").replace("See all", "").strip())
+                schedules.append((date, fans))
 
+            race_name = dialog.find_element(By.XPATH, ".//div[contains(@class, 'races_det_header')]").text
+            for race_data in build_race_entries(race_name, info_map, schedules):
                 logging.info(f"Race data: {race_data}")
 
                 # Create a unique key that combines race name and date to handle duplicate race names.
@@ -1131,6 +1015,20 @@ class RaceScraper(BaseScraper):
             dialog_close_button.click()
             time.sleep(0.5)
 
+    def start(self):
+        """Starts the scraping process."""
+        driver = create_chromedriver()
+        driver.get(self.url)
+        time.sleep(5)
+
+        self.handle_cookie_consent(driver)
+
+        races = self.scrape_races_bulk(driver) if USE_BULK_RACE_EXTRACTION else None
+        if races is not None:
+            self.data.update(races)
+        else:
+            self.scrape_race_dialogs(driver)
+
         self.save_data()
         driver.quit()
 
@@ -0,0 +1,260 @@
+"""Headless parameter sweep for the rectangle detectors in `imageDetection.py`.
+
+Every parameter combination is run against the sample screenshots listed in a
+ground-truth file and scored with precision, recall and mean IoU against the
+expected rectangles together with its latency. Configurations are evaluated
+across a process pool so that large grids finish in reasonable time.
+
+The ground-truth file maps each screenshot to its expected rectangles in
+full-frame (x, y, w, h) coordinates:
+
+    {
+        "imageDetectionSample.png": {"rects": [[46, 875, 986, 234], ...]},
+        ...
+    }
+
+Run it with: `python parameterSweep.py --detector detectRectanglesGeneric`
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+import cv2
+
+from imageDetection import DETECTOR_DEFAULTS, run_detector
+
+DEFAULT_GROUND_TRUTH_FP = os.path.join(os.path.dirname(__file__), "imageDetectionGroundTruth.json")
+
+# The values tried for each tunable parameter.
+SEARCH_SPACES = {
+    "detectRectangles": {
+        "blur_size": [3, 5, 7, 9],
+        "epsilon_scalar": [0.01, 0.02, 0.04],
+        "use_adaptive_threshold": [True, False],
+        "canny_lower_threshold": [10, 30, 50],
+        "canny_upper_threshold": [50, 100, 150],
+        "adaptive_threshold_block_size": [7, 11, 15, 21],
+    },
+    "detectRectanglesGeneric": {
+        "blur_size": [3, 5, 7, 9],
+        "lo_diff_val": [0, 1, 2, 3],
+        "up_diff_val": [0, 1, 2, 3],
+        "kernel_size": [25, 50, 100, 150],
+    },
+}
+
+# Parameters that only matter for one branch of a detector. Combinations that only
+# differ in a parameter of the branch that is not taken are the same configuration.
+INACTIVE_PARAMETERS = {
+    "detectRectangles": lambda params: (
+        ["canny_lower_threshold", "canny_upper_threshold"] if params["use_adaptive_threshold"] else ["adaptive_threshold_block_size"]
+    ),
+}
+
+# Loaded once per worker process by `_init_worker`.
+_worker_samples = None
+
+
+def load_ground_truth(fp: str) -> Dict[str, List[Tuple[int, int, int, int]]]:
+    """Loads the ground-truth rectangles.
+
+    Args:
+        fp (str): The ground-truth JSON file. Image paths are relative to it.
+
+    Returns:
+        A dictionary mapping each image path to its expected rectangles.
+    """
+    with open(fp, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(fp))
+    return {os.path.join(base_dir, image_fp): [tuple(rect) for rect in entry["rects"]] for image_fp, entry in data.items()}
+
+
+def generate_configs(detector: str, search: str = "grid", num_samples: int = 100, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generates the parameter configurations to evaluate.
+
+    Args:
+        detector (str): The detector to tune.
+        search (str, optional): "grid" for every combination or "random" for a random subset. Defaults to "grid".
+        num_samples (int, optional): How many configurations to draw for a random search. Defaults to 100.
+        seed (int, optional): The random seed for a random search. Defaults to 0.
+
+    Returns:
+        The unique parameter configurations.
+    """
+    space = SEARCH_SPACES[detector]
+    names = list(space.keys())
+    combinations = [dict(zip(names, values)) for values in itertools.product(*space.values())]
+    if search == "random":
+        combinations = random.Random(seed).sample(combinations, min(num_samples, len(combinations)))
+    elif search != "grid":
+        raise ValueError(f"Unknown search type: {search}")
+
+    # Reset the parameters of untaken branches to their defaults and drop the duplicates this creates.
+    configs = []
+    seen = set()
+    for params in combinations:
+        for name in INACTIVE_PARAMETERS.get(detector, lambda _: [])(params):
+            params[name] = DETECTOR_DEFAULTS[detector][name]
+
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(params)
+    return configs
+
+
+def compute_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Computes the intersection over union of two (x, y, w, h) rectangles."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def match_rects(detected: List[Tuple[int, int, int, int]], expected: List[Tuple[int, int, int, int]], iou_threshold: float = 0.5) -> List[float]:
+    """Greedily matches detected rectangles to the expected ones by IoU.
+
+    Args:
+        detected (List[Tuple[int, int, int, int]]): The detected rectangles.
+        expected (List[Tuple[int, int, int, int]]): The ground-truth rectangles.
+        iou_threshold (float, optional): The minimum IoU for a match. Defaults to 0.5.
+
+    Returns:
+        The IoU of every matched pair. Its length is the number of true positives.
+    """
+    pairs = sorted(
+        ((compute_iou(d, e), i, j) for i, d in enumerate(detected) for j, e in enumerate(expected)),
+        reverse=True,
+    )
+
+    used_detected, used_expected = set(), set()
+    ious = []
+    for iou, i, j in pairs:
+        if iou < iou_threshold:
+            break
+        if i in used_detected or j in used_expected:
+            continue
+        used_detected.add(i)
+        used_expected.add(j)
+        ious.append(iou)
+    return ious
+
+
+def _init_worker(image_fps: List[str]):
+    """Decodes the sample images once per worker process."""
+    global _worker_samples
+    _worker_samples = {fp: cv2.imread(fp) for fp in image_fps}
+
+
+def evaluate_config(args: Tuple[str, Dict[str, Any], Dict[str, List[Tuple[int, int, int, int]]], float]) -> Dict[str, Any]:
+    """Scores one parameter configuration against every sample.
+
+    Args:
+        args: The detector, its parameter overrides, the ground truth and the IoU threshold.
+
+    Returns:
+        The configuration with its precision, recall, F1, mean IoU and latency.
+    """
+    detector, params, ground_truth, iou_threshold = args
+
+    true_positives = num_detected = num_expected = 0
+    ious = []
+    latencies = []
+    for image_fp, expected in ground_truth.items():
+        image = _worker_samples[image_fp]
+        start = time.perf_counter()
+        detected = run_detector(detector, image, **params)
+        latencies.append(time.perf_counter() - start)
+
+        matched = match_rects(detected, expected, iou_threshold)
+        true_positives += len(matched)
+        num_detected += len(detected)
+        num_expected += len(expected)
+        ious.extend(matched)
+
+    precision = true_positives / num_detected if num_detected else 0.0
+    recall = true_positives / num_expected if num_expected else 0.0
+    return {
+        "params": params,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "mean_iou": sum(ious) / len(ious) if ious else 0.0,
+        "mean_latency_ms": 1000.0 * sum(latencies) / len(latencies),
+    }
+
+
+def run_sweep(
+    detector: str,
+    ground_truth_fp: str = DEFAULT_GROUND_TRUTH_FP,
+    search: str = "grid",
+    num_samples: int = 100,
+    seed: int = 0,
+    iou_threshold: float = 0.5,
+    processes: int = None,
+) -> List[Dict[str, Any]]:
+    """Evaluates every configuration of a detector across a process pool.
+
+    Args:
+        detector (str): The detector to tune.
+        ground_truth_fp (str, optional): The ground-truth JSON file.
+        search (str, optional): "grid" or "random". Defaults to "grid".
+        num_samples (int, optional): How many configurations to draw for a random search. Defaults to 100.
+        seed (int, optional): The random seed for a random search. Defaults to 0.
+        iou_threshold (float, optional): The minimum IoU for a detection to count. Defaults to 0.5.
+        processes (int, optional): The number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        The results sorted from best to worst by F1, mean IoU and then latency.
+    """
+    ground_truth = load_ground_truth(ground_truth_fp)
+    configs = generate_configs(detector, search, num_samples, seed)
+    logging.info(f"Evaluating {len(configs)} {detector} configurations on {len(ground_truth)} samples.")
+
+    start = time.perf_counter()
+    jobs = [(detector, params, ground_truth, iou_threshold) for params in configs]
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(list(ground_truth.keys()),)) as pool:
+        results = list(pool.imap_unordered(evaluate_config, jobs, chunksize=4))
+    logging.info(f"Sweep finished in {time.perf_counter() - start:.1f} seconds.")
+
+    results.sort(key=lambda r: (-r["f1"], -r["mean_iou"], r["mean_latency_ms"]))
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Headless parameter sweep for the rectangle detectors.")
+    parser.add_argument("--detector", choices=list(SEARCH_SPACES.keys()), default="detectRectanglesGeneric", help="The detector to tune.")
+    parser.add_argument("--ground-truth", default=DEFAULT_GROUND_TRUTH_FP, help="Ground-truth JSON file of expected rectangles per sample.")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid", help="Evaluate every combination or a random subset.")
+    parser.add_argument("--samples", type=int, default=100, help="Number of configurations for a random search.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for a random search.")
+    parser.add_argument("--iou-threshold", type=float, default=0.5, help="Minimum IoU for a detection to count as a match.")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes. Defaults to the CPU count.")
+    parser.add_argument("--top", type=int, default=10, help="Number of configurations to print.")
+    parser.add_argument("--out", default=None, help="Optional JSON file to write every result to.")
+    args = parser.parse_args()
+
+    results = run_sweep(args.detector, args.ground_truth, args.search, args.samples, args.seed, args.iou_threshold, args.processes)
+
+    for rank, result in enumerate(results[: args.top], start=1):
+        logging.info(
+            f"#{rank}: F1 {result['f1']:.3f} | precision {result['precision']:.3f} | recall {result['recall']:.3f} | "
+            f"IoU {result['mean_iou']:.3f} | {result['mean_latency_ms']:.1f} ms | {result['params']}"
+        )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        logging.info(f"Saved {len(results)} results to {args.out}.")
@@ -0,0 +1,356 @@
+"""Bulk extraction of the race list from the data the races page already loaded.
+
+`RaceScraper` used to open the dialog of every one of the ~370 races, wait for
+it, read its captions and schedules element by element and close it again.
+The page renders those dialogs from race records it already has, either in the
+Next.js page props (`__NEXT_DATA__`) or in one of its webpack modules.
+`RACE_RECORDS_SCRIPT` finds them in one call:
+
+- It looks for an array (or an object of objects) of at least 50 records whose
+  keys mention a name, a distance and a schedule/date, first in the page props
+  and then in the exports of the webpack modules whose source mentions one of
+  the given race names.
+- `normalize_race_record` maps a record to what the dialog shows: the caption
+  values ("Racetrack", "Course", "Direction", "Grade", "Terrain",
+  "Distance (type)", "Distance (meters)") and a (date, fans) pair per schedule.
+  The game's numeric codes (track IDs, grade, ground, turn and course codes,
+  year/month/half of a schedule) and their display strings are both accepted.
+- `compare_races` checks the result against the existing `races.json` so that
+  `RaceScraper` only uses it when it agrees with what the dialogs showed, and
+  falls back to them otherwise.
+
+Run it with: `python raceRecords.py` to round-trip `races.json` through the game
+codes and check the normalization, or `--records dump.json` to normalize records
+dumped from the page (e.g. with `copy(...)` in the browser console) and compare
+them against `races.json`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RACES_FP = os.path.join(os.path.dirname(__file__), "races.json")
+
+# Races that are not part of the regular calendar and are left out like the first 2 and last 7 rows of the races list.
+EXCLUDED_RACE_PATTERNS = ["Make Debut", "Maiden Race", "URA Finals", "Grand Masters", "Twinkle Star Climax"]
+
+# The fields compared by `compare_races`. The turn number and formatted name are derived from them.
+COMPARED_FIELDS = ["name", "date", "raceTrack", "course", "direction", "grade", "terrain", "distanceType", "distanceMeters", "fans"]
+
+# Finds the race records in the page props or the loaded webpack modules and returns them as JSON.
+# arguments[0] is a list of race names to recognize the race module by.
+RACE_RECORDS_SCRIPT = """
+const looksLikeRaces = (value) => {
+    if (!value || typeof value !== "object") return null;
+    const records = Array.isArray(value) ? value : Object.values(value);
+    if (records.length < 50 || !records[0] || typeof records[0] !== "object") return null;
+    const keys = Object.keys(records[0]).join(" ");
+    return /name/i.test(keys) && /distance/i.test(keys) && /(schedule|date)/i.test(keys) ? records : null;
+};
+const candidates = [];
+const visit = (value, depth) => {
+    if (!value || typeof value !== "object" || depth < 0) return;
+    const records = looksLikeRaces(value);
+    if (records) {
+        candidates.push(records);
+        return;
+    }
+    for (const child of Object.values(value)) visit(child, depth - 1);
+};
+
+if (window.__NEXT_DATA__) visit(window.__NEXT_DATA__.props, 6);
+if (candidates.length === 0 && window.webpackChunk_N_E) {
+    // Get the webpack require function by pushing a chunk that only has a runtime callback.
+    let webpackRequire = null;
+    window.webpackChunk_N_E.push([[Symbol("races")], {}, (r) => { webpackRequire = r; }]);
+    for (const id of Object.keys((webpackRequire && webpackRequire.m) || {})) {
+        const source = String(webpackRequire.m[id]);
+        if (!arguments[0].some((name) => source.includes(name))) continue;
+        try {
+            visit(webpackRequire(id), 3);
+        } catch (e) {}
+    }
+}
+if (candidates.length === 0) return null;
+return JSON.stringify(candidates.reduce((a, b) => (b.length > a.length ? b : a)));
+"""
+
+# The game's codes and the names the races page shows for them.
+TRACK_NAMES = {
+    10001: "Sapporo",
+    10002: "Hakodate",
+    10003: "Niigata",
+    10004: "Fukushima",
+    10005: "Nakayama",
+    10006: "Tokyo",
+    10007: "Chukyo",
+    10008: "Kyoto",
+    10009: "Hanshin",
+    10010: "Kokura",
+    10101: "Ooi",
+}
+GRADE_NAMES = {100: "G1", 200: "G2", 300: "G3", 400: "OP", 700: "Pre-OP"}
+TERRAIN_NAMES = {1: "Turf", 2: "Dirt"}
+DIRECTION_NAMES = {1: "Clockwise", 2: "Counterclockwise"}
+COURSE_NAMES = {1: None, 2: "Inner", 3: "Outer"}
+YEAR_NAMES = {1: "Junior Class", 2: "Classic Class", 3: "Senior Class"}
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+HALF_NAMES = {1: "First Half", 2: "Second Half"}
+# Directions stored as the side the track turns to, mapped to what the dialog shows.
+DIRECTION_ALIASES = {"Right": "Clockwise", "Left": "Counterclockwise"}
+
+# The keys a record may store each value under, in order of preference.
+FIELD_ALIASES = {
+    "name": ["name_en", "name", "race_name"],
+    "track": ["racetrack", "track", "race_track", "racetrack_id", "track_id"],
+    "course": ["course", "inout", "in_out"],
+    "direction": ["direction", "turn"],
+    "grade": ["grade"],
+    "terrain": ["terrain", "ground", "surface"],
+    "distance": ["distance", "distance_meters", "distanceMeters"],
+    "schedules": ["schedules", "schedule", "dates"],
+    "year": ["year", "class"],
+    "month": ["month"],
+    "half": ["half"],
+    "date": ["date"],
+    "fans": ["fans", "fans_gained", "fan", "fans_1st"],
+}
+
+
+def _field(record: Dict[str, Any], field: str, default: Any = KeyError) -> Any:
+    for key in FIELD_ALIASES[field]:
+        if key in record:
+            return record[key]
+    if default is KeyError:
+        raise ValueError(f"The record has none of the keys {FIELD_ALIASES[field]}: {sorted(record.keys())}")
+    return default
+
+
+def _lookup(value: Any, names: Dict[int, Optional[str]], field: str) -> Optional[str]:
+    """Maps a game code to its name and passes names through."""
+    if isinstance(value, str) and not value.isdigit():
+        return value
+    try:
+        return names[int(value)]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Unknown {field}: {value!r}")
+
+
+def _normalize_direction(direction: Optional[str]) -> Optional[str]:
+    """Maps "Right"/"Left" to the "Clockwise"/"Counterclockwise" that `build_race_entries` expects."""
+    return DIRECTION_ALIASES.get(direction, direction)
+
+
+def distance_type(meters: int) -> str:
+    """Gets the distance category of a race distance.
+
+    Args:
+        meters (int): The distance of the race.
+
+    Returns:
+        "Short", "Mile", "Medium" or "Long".
+    """
+    if meters <= 1400:
+        return "Short"
+    if meters <= 1800:
+        return "Mile"
+    if meters <= 2400:
+        return "Medium"
+    return "Long"
+
+
+def schedule_date(schedule: Dict[str, Any]) -> str:
+    """Formats the date of a schedule like the race dialog does, e.g. "Senior Class January, Second Half".
+
+    Args:
+        schedule (Dict[str, Any]): Either a "date" string or the year (1-3), month (1-12) and half (1-2).
+
+    Returns:
+        The date string.
+    """
+    date = _field(schedule, "date", None)
+    if isinstance(date, str):
+        return date
+    year = _lookup(_field(schedule, "year"), YEAR_NAMES, "year")
+    month = _field(schedule, "month")
+    month = month if isinstance(month, str) else MONTH_NAMES[int(month) - 1]
+    half = _lookup(_field(schedule, "half"), HALF_NAMES, "half")
+    return f"{year} {month}, {half}"
+
+
+def normalize_race_record(record: Dict[str, Any]) -> Tuple[str, Dict[str, str], List[Tuple[str, int]]]:
+    """Maps a race record of the page to what its dialog shows.
+
+    Args:
+        record (Dict[str, Any]): The race record.
+
+    Raises:
+        ValueError: If a value is missing or a code is unknown.
+
+    Returns:
+        The race name, its caption values by caption and a (date, fans) pair per schedule.
+    """
+    meters = int(_field(record, "distance"))
+    info_map = {
+        "Racetrack": _lookup(_field(record, "track"), TRACK_NAMES, "track"),
+        "Course": _lookup(_field(record, "course", None), COURSE_NAMES, "course"),
+        "Direction": _normalize_direction(_lookup(_field(record, "direction"), DIRECTION_NAMES, "direction")),
+        "Grade": _lookup(_field(record, "grade"), GRADE_NAMES, "grade"),
+        "Terrain": _lookup(_field(record, "terrain"), TERRAIN_NAMES, "terrain"),
+        "Distance (type)": distance_type(meters),
+        "Distance (meters)": str(meters),
+    }
+
+    schedules = _field(record, "schedules")
+    if isinstance(schedules, dict):
+        schedules = [schedules]
+    if not schedules:
+        raise ValueError(f"The record has no schedules: {record}")
+    return _field(record, "name"), info_map, [(schedule_date(schedule), int(_field(schedule, "fans"))) for schedule in schedules]
+
+
+def normalize_race_records(records: Iterable[Dict[str, Any]]) -> Tuple[List[Tuple[str, Dict[str, str], List[Tuple[str, int]]]], List[str]]:
+    """Normalizes the race records of the page, leaving out the races in `EXCLUDED_RACE_PATTERNS`.
+
+    Args:
+        records (Iterable[Dict[str, Any]]): The race records.
+
+    Returns:
+        The normalized races (see `normalize_race_record`) and an error message for every record that could not be normalized.
+    """
+    races, errors = [], []
+    for record in records:
+        try:
+            race = normalize_race_record(record)
+        except (ValueError, TypeError, IndexError) as e:
+            errors.append(str(e))
+            continue
+        if not any(pattern in race[0] for pattern in EXCLUDED_RACE_PATTERNS):
+            races.append(race)
+    return races, errors
+
+
+def compare_races(races: Dict[str, Dict[str, Any]], reference: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Compares races against a reference, e.g. the existing `races.json`.
+
+    Args:
+        races (Dict[str, Dict[str, Any]]): The races by their "name (date)" key.
+        reference (Dict[str, Dict[str, Any]]): The reference races by the same key.
+
+    Returns:
+        The number of matching, differing, missing and new races, the share of the
+            reference that matches (0 without a reference) and a few example differences.
+    """
+    matching, differing, missing = 0, 0, 0
+    examples = []
+    for key, expected in reference.items():
+        race = races.get(key)
+        if race is None:
+            missing += 1
+            continue
+        fields = [field for field in COMPARED_FIELDS if race.get(field) != expected.get(field)]
+        if fields:
+            differing += 1
+            if len(examples) < 5:
+                examples.append(f"{key}: " + ", ".join(f"{field} {expected.get(field)!r} -> {race.get(field)!r}" for field in fields))
+        else:
+            matching += 1
+    return {
+        "matching": matching,
+        "differing": differing,
+        "missing": missing,
+        "new": len(set(races) - set(reference)),
+        "agreement": matching / len(reference) if reference else 0.0,
+        "examples": examples,
+    }
+
+
+def to_game_records(races: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Encodes `races.json` entries as game-code records with one record per race and its schedules, for the self-check."""
+    codes = {
+        "track": {name: code for code, name in TRACK_NAMES.items()},
+        "grade": {name: code for code, name in GRADE_NAMES.items()},
+        "terrain": {name: code for code, name in TERRAIN_NAMES.items()},
+        "course": {name: code for code, name in COURSE_NAMES.items()},
+        "year": {name: code for code, name in YEAR_NAMES.items()},
+        "half": {name: code for code, name in HALF_NAMES.items()},
+    }
+    records: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+    for race in races.values():
+        key = (race["name"], race["raceTrack"], race["distanceMeters"])
+        record = records.setdefault(
+            key,
+            {
+                "name_en": race["name"],
+                "track": codes["track"][race["raceTrack"]],
+                "inout": codes["course"][race["course"]],
+                "turn": 1 if race["direction"] == "Right" else 2,
+                "grade": codes["grade"][race["grade"]],
+                "ground": codes["terrain"][race["terrain"]],
+                "distance": race["distanceMeters"],
+                "schedules": [],
+            },
+        )
+        # e.g. "Senior Class January, Second Half".
+        parts = race["date"].replace(",", "").split()
+        year, month, half = " ".join(parts[:2]), parts[2], " ".join(parts[3:])
+        record["schedules"].append({"year": codes["year"][year], "month": MONTH_NAMES.index(month) + 1, "half": codes["half"][half], "fans": race["fans"]})
+    return list(records.values())
+
+
+def races_from_records(records: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Builds the compared fields of the `races.json` entries from race records, without the derived turn number and formatted name."""
+    normalized, errors = normalize_race_records(records)
+    races = {}
+    for name, info_map, schedules in normalized:
+        for date, fans in schedules:
+            races[f"{name} ({date})"] = {
+                "name": name,
+                "date": date,
+                "raceTrack": info_map["Racetrack"],
+                "course": info_map["Course"],
+                "direction": "Right" if info_map["Direction"] == "Clockwise" else "Left",
+                "grade": info_map["Grade"],
+                "terrain": info_map["Terrain"],
+                "distanceType": info_map["Distance (type)"],
+                "distanceMeters": int(info_map["Distance (meters)"]),
+                "fans": fans,
+            }
+    return races, errors
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Checks the normalization of the race records against races.json.")
+    parser.add_argument("--races", default=DEFAULT_RACES_FP, help="The races.json to compare against.")
+    parser.add_argument("--records", default=None, help="Optional JSON file of race records dumped from the races page.")
+    args = parser.parse_args()
+
+    with open(args.races, "r", encoding="utf-8") as f:
+        reference = json.load(f)
+
+    if args.records:
+        with open(args.records, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        records = to_game_records(reference)
+        logging.info(f"Encoded the {len(reference)} races of {args.races} as {len(records)} game-code records.")
+
+    start = time.perf_counter()
+    races, errors = races_from_records(records)
+    elapsed_ms = 1000.0 * (time.perf_counter() - start)
+    report = compare_races(races, reference)
+
+    logging.info(f"Normalized {len(races)} races in {elapsed_ms:.1f} ms with {len(errors)} error(s).")
+    for error in errors[:5]:
+        logging.warning(f"    {error}")
+    logging.info(
+        f"Against {args.races}: {report['matching']} matching, {report['differing']} differing, {report['missing']} missing "
+        f"and {report['new']} new ({100.0 * report['agreement']:.1f}% agreement)."
+    )
+    for example in report["examples"]:
+        logging.info(f"    {example}")
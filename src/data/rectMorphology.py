@@ -0,0 +1,148 @@
+"""Fast morphology with large rectangular kernels on binary masks.
+
+`cv2.erode`/`cv2.dilate` already split a rectangular kernel into a row and a
+column pass, but each pass still looks at every pixel of the kernel, so the
+cost grows linearly with the kernel size. `detectRectanglesGeneric` opens its
+mask with a 100x100 kernel and `detectScrollBar` closes its mask with one, which
+makes morphology the most expensive stage of both pipelines.
+
+For a binary mask, erosion and dilation only need to know whether a window
+contains any background or any foreground pixel. That is a window sum, and
+`cv2.boxFilter` computes window sums with running sums whose cost does not
+depend on the kernel size. The results are identical to OpenCV's, including the
+anchor and border handling, as long as the mask only holds 0 and 255.
+
+Run it with: `python rectMorphology.py` to benchmark it against OpenCV across kernel sizes.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from frameBuffers import FrameBuffers
+
+# Below this kernel width and height OpenCV's own morphology is still faster than the window sums.
+MIN_BOX_FILTER_KERNEL_SIZE = 50
+
+
+def _window_counts(indicator: np.ndarray, kernel_size: Tuple[int, int], buffers: FrameBuffers, name: str) -> np.ndarray:
+    """Counts the set pixels of a 0/1 image in the window around every pixel."""
+    kernel_w, kernel_h = kernel_size
+    ddepth, dtype = (cv2.CV_16U, np.uint16) if kernel_w * kernel_h <= np.iinfo(np.uint16).max else (cv2.CV_32S, np.int32)
+    # Pixels outside of the image count as unset. This matches OpenCV's default
+    # morphology border, which never erodes or dilates from outside of the image.
+    counts = buffers.get(f"{name}_counts", indicator.shape, dtype)
+    return cv2.boxFilter(indicator, ddepth, (kernel_w, kernel_h), dst=counts, normalize=False, borderType=cv2.BORDER_CONSTANT)
+
+
+def erode_rect(mask: np.ndarray, kernel_size: Tuple[int, int], buffers: FrameBuffers = None, name: str = "erode") -> np.ndarray:
+    """Erodes a 0/255 mask with a rectangular kernel of the given (width, height), reusing `buffers` if specified."""
+    buffers = buffers if buffers is not None else FrameBuffers()
+    background = cv2.threshold(mask, 0, 1, cv2.THRESH_BINARY_INV, dst=buffers.get(f"{name}_indicator", mask.shape))[1]
+    return cv2.compare(_window_counts(background, kernel_size, buffers, name), 0, cv2.CMP_EQ, dst=buffers.get(name, mask.shape))
+
+
+def dilate_rect(mask: np.ndarray, kernel_size: Tuple[int, int], buffers: FrameBuffers = None, name: str = "dilate") -> np.ndarray:
+    """Dilates a 0/255 mask with a rectangular kernel of the given (width, height), reusing `buffers` if specified."""
+    buffers = buffers if buffers is not None else FrameBuffers()
+    foreground = cv2.threshold(mask, 0, 1, cv2.THRESH_BINARY, dst=buffers.get(f"{name}_indicator", mask.shape))[1]
+    return cv2.compare(_window_counts(foreground, kernel_size, buffers, name), 0, cv2.CMP_GT, dst=buffers.get(name, mask.shape))
+
+
+def morphology_rect(
+    mask: np.ndarray, op: int, kernel_size: Union[int, Tuple[int, int]], buffers: FrameBuffers = None, name: str = "morph"
+) -> np.ndarray:
+    """
+    Applies a morphological operation with a rectangular kernel to a binary mask.
+
+    This is a drop-in replacement for
+    `cv2.morphologyEx(mask, op, np.ones((kernel_h, kernel_w), np.uint8))` that runs
+    in constant time per pixel regardless of the kernel size. Small kernels are
+    passed through to OpenCV since it is faster for them.
+
+    Args:
+        mask (np.ndarray): The single-channel uint8 mask. Must only contain 0 and 255.
+        op (int): One of cv2.MORPH_ERODE, cv2.MORPH_DILATE, cv2.MORPH_OPEN or cv2.MORPH_CLOSE.
+        kernel_size (Union[int, Tuple[int, int]]): The kernel size, or its (width, height).
+        buffers (FrameBuffers): Buffers for the kernel, the intermediate images and the
+            result, so that calls on masks of the same size do not allocate. New ones are
+            allocated if not specified.
+        name (str): Prefixes the names of the buffers. Calls whose results are used at
+            the same time need different names.
+
+    Returns:
+        np.ndarray: The resulting 0/255 mask.
+    """
+    buffers = buffers if buffers is not None else FrameBuffers()
+    kernel_w, kernel_h = (kernel_size, kernel_size) if isinstance(kernel_size, int) else kernel_size
+    if min(kernel_w, kernel_h) < MIN_BOX_FILTER_KERNEL_SIZE:
+        kernel = buffers.constant(f"{name}_kernel", (kernel_h, kernel_w), 1)
+        return cv2.morphologyEx(mask, op, kernel, dst=buffers.get(name, mask.shape))
+
+    kernel_size = (kernel_w, kernel_h)
+    if op == cv2.MORPH_ERODE:
+        return erode_rect(mask, kernel_size, buffers, name)
+    elif op == cv2.MORPH_DILATE:
+        return dilate_rect(mask, kernel_size, buffers, name)
+    elif op == cv2.MORPH_OPEN:
+        return dilate_rect(erode_rect(mask, kernel_size, buffers, f"{name}_erode"), kernel_size, buffers, name)
+    elif op == cv2.MORPH_CLOSE:
+        return erode_rect(dilate_rect(mask, kernel_size, buffers, f"{name}_dilate"), kernel_size, buffers, name)
+    raise ValueError(f"Unsupported morphological operation: {op}")
+
+
+def benchmark(image_fp: str, kernel_sizes: Sequence[int] = (5, 25, 50, 100, 150, 200), repeat: int = 10):
+    """
+    Compares `morphology_rect` against `cv2.morphologyEx` on the masks of the detectors.
+
+    Args:
+        image_fp (str): The screenshot to build the masks from.
+        kernel_sizes (Sequence[int]): The kernel sizes to benchmark.
+        repeat (int): How many times each measurement is repeated.
+    """
+    from imageDetection import DETECTOR_DEFAULTS, color_range_mask, flood_fill_mask, get_scrollbar_color_boundaries
+
+    image = cv2.imread(image_fp)
+    defaults = DETECTOR_DEFAULTS["detectRectanglesGeneric"]
+    x, y, w, h = defaults["crop_x"], defaults["crop_y"], defaults["crop_w"], defaults["crop_h"]
+    cropped = image[y : y + h, x : x + w]
+    masks = {
+        "generic open": (cv2.MORPH_OPEN, flood_fill_mask(cv2.GaussianBlur(cropped, (defaults["blur_size"],) * 2, 0), 1, 1)),
+        "scrollbar close": (cv2.MORPH_CLOSE, color_range_mask(cv2.cvtColor(cropped, cv2.COLOR_BGR2HSV), get_scrollbar_color_boundaries())),
+    }
+
+    def best_time(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return 1000.0 * min(times)
+
+    logging.info(f"Benchmark on {image_fp} ({w}x{h} crop), best of {repeat}:")
+    for name, (op, mask) in masks.items():
+        for kernel_size in kernel_sizes:
+            expected = cv2.morphologyEx(mask, op, np.ones((kernel_size, kernel_size), np.uint8))
+            if not np.array_equal(morphology_rect(mask, op, kernel_size), expected):
+                logging.warning(f"    {name} with a {kernel_size}x{kernel_size} kernel differs from cv2.morphologyEx.")
+
+            opencv_ms = best_time(lambda: cv2.morphologyEx(mask, op, np.ones((kernel_size, kernel_size), np.uint8)))
+            box_ms = best_time(lambda: morphology_rect(mask, op, kernel_size))
+            logging.info(f"    {name:<16} {kernel_size:>4}x{kernel_size:<4}: cv2.morphologyEx {opencv_ms:6.2f} ms | morphology_rect {box_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks the rectangular-kernel morphology against OpenCV.")
+    parser.add_argument("--image", default=os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"), help="The screenshot to build the masks from.")
+    parser.add_argument("--kernel-sizes", type=int, nargs="+", default=[5, 25, 50, 100, 150, 200], help="The kernel sizes to benchmark.")
+    parser.add_argument("--repeat", type=int, default=10, help="How many times each measurement is repeated.")
+    args = parser.parse_args()
+
+    benchmark(args.image, args.kernel_sizes, args.repeat)
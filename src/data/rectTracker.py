@@ -0,0 +1,372 @@
+"""Cross-frame tracking of the detected rectangles in recordings.
+
+In a recording the detectors of `imageDetection.py` redo their whole pipeline
+on every frame, even when the cards or list rows only moved by a scroll offset
+since the previous one. `RectTracker` runs the full detector on keyframes only
+and carries the rectangles forward in between:
+
+- The global shift between consecutive frames is estimated with phase
+  correlation on a downscaled grayscale copy of the detector's region.
+- Every carried rectangle is checked by comparing its content in the previous
+  frame with the shifted position in the current frame. Like the detectors,
+  rectangles that scrolled partly out of the region are clipped to it, and
+  dropped once too little of them is left.
+- A keyframe is forced when the correlation is weak or a rectangle does not
+  match (tracking confidence dropped), when the accumulated shift since the
+  last keyframe may have revealed new rectangles, and every `keyframe_interval`
+  frames.
+- On keyframes the detections are associated with the tracked rectangles by
+  IoU, then by centroid distance, so every rectangle keeps a stable ID while it
+  stays visible.
+
+Run it with: `python rectTracker.py` to compare tracking against detecting every
+frame on a synthetic scroll through the sample skill list, or add
+`--video recording.mp4` to run it on a recording.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from imageDetection import DETECTOR_DEFAULTS, DetectorPipeline
+from videoSource import VideoSource
+
+DEFAULT_SCALE = 0.25
+# Correlation peaks below this force a keyframe.
+DEFAULT_MIN_RESPONSE = 0.2
+# The mean absolute gray difference (0-255) above which a carried rectangle does not match its content any more.
+DEFAULT_MAX_PATCH_DIFFERENCE = 12.0
+# The accumulated shift since the last keyframe, as a fraction of the region size, after which new rectangles may have scrolled in.
+DEFAULT_MAX_DRIFT = 0.15
+# The detectors report rects inset this many pixels from the edges of their region.
+REGION_INSET = 2
+# Rects clipped to less than this fraction of their height or width are dropped, like the detectors do.
+MIN_VISIBLE_FRACTION = 0.4
+
+Rect = Tuple[int, int, int, int]
+
+
+def iou(a: Rect, b: Rect) -> float:
+    """The intersection over union of two (x, y, w, h) rects."""
+    overlap_w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    overlap_h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+    intersection = overlap_w * overlap_h
+    return intersection / float(a[2] * a[3] + b[2] * b[3] - intersection)
+
+
+def associate(previous: List[Rect], current: List[Rect], min_iou: float = 0.3) -> Dict[int, int]:
+    """Matches rects across frames by IoU, then by centroid distance.
+
+    Args:
+        previous (List[Rect]): The rects carried from the previous frame.
+        current (List[Rect]): The rects of the current frame.
+        min_iou (float, optional): The lowest IoU that is matched. Defaults to 0.3.
+
+    Returns:
+        The index in `previous` of every matched index in `current`.
+    """
+    pairs = sorted(((iou(p, c), i, j) for i, p in enumerate(previous) for j, c in enumerate(current)), reverse=True)
+    matches, used = {}, set()
+    for score, i, j in pairs:
+        if score < min_iou:
+            break
+        if i not in used and j not in matches:
+            matches[j] = i
+            used.add(i)
+
+    # Rects that changed size too much for the IoU can still be matched by a close centroid.
+    for j, c in enumerate(current):
+        if j in matches:
+            continue
+        best, best_distance = None, 0.5 * max(c[2], c[3])
+        for i, p in enumerate(previous):
+            if i in used:
+                continue
+            distance = np.hypot((p[0] + p[2] / 2) - (c[0] + c[2] / 2), (p[1] + p[3] / 2) - (c[1] + c[3] / 2))
+            if distance < best_distance:
+                best, best_distance = i, distance
+        if best is not None:
+            matches[j] = best
+            used.add(best)
+    return matches
+
+
+class RectTracker:
+    """
+    Runs a detector on keyframes and tracks its rectangles with a global shift in between.
+
+    Args:
+        detector (str): The detector to run. One of the `DETECTOR_DEFAULTS` keys.
+        params (Dict[str, Any]): Overrides for the detector's `DETECTOR_DEFAULTS`.
+        keyframe_interval (int): The most frames between two full detections. Defaults to 30.
+        scale (float): The scale the shift is estimated at. Defaults to 0.25.
+        min_response (float): Correlation peaks below this force a keyframe. Defaults to 0.2.
+        max_patch_difference (float): The mean absolute gray difference above which a carried
+            rectangle is lost and a keyframe is forced. Defaults to 12.
+        max_drift (float): The accumulated shift since the last keyframe, as a fraction of the
+            region size, after which a keyframe is forced to find rectangles that scrolled in. Defaults to 0.15.
+    """
+
+    def __init__(
+        self,
+        detector: str,
+        params: Dict[str, Any] = None,
+        keyframe_interval: int = 30,
+        scale: float = DEFAULT_SCALE,
+        min_response: float = DEFAULT_MIN_RESPONSE,
+        max_patch_difference: float = DEFAULT_MAX_PATCH_DIFFERENCE,
+        max_drift: float = DEFAULT_MAX_DRIFT,
+    ):
+        if detector not in DETECTOR_DEFAULTS:
+            raise ValueError(f"Unknown detector: {detector}")
+        self.detector = detector
+        self.params = {**DETECTOR_DEFAULTS[detector], **(params or {})}
+        self.keyframe_interval = keyframe_interval
+        self.scale = scale
+        self.min_response = min_response
+        self.max_patch_difference = max_patch_difference
+        self.max_drift = max_drift
+        self.pipeline = DetectorPipeline(detector, **self.params)
+
+        self.tracks: Dict[int, Rect] = {}
+        self.num_frames = 0
+        self.num_keyframes = 0
+        self.keyframe_reasons: Dict[str, int] = {}
+
+        self._next_id = 0
+        self._previous_gray = None
+        self._since_keyframe = 0
+        self._drift = np.zeros(2)
+        self._window = None
+        # The unclipped rects, which keep moving while they are partly out of the region.
+        self._extents: Dict[int, Rect] = {}
+
+    def _region(self, image: np.ndarray) -> Tuple[int, int, int, int]:
+        if "crop_x" in self.params:
+            return self.params["crop_x"], self.params["crop_y"], self.params["crop_w"], self.params["crop_h"]
+        return 0, 0, image.shape[1], image.shape[0]
+
+    def _gray(self, image: np.ndarray) -> np.ndarray:
+        x, y, w, h = self._region(image)
+        gray = cv2.cvtColor(image[y : y + h, x : x + w], cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32)
+
+    def _estimate_shift(self, previous: np.ndarray, current: np.ndarray) -> Tuple[np.ndarray, float]:
+        if self._window is None or self._window.shape != current.shape:
+            self._window = cv2.createHanningWindow(current.shape[::-1], cv2.CV_32F)
+        (dx, dy), response = cv2.phaseCorrelate(previous, current, self._window)
+        return np.array([dx, dy]) / self.scale, response
+
+    def _patch_difference(self, previous: np.ndarray, current: np.ndarray, rect: Rect, shift: np.ndarray, origin: Tuple[int, int]) -> float:
+        # Compare the rect in the previous frame with where it moved to, in the downscaled region.
+        x0 = int(round((rect[0] - origin[0]) * self.scale))
+        y0 = int(round((rect[1] - origin[1]) * self.scale))
+        w = max(1, int(round(rect[2] * self.scale)))
+        h = max(1, int(round(rect[3] * self.scale)))
+        dx, dy = int(round(shift[0] * self.scale)), int(round(shift[1] * self.scale))
+        region_h, region_w = current.shape
+        if min(x0, y0, x0 + dx, y0 + dy) < 0 or max(x0, x0 + dx) + w > region_w or max(y0, y0 + dy) + h > region_h:
+            # It is leaving the region and will be dropped anyway.
+            return 0.0
+        return float(np.mean(np.abs(previous[y0 : y0 + h, x0 : x0 + w] - current[y0 + dy : y0 + dy + h, x0 + dx : x0 + dx + w])))
+
+    @staticmethod
+    def _clip(rect: Rect, region: Tuple[int, int, int, int]):
+        x0 = max(rect[0], region[0] + REGION_INSET)
+        y0 = max(rect[1], region[1] + REGION_INSET)
+        x1 = min(rect[0] + rect[2], region[0] + region[2] - REGION_INSET)
+        y1 = min(rect[1] + rect[3], region[1] + region[3] - REGION_INSET)
+        if x1 - x0 < MIN_VISIBLE_FRACTION * rect[2] or y1 - y0 < MIN_VISIBLE_FRACTION * rect[3]:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def _keyframe(self, image: np.ndarray, frame_id: int, reason: str) -> Dict[int, Rect]:
+        rects = self.pipeline.run(image, frame_id)
+        ids = list(self.tracks.keys())
+        matches = associate(list(self.tracks.values()), rects)
+
+        tracks = {}
+        for j, rect in enumerate(rects):
+            if j in matches:
+                track_id = ids[matches[j]]
+            else:
+                track_id = self._next_id
+                self._next_id += 1
+            tracks[track_id] = tuple(int(v) for v in rect)
+
+        self.tracks = tracks
+        self._extents = dict(tracks)
+        self.num_keyframes += 1
+        self.keyframe_reasons[reason] = self.keyframe_reasons.get(reason, 0) + 1
+        self._since_keyframe = 0
+        self._drift[:] = 0
+        return self.tracks
+
+    def update(self, image: np.ndarray, frame_id: int = None) -> Tuple[Dict[int, Rect], bool]:
+        """
+        Gets the rectangles of the next frame.
+
+        Args:
+            image (np.ndarray): The BGR frame.
+            frame_id (int): The ID of the frame, passed on to the detector on keyframes. Every
+                call is treated as a new frame if not specified.
+
+        Returns:
+            (Tuple[Dict[int, Rect], bool]): The (x, y, w, h) rects by their stable ID, and whether
+                the frame was a keyframe.
+        """
+        self.num_frames += 1
+        gray = self._gray(image)
+        previous_gray, self._previous_gray = self._previous_gray, gray
+        region = self._region(image)
+
+        if previous_gray is None or previous_gray.shape != gray.shape:
+            return self._keyframe(image, frame_id, "first"), True
+        if self._since_keyframe + 1 >= self.keyframe_interval:
+            return self._keyframe(image, frame_id, "interval"), True
+
+        shift, response = self._estimate_shift(previous_gray, gray)
+        if response < self.min_response:
+            return self._keyframe(image, frame_id, "weak correlation"), True
+
+        self._drift += shift
+        if abs(self._drift[0]) > self.max_drift * region[2] or abs(self._drift[1]) > self.max_drift * region[3]:
+            return self._keyframe(image, frame_id, "drift"), True
+
+        tracks = {}
+        extents = {}
+        for track_id, rect in self.tracks.items():
+            if self._patch_difference(previous_gray, gray, rect, shift, region[:2]) > self.max_patch_difference:
+                return self._keyframe(image, frame_id, "lost rectangle"), True
+
+            extent = self._extents[track_id]
+            moved = (int(round(extent[0] + shift[0])), int(round(extent[1] + shift[1])), extent[2], extent[3])
+            clipped = self._clip(moved, region)
+            if clipped is not None:
+                tracks[track_id] = clipped
+                extents[track_id] = moved
+
+        self.tracks = tracks
+        self._extents = extents
+        self._since_keyframe += 1
+        return self.tracks, False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarizes the tracking so far.
+
+        Returns:
+            (Dict[str, Any]): The number of frames and keyframes, the keyframe rate and the keyframes by reason.
+        """
+        return {
+            "frames": self.num_frames,
+            "keyframes": self.num_keyframes,
+            "keyframe_rate": self.num_keyframes / self.num_frames if self.num_frames else 0.0,
+            "keyframe_reasons": dict(self.keyframe_reasons),
+            "ids": self._next_id,
+        }
+
+
+def synthesize_scroll(num_frames: int = 240, speed: float = 4.0, view_h: int = 420, noise: float = 1.5, seed: int = 0) -> Tuple[List[np.ndarray], Tuple[int, int, int, int]]:
+    """Makes a recording of a view scrolling up and down the skill list of `imageDetectionSample.png`.
+
+    Args:
+        num_frames (int, optional): How many frames to make. Defaults to 240.
+        speed (float, optional): The scroll speed in pixels per frame. Defaults to 4.
+        view_h (int, optional): The height of the view. Defaults to 420.
+        noise (float, optional): The standard deviation of the noise added to every frame. Defaults to 1.5.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        The frames and the view region.
+    """
+    sample = cv2.imread(os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"))
+    params = DETECTOR_DEFAULTS["detectRectanglesGeneric"]
+    x, y, w, h = params["crop_x"], params["crop_y"], params["crop_w"], params["crop_h"]
+    full_list = sample[y : y + h, x : x + w].copy()
+
+    rng = np.random.default_rng(seed)
+    span = h - view_h
+    frames = []
+    for i in range(num_frames):
+        # Scroll down and back up, pausing for a while at both ends like a user reading the list.
+        phase = (i * speed) % (2 * span + 2 * 120)
+        offset = min(phase, span) if phase < span + 120 else max(0, span - (phase - span - 120))
+        frame = sample.copy()
+        frame[y : y + view_h, x : x + w] = full_list[int(offset) : int(offset) + view_h]
+        frames.append(np.clip(frame + rng.normal(0.0, noise, frame.shape), 0, 255).astype(np.uint8))
+    return frames, (x, y, w, view_h)
+
+
+def benchmark(frames: List[np.ndarray], detector: str = "detectRectanglesGeneric", params: Dict[str, Any] = None, keyframe_interval: int = 30):
+    """Compares tracking against detecting every frame.
+
+    Args:
+        frames (List[np.ndarray]): The frames of the recording.
+        detector (str, optional): The detector to run. Defaults to "detectRectanglesGeneric".
+        params (Dict[str, Any], optional): Overrides for the detector's parameters.
+        keyframe_interval (int, optional): The most frames between two full detections. Defaults to 30.
+    """
+    params = params or {}
+    pipeline = DetectorPipeline(detector, **params)
+    full_times, full_rects = [], []
+    for image in frames:
+        start = time.perf_counter()
+        full_rects.append(pipeline.run(image))
+        full_times.append(time.perf_counter() - start)
+
+    tracker = RectTracker(detector, params, keyframe_interval)
+    track_times, tracked = [], []
+    for i, image in enumerate(frames):
+        start = time.perf_counter()
+        tracks, _ = tracker.update(image, i)
+        track_times.append(time.perf_counter() - start)
+        tracked.append(dict(tracks))
+
+    # Compare the tracked rects with the full detection of the same frame.
+    ious, num_missed, num_extra = [], 0, 0
+    for rects, tracks in zip(full_rects, tracked):
+        matches = associate(list(tracks.values()), rects, min_iou=0.5)
+        ious.extend(iou(list(tracks.values())[i], rects[j]) for j, i in matches.items())
+        num_missed += len(rects) - len(matches)
+        num_extra += len(tracks) - len(matches)
+
+    stats = tracker.stats()
+    logging.info(f"Full detection: {1000.0 * np.mean(full_times):.2f} ms per frame (p95 {1000.0 * np.percentile(full_times, 95):.2f} ms).")
+    logging.info(
+        f"Tracking: {1000.0 * np.mean(track_times):.2f} ms per frame (p95 {1000.0 * np.percentile(track_times, 95):.2f} ms), "
+        f"{stats['keyframes']} keyframes in {stats['frames']} frames ({100.0 * stats['keyframe_rate']:.1f}%) {stats['keyframe_reasons']}, "
+        f"{np.mean(full_times) / np.mean(track_times):.1f}x faster."
+    )
+    logging.info(
+        f"Against full detection: mean IoU {np.mean(ious) if ious else 0.0:.3f}, {num_missed} missed and {num_extra} extra rects "
+        f"over {sum(len(rects) for rects in full_rects)} detected. {stats['ids']} track IDs were handed out."
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Compares rectangle tracking with full detection on every frame.")
+    parser.add_argument("--video", default=None, help="The recording to run on. Defaults to a synthetic scroll through the sample skill list.")
+    parser.add_argument("--detector", default="detectRectanglesGeneric", choices=list(DETECTOR_DEFAULTS.keys()), help="The detector to track.")
+    parser.add_argument("--stride", type=int, default=1, help="Only use every Nth frame of the recording.")
+    parser.add_argument("--max-frames", type=int, default=600, help="The most frames of the recording to use.")
+    parser.add_argument("--keyframe-interval", type=int, default=30, help="The most frames between two full detections.")
+    args = parser.parse_args()
+
+    if args.video:
+        with VideoSource(args.video, stride=args.stride) as source:
+            video_frames = [image for _, (_, _, image) in zip(range(args.max_frames), source)]
+        benchmark(video_frames, args.detector, keyframe_interval=args.keyframe_interval)
+    else:
+        synthetic_frames, (x, y, w, h) = synthesize_scroll()
+        benchmark(synthetic_frames, args.detector, {"crop_x": x, "crop_y": y, "crop_w": w, "crop_h": h}, args.keyframe_interval)
@@ -0,0 +1,351 @@
+"""Pure data transforms of the scrapers in `main.py`.
+
+The scrapers mix two kinds of work: driving the browser, which is slow and needs
+Selenium and a live site, and turning what the site returned into the JSON files
+of the app, which is pure Python. The second kind lives here so that it can be
+imported without Selenium and timed or checked against the JSON files already in
+the repo, see transformBenchmark.py.
+"""
+
+import bisect
+import json
+import logging
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+
+def calculate_turn_number(date_string: str) -> int:
+    """Calculates the turn number for a race based on its date string.
+
+    This function parses race date strings in the format "Senior Class January, Second Half"
+    and converts them to turn numbers using the same logic as the Kotlin GameDate.
+
+    Args:
+        date_string: The date string to parse (e.g., "Senior Class January, Second Half").
+
+    Returns:
+        The calculated turn number for the race.
+    """
+    if not date_string or date_string.strip() == "":
+        logging.warning("Received empty date string, defaulting to Senior Year Early Jan (turn 49).")
+        return 49
+
+    # Handle Pre-Debut dates (though they shouldn't appear in race data).
+    if "debut" in date_string.lower():
+        logging.warning("Pre-Debut date detected in race data, this shouldn't happen.")
+        return 1
+
+    # Define mappings for years and months.
+    years = {"Junior Class": 1, "Classic Class": 2, "Senior Class": 3}
+
+    months = {
+        "January": 1,
+        "Jan": 1,
+        "February": 2,
+        "Feb": 2,
+        "March": 3,
+        "Mar": 3,
+        "April": 4,
+        "Apr": 4,
+        "May": 5,
+        "June": 6,
+        "Jun": 6,
+        "July": 7,
+        "Jul": 7,
+        "August": 8,
+        "Aug": 8,
+        "September": 9,
+        "Sep": 9,
+        "October": 10,
+        "Oct": 10,
+        "November": 11,
+        "Nov": 11,
+        "December": 12,
+        "Dec": 12,
+    }
+
+    # Parse the date string.
+    # Expected format: "Senior Class January, Second Half"
+    parts = date_string.strip().split()
+    if len(parts) < 3:
+        logging.warning(f"Invalid date string format: {date_string}, defaulting to Senior Year Early Jan (turn 49).")
+        return 49
+
+    # Extract year part (first two words).
+    year_part = f"{parts[0]} {parts[1]}"
+    month_part = parts[2].rstrip(",")  # Remove trailing comma if present.
+
+    # Extract phase part (last two words combined).
+    phase_part = f"{parts[-2]} {parts[-1]}"  # "First Half" or "Second Half"
+
+    # Find the best match for year using similarity scoring.
+    year = years.get(year_part)
+    if year is None:
+        best_year_score = 0.0
+        best_year = 3  # Default to Senior Year.
+
+        for year_key in years.keys():
+            score = SequenceMatcher(None, year_part, year_key).ratio()
+            if score > best_year_score:
+                best_year_score = score
+                best_year = years[year_key]
+
+        logging.info(f"Year not found in mapping, using best match: {year_part} -> {best_year}")
+        year = best_year
+
+    # Find the best match for month using similarity scoring.
+    month = months.get(month_part)
+    if month is None:
+        best_month_score = 0.0
+        best_month = 1  # Default to January.
+
+        for month_key in months.keys():
+            score = SequenceMatcher(None, month_part, month_key).ratio()
+            if score > best_month_score:
+                best_month_score = score
+                best_month = months[month_key]
+
+        logging.info(f"Month not found in mapping, using best match: {month_part} -> {best_month}")
+        month = best_month
+
+    # Determine phase (Early = First Half, Late = Second Half).
+    phase = "Early" if "First" in phase_part else "Late"
+
+    # Calculate the turn number.
+    # Each year has 24 turns (12 months x 2 phases each).
+    # Each month has 2 turns (Early and Late).
+    turn_number = ((year - 1) * 24) + ((month - 1) * 2) + (1 if phase == "Early" else 2)
+
+    return turn_number
+
+
+def build_race_entries(name: str, info_map: Dict[str, str], schedules: List[tuple]) -> List[Dict[str, Any]]:
+    """Builds the races.json entries of a race, one per schedule.
+
+    Args:
+        name: The name of the race.
+        info_map: The values of the race dialog by caption, e.g. "Racetrack" or "Distance (meters)".
+        schedules: A (date, fans) pair for every date the race is held on, e.g. ("Senior Class January, Second Half", 3600).
+
+    Returns:
+        The race entries with their turn number and in-game formatted name.
+    """
+    entries = []
+    for date, fans in schedules:
+        race_data = {
+            "name": name,
+            "date": date,
+            "raceTrack": info_map.get("Racetrack"),
+            "course": info_map.get("Course"),
+            "direction": "Right" if info_map.get("Direction") and info_map.get("Direction") == "Clockwise" else "Left",
+            "grade": info_map.get("Grade"),
+            "terrain": info_map.get("Terrain"),
+            "distanceType": info_map.get("Distance (type)"),
+            "distanceMeters": int(info_map.get("Distance (meters)")),
+            "fans": fans,
+        }
+
+        # Calculate turn number based on the race date.
+        race_data["turnNumber"] = calculate_turn_number(race_data["date"])
+
+        # Construct the in-game formatted name of the race.
+        distance_type_formatted = "Med" if info_map.get("Distance (type)") == "Medium" else info_map.get("Distance (type)")
+        race_data["nameFormatted"] = (
+            f"{race_data['raceTrack']} {race_data['terrain']} {race_data['distanceMeters']}m ({distance_type_formatted}) {race_data['direction']}"
+        )
+        if race_data["course"]:
+            race_data["nameFormatted"] += f" / {race_data['course']}"
+        entries.append(race_data)
+    return entries
+
+
+def get_skill_activation_conditions(skill_object: Dict[str, Any], get_preconditions: bool = False):
+    """ Gets the activation condition/precondition string for a skill.
+
+    `skill_data` is a very complex and deeply nested JSON object.
+    For each skill entry in this JSON, we need to extract the conditions
+    and preconditions string values. However, these can be in one of a few places.
+
+    The following is one of the more complex examples from the data:
+
+    {
+        "name_en": "Arrows Whistle, Shadows Disperse",
+        "condition_groups": [
+            {
+                "condition": "is_finalcorner==1",
+                "precondition": "phase>=2&order_rate<=50&overtake_target_time>=2",
+            }
+        ],
+        "gene_version": {
+            "condition_groups": [
+                {
+                    "condition": "is_finalcorner==1",
+                    "precondition": "phase>=2&order_rate<=50&overtake_target_time>=2",
+                }
+            ],
+        },
+        "loc": {
+            "en": {     // Global version
+                "condition_groups": [
+                    {
+                        "condition": "is_finalcorner==1&order_rate<=40&overtake_target_time>=2",
+                    }
+                ],
+                "gene_version": {
+                    "condition_groups": [
+                        {
+                            "condition": "is_finalcorner==1&order_rate<=40&overtake_target_time>=2",
+                        }
+                    ]
+                }
+            }
+        }
+    }
+
+    In this example, we have a unique skill. Since this is a unique skill,
+    it has properties called "gene_version". The "gene_version" is the inherited
+    version that can be purchased when inherited from legacy umamusume.
+
+    If a skill has a gene_version, then we always want to use that data since
+    the non-inherited version can't be purchased.
+
+    However, in these entries we also have the "loc" property. This is the
+    localization (i.e. JP, KO, Global). These localizations may be on different
+    patches and thus may have different values. So we want to make sure to use
+    the Global (en) localization.
+
+    Then within the localization, we can extract our "condition" string.
+    Take note that the "precondition" field is not in the localization.
+    Not every entry contains all of these structures so we have to combine
+    data across the existing fields to get everything we need.
+
+    To do this, we try to get data using the following priority order:
+    1) loc -> en -> gene_version -> condition_groups -> condition/precondition
+    2) loc -> en -> condition_groups -> condition/precondition
+    3) gene_version -> condition_groups -> condition/precondition
+    4) condition_groups -> condition/precondition
+
+    To sum up, we just need to get the most accurate data possible for the
+    global release by combining the best data we can extract from the entry.
+    Not every entry has all these fields so we just take what we can get.
+
+    Args:
+        skill_object (Dict[str, Any]) A single entry from skill_data. This is a complex nested dict.
+        get_preconditions (bool, optional) Whether to get the "preconditions" entry
+            instead of the "conditions" entry. Defaults to False.
+
+    Returns:
+        The condition string.
+    """
+    # Prioritize getting the english version of the condition group since it
+    # should be the current global patch data.
+    # Always try the gene_version first.
+    groups = skill_object.get("loc", {}).get("en", {}).get("gene_version", None)
+    if groups is not None:
+        groups = skill_object.get("loc", {}).get("en", {}).get("gene_version", {}).get("condition_groups", None)
+    else:
+        groups = skill_object.get("loc", {}).get("en", {}).get("condition_groups", None)
+
+    # Fall back to main condition_groups field.
+    if groups is None:
+        if "gene_version" in skill_object:
+            groups = skill_object["gene_version"].get("condition_groups", None)
+        else:
+            groups = skill_object.get("condition_groups", None)
+
+    # Just return now if we still havent found anything.
+    if groups is None:
+        return ""
+
+    res = []
+    for group in groups:
+        condition = group.get("precondition" if get_preconditions else "condition", None)
+        if condition is not None:
+            res.append(condition)
+
+    return "@".join(res)
+
+
+def link_skill_versions(skills: Dict[str, Dict[str, Any]], skill_id_to_name: Dict[int, str]):
+    """Populates the upgrade/downgrade versions of every skill in place.
+
+    Args:
+        skills (Dict[str, Dict[str, Any]]): The skills by name, with their sorted `versions`.
+        skill_id_to_name (Dict[int, str]): The names of the scraped skills by ID. Versions that were not scraped are not linked.
+    """
+    for skill_name, skill in skills.items():
+        # If skill has no other versions, skip.
+        if skill["versions"] == []:
+            continue
+
+        # Now determine the upgrades/downgrades of this skill.
+        index = bisect.bisect_left(skill["versions"], skill["id"])
+        if index == 0:
+            # This is the highest level of this skill.
+            downgrade_version = skill["versions"][0]
+            if downgrade_version in skill_id_to_name:
+                skills[skill_name]["downgrade"] = downgrade_version
+        elif index == len(skill["versions"]):
+            # This is the lowest level of this skill.
+            upgrade_version = skill["versions"][-1]
+            if upgrade_version in skill_id_to_name:
+                skills[skill_name]["upgrade"] = upgrade_version
+        else:
+            # Skill has both an upgraded and downgraded variant.
+            upgrade_version = skill["versions"][index - 1]
+            if upgrade_version in skill_id_to_name:
+                skills[skill_name]["upgrade"] = upgrade_version
+
+            downgrade_version = skill["versions"][index]
+            if downgrade_version in skill_id_to_name:
+                skills[skill_name]["downgrade"] = downgrade_version
+
+
+def format_event_option(text_fragments: List[str]) -> str:
+    """Formats the text of a training event option from the text of its tooltip divs.
+
+    Args:
+        text_fragments (List[str]): The stripped text of every div of the option.
+
+    Returns:
+        The option text, with the outcomes of a random option separated by dividers.
+    """
+    # Handle events where it offers random outcomes.
+    if text_fragments and "Randomly either" in text_fragments[0]:
+        option_text = "Randomly either\n----------\n"
+
+        # Group the outcomes by dividers.
+        current_group = []
+        for fragment in text_fragments[1:]:
+            if fragment == "or":
+                option_text += "\n".join(current_group) + "\n----------\n"
+                current_group = []
+            else:
+                current_group.append(fragment)
+        # Add the last group to the option text.
+        if current_group:
+            option_text += "\n".join(current_group)
+    else:
+        # Otherwise, just join the text fragments for regular event outcomes.
+        option_text = "\n".join(text_fragments)
+
+    # Replace all instances of "Wisdom" with "Wit" to match the in-game terminology.
+    return option_text.replace("Wisdom", "Wit")
+
+
+def write_sorted_json(data: Dict[str, Any], output_filename: str) -> Dict[str, Any]:
+    """Writes the data to a JSON file with its keys sorted alphabetically.
+
+    Args:
+        data (Dict[str, Any]): The data by name.
+        output_filename (str): The path of the JSON file.
+
+    Returns:
+        The sorted data.
+    """
+    # Sort keys alphabetically to maintain consistent ordering.
+    sorted_data = {key: data[key] for key in sorted(data.keys())}
+
+    with open(output_filename, "w", encoding="utf-8") as f:
+        json.dump(sorted_data, f, ensure_ascii=False, indent=4)
+    return sorted_data
@@ -0,0 +1,317 @@
+"""Compiles the skill activation conditions of `skills.json` for batch evaluation.
+
+`SkillScraper` stores the activation condition and precondition of every skill
+as the raw strings of the website, e.g.
+
+    phase>=2&order_rate<=50&overtake_target_time>=2@phase>=2&corner!=0
+
+where "&" joins the terms of a group and "@" joins alternative groups, so a
+condition holds when every term of at least one group holds. Evaluating them by
+splitting and parsing the strings for every race state is slow. `ConditionSet`
+parses and validates them once into flat arrays:
+
+- The distinct terms as a variable ID, an operator code and a constant.
+  The same term (e.g. "phase>=2") is shared by every skill that uses it.
+- The term indices of every group, and the group indices of every expression.
+
+`ConditionSet.evaluate` then checks a whole batch of race-state vectors against
+every skill at once: each distinct term is compared once per state with NumPy,
+and the groups and expressions are reduced with cumulative sums. Variables that
+a state does not set (NaN) fail every term that uses them.
+
+Run it with: `python skillConditionCompiler.py` to compile `skills.json`, check
+the batch evaluator against parsing the strings on random race states and
+compare the cost per evaluation of both.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_SKILLS_FP = os.path.join(os.path.dirname(__file__), "skills.json")
+
+GROUP_SEPARATOR = "@"
+TERM_SEPARATOR = "&"
+
+# The operator codes in the order of `OPERATORS`.
+OPERATORS = ("==", "!=", ">=", "<=", ">", "<")
+_COMPARISONS = (np.equal, np.not_equal, np.greater_equal, np.less_equal, np.greater, np.less)
+_TERM_PATTERN = re.compile(r"^([a-z_][a-z0-9_]*)(==|!=|>=|<=|>|<)(-?\d+(?:\.\d+)?)$")
+
+Term = Tuple[str, str, float]
+
+
+def parse_condition(expression: str) -> List[List[Term]]:
+    """Parses and validates a condition string.
+
+    Args:
+        expression (str): The condition, e.g. "phase>=2&order_rate<=50@corner!=0". An empty string always holds.
+
+    Raises:
+        ValueError: If a term is not "<variable><operator><number>".
+
+    Returns:
+        The (variable, operator, constant) terms of every group.
+    """
+    if not expression:
+        return [[]]
+
+    groups = []
+    for group in expression.split(GROUP_SEPARATOR):
+        terms = []
+        for term in group.split(TERM_SEPARATOR):
+            match = _TERM_PATTERN.match(term.strip())
+            if match is None:
+                raise ValueError(f"Invalid term \"{term}\" in condition \"{expression}\".")
+            terms.append((match.group(1), match.group(2), float(match.group(3))))
+        groups.append(terms)
+    return groups
+
+
+def evaluate_condition_text(expression: str, values: Dict[str, float]) -> bool:
+    """Evaluates a condition string against one race state by parsing it.
+
+    This is the reference for `ConditionSet.evaluate`.
+
+    Args:
+        expression (str): The condition string.
+        values (Dict[str, float]): The race state by variable. Missing variables fail every term that uses them.
+
+    Returns:
+        Whether the condition holds.
+    """
+    for group in parse_condition(expression):
+        if all(variable in values and _COMPARISONS[OPERATORS.index(operator)](values[variable], constant) for variable, operator, constant in group):
+            return True
+    return False
+
+
+class ConditionSet:
+    """
+    A list of condition strings compiled into flat arrays for batch evaluation.
+
+    Args:
+        expressions (Sequence[str]): The condition strings, e.g. the "condition" of every skill.
+        variables (Sequence[str], optional): The variables of the state vectors, in order. Defaults to
+            the sorted variables of `expressions`. Pass the same list to compile several sets against
+            the same state vectors.
+
+    Raises:
+        ValueError: If a condition is malformed or uses a variable that is not in `variables`.
+    """
+
+    def __init__(self, expressions: Sequence[str], variables: Sequence[str] = None):
+        parsed = [parse_condition(expression) for expression in expressions]
+        if variables is None:
+            variables = sorted({term[0] for groups in parsed for group in groups for term in group})
+        self.variables = list(variables)
+        self.variable_index = {variable: i for i, variable in enumerate(self.variables)}
+
+        term_index = {}
+        group_terms, group_bounds, expression_bounds = [], [0], [0]
+        for expression, groups in zip(expressions, parsed):
+            for group in groups:
+                for variable, operator, constant in group:
+                    if variable not in self.variable_index:
+                        raise ValueError(f"Unknown variable \"{variable}\" in condition \"{expression}\".")
+                    key = (self.variable_index[variable], OPERATORS.index(operator), constant)
+                    group_terms.append(term_index.setdefault(key, len(term_index)))
+                group_bounds.append(len(group_terms))
+            expression_bounds.append(len(group_bounds) - 1)
+
+        terms = list(term_index.keys())
+        self.term_variable = np.array([term[0] for term in terms], dtype=np.int32)
+        self.term_operator = np.array([term[1] for term in terms], dtype=np.int8)
+        self.term_constant = np.array([term[2] for term in terms], dtype=np.float64)
+        self.group_terms = np.array(group_terms, dtype=np.int32)
+        self.group_bounds = np.array(group_bounds, dtype=np.int32)
+        self.expression_bounds = np.array(expression_bounds, dtype=np.int32)
+
+        # The distinct terms of each operator, so that every comparison is one NumPy call.
+        self._operator_terms = [np.flatnonzero(self.term_operator == code) for code in range(len(OPERATORS))]
+
+    @property
+    def num_expressions(self) -> int:
+        return len(self.expression_bounds) - 1
+
+    def state_vector(self, values: Dict[str, float]) -> np.ndarray:
+        """
+        Builds a state vector from a dictionary.
+
+        Args:
+            values (Dict[str, float]): The race state by variable. Unknown variables are ignored.
+
+        Returns:
+            (np.ndarray): The state in the order of `variables`, NaN where a variable is not set.
+        """
+        state = np.full(len(self.variables), np.nan, dtype=np.float64)
+        for variable, value in values.items():
+            i = self.variable_index.get(variable)
+            if i is not None:
+                state[i] = value
+        return state
+
+    def evaluate(self, states: np.ndarray) -> np.ndarray:
+        """
+        Evaluates every condition against a batch of race states.
+
+        Args:
+            states (np.ndarray): The state vectors, (num_states, num_variables) or (num_variables,).
+
+        Returns:
+            (np.ndarray): Whether each condition holds in each state, (num_states, num_expressions)
+                or (num_expressions,) for a single state.
+        """
+        single = states.ndim == 1
+        states = np.atleast_2d(states)
+        values = states[:, self.term_variable]
+
+        failed = np.empty(values.shape, dtype=bool)
+        for code, terms in enumerate(self._operator_terms):
+            if len(terms):
+                failed[:, terms] = ~_COMPARISONS[code](values[:, terms], self.term_constant[terms])
+        # Comparisons with NaN are False except for "!=", so unset variables need to fail explicitly.
+        failed |= np.isnan(values)
+
+        # A group holds when none of its terms failed, and an expression when any of its groups holds.
+        group_failures = self._segment_sums(failed[:, self.group_terms], self.group_bounds)
+        holds = self._segment_sums(group_failures == 0, self.expression_bounds) > 0
+        return holds[0] if single else holds
+
+    @staticmethod
+    def _segment_sums(flags: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+        # Sums of consecutive column ranges from one cumulative sum. Unlike np.add.reduceat this handles empty ranges.
+        sums = np.zeros((flags.shape[0], flags.shape[1] + 1), dtype=np.int32)
+        np.cumsum(flags, axis=1, out=sums[:, 1:])
+        return sums[:, bounds[1:]] - sums[:, bounds[:-1]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializes the compiled arrays.
+
+        Returns:
+            (Dict[str, Any]): The variables, the operators and the arrays as lists.
+        """
+        return {
+            "variables": self.variables,
+            "operators": list(OPERATORS),
+            "term_variable": self.term_variable.tolist(),
+            "term_operator": self.term_operator.tolist(),
+            "term_constant": self.term_constant.tolist(),
+            "group_terms": self.group_terms.tolist(),
+            "group_bounds": self.group_bounds.tolist(),
+            "expression_bounds": self.expression_bounds.tolist(),
+        }
+
+
+def compile_skill_conditions(skills: Dict[str, Dict[str, Any]]) -> Tuple[List[int], ConditionSet, ConditionSet]:
+    """Compiles the conditions and preconditions of every skill against one variable list.
+
+    Args:
+        skills (Dict[str, Dict[str, Any]]): The contents of `skills.json`.
+
+    Returns:
+        The skill IDs, and the compiled conditions and preconditions in the same order.
+    """
+    ids = [skill["id"] for skill in skills.values()]
+    conditions = [skill.get("condition") or "" for skill in skills.values()]
+    preconditions = [skill.get("precondition") or "" for skill in skills.values()]
+    variables = sorted({term[0] for expression in conditions + preconditions for group in parse_condition(expression) for term in group})
+    return ids, ConditionSet(conditions, variables), ConditionSet(preconditions, variables)
+
+
+def random_states(condition_set: ConditionSet, num_states: int, seed: int = 0) -> np.ndarray:
+    """Makes race states that exercise the conditions.
+
+    Every variable takes one of the constants it is compared with, or one more or less, so that
+    terms hold and fail about as often as in a race.
+
+    Args:
+        condition_set (ConditionSet): The compiled conditions.
+        num_states (int): How many states to make.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        The states, (num_states, num_variables).
+    """
+    rng = np.random.default_rng(seed)
+    states = np.empty((num_states, len(condition_set.variables)), dtype=np.float64)
+    for i in range(len(condition_set.variables)):
+        constants = condition_set.term_constant[condition_set.term_variable == i]
+        candidates = np.concatenate([constants - 1, constants, constants + 1]) if len(constants) else np.array([0.0])
+        states[:, i] = rng.choice(candidates, num_states)
+    return states
+
+
+def benchmark(skills: Dict[str, Dict[str, Any]], num_states: int = 1000, repeat: int = 5):
+    """Compares the batch evaluator against parsing the condition strings for every state.
+
+    Args:
+        skills (Dict[str, Dict[str, Any]]): The contents of `skills.json`.
+        num_states (int, optional): How many random race states to evaluate. Defaults to 1000.
+        repeat (int, optional): How many times the batch evaluation is timed. Defaults to 5.
+    """
+    start = time.perf_counter()
+    _, conditions, preconditions = compile_skill_conditions(skills)
+    compile_ms = 1000.0 * (time.perf_counter() - start)
+    expressions = [skill.get("condition") or "" for skill in skills.values()]
+    logging.info(
+        f"Compiled {conditions.num_expressions} skills in {compile_ms:.1f} ms: {len(conditions.variables)} variables, "
+        f"{len(conditions.group_terms)} terms ({len(conditions.term_variable)} distinct) in {len(conditions.group_bounds) - 1} groups."
+    )
+
+    states = random_states(conditions, num_states)
+    state_dicts = [dict(zip(conditions.variables, state)) for state in states]
+
+    # Parsing every string for every state is slow, so only time it on part of the states.
+    num_text_states = min(num_states, 100)
+    start = time.perf_counter()
+    expected = np.array([[evaluate_condition_text(expression, values) for expression in expressions] for values in state_dicts[:num_text_states]])
+    text_seconds = (time.perf_counter() - start) / (num_text_states * len(expressions))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        holds = conditions.evaluate(states)
+        times.append(time.perf_counter() - start)
+    batch_seconds = min(times) / (num_states * len(expressions))
+
+    start = time.perf_counter()
+    for state in states[:num_text_states]:
+        conditions.evaluate(state)
+    single_seconds = (time.perf_counter() - start) / (num_text_states * len(expressions))
+
+    mismatches = int(np.count_nonzero(holds[:num_text_states] != expected))
+    logging.info(f"{100.0 * holds.mean():.1f}% of the (state, skill) conditions hold. {mismatches} mismatch(es) against parsing the strings.")
+    logging.info(
+        f"Per evaluation: {1e9 * text_seconds:.0f} ns parsing the strings, {1e9 * single_seconds:.0f} ns compiled one state at a time, "
+        f"{1e9 * batch_seconds:.1f} ns compiled in a batch of {num_states} states ({text_seconds / batch_seconds:.0f}x faster)."
+    )
+    logging.info(f"Preconditions: {preconditions.num_expressions} skills, {len(preconditions.group_terms)} terms, evaluated the same way.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Compiles the skill activation conditions and benchmarks evaluating them.")
+    parser.add_argument("--skills", default=DEFAULT_SKILLS_FP, help="The skills.json file.")
+    parser.add_argument("--states", type=int, default=1000, help="How many random race states to evaluate.")
+    parser.add_argument("--out", default=None, help="Optional JSON file to write the compiled conditions and preconditions to.")
+    args = parser.parse_args()
+
+    with open(args.skills, "r", encoding="utf-8") as f:
+        skills = json.load(f)
+
+    if args.out:
+        ids, conditions, preconditions = compile_skill_conditions(skills)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "condition": conditions.to_dict(), "precondition": preconditions.to_dict()}, f, separators=(",", ":"))
+        logging.info(f"Saved the compiled conditions of {len(ids)} skills to {args.out}.")
+
+    benchmark(skills, args.states)
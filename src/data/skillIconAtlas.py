@@ -0,0 +1,212 @@
+"""Packs the downloaded skill icons into sprite sheets.
+
+`SkillScraper.start_webpack_method` downloads one `utx_ico_skill_{icon_id}.png`
+per icon. This script dedupes those icons by their decoded pixel content, packs
+the unique ones into one or a few sprite sheets and writes a manifest that maps
+every `icon_id` to its rectangle on a sheet so that the app only has to decode
+the sheets instead of every loose file.
+
+Run it with: `python skillIconAtlas.py` (defaults to `../pages/SkillSettings/icons`).
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+ICON_FILENAME_PATTERN = re.compile(r"^utx_ico_skill_(\d+)\.png$")
+DEFAULT_ICONS_DIR = os.path.join(os.path.dirname(__file__), "..", "pages", "SkillSettings", "icons")
+DEFAULT_ATLAS_NAME = "skill_icons_atlas"
+
+
+def load_skill_icons(icons_dir: str) -> Dict[int, np.ndarray]:
+    """Loads every skill icon in a directory.
+
+    Args:
+        icons_dir (str): The directory containing the `utx_ico_skill_{icon_id}.png` files.
+
+    Returns:
+        A dictionary mapping icon ID to its BGRA image.
+    """
+    icons = {}
+    for filename in sorted(os.listdir(icons_dir)):
+        match = ICON_FILENAME_PATTERN.match(filename)
+        if match is None:
+            continue
+
+        img = cv2.imread(os.path.join(icons_dir, filename), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            logging.warning(f"Failed to decode skill icon: {filename}")
+            continue
+
+        # Normalize everything to BGRA so that all icons can share one sheet.
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+        elif img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+
+        icons[int(match.group(1))] = img
+    return icons
+
+
+def dedupe_icons(icons: Dict[int, np.ndarray]) -> Tuple[List[np.ndarray], Dict[int, int]]:
+    """Groups icons with identical pixel content.
+
+    The hash is taken over the decoded pixels rather than the PNG bytes so that
+    the same icon saved with a different encoder still counts as a duplicate.
+
+    Args:
+        icons (Dict[int, np.ndarray]): A dictionary mapping icon ID to its image.
+
+    Returns:
+        A tuple of the list of unique images and a dictionary mapping each icon ID
+        to its index in that list.
+    """
+    unique_images = []
+    hash_to_index = {}
+    icon_to_index = {}
+    for icon_id, img in icons.items():
+        digest = hashlib.sha256(str(img.shape).encode() + img.tobytes()).hexdigest()
+        if digest not in hash_to_index:
+            hash_to_index[digest] = len(unique_images)
+            unique_images.append(img)
+        icon_to_index[icon_id] = hash_to_index[digest]
+    return unique_images, icon_to_index
+
+
+def pack_images(images: List[np.ndarray], max_size: int = 2048, padding: int = 1) -> Tuple[List[Tuple[int, int, int]], List[Tuple[int, int]]]:
+    """Packs images onto sheets using a simple shelf packer.
+
+    Images are placed tallest first in rows from left to right. A new row starts
+    when the current one is full and a new sheet starts when a row no longer fits.
+
+    Args:
+        images (List[np.ndarray]): The images to pack.
+        max_size (int, optional): The maximum width and height of a sheet. Defaults to 2048.
+        padding (int, optional): Transparent gutter between images to prevent
+            neighbouring icons from bleeding in when the sheet is scaled. Defaults to 1.
+
+    Returns:
+        A tuple of the (sheet index, x, y) placement for each image in input order
+        and the (width, height) of each sheet.
+    """
+    placements = [None] * len(images)
+    sheet_sizes = []
+
+    # Wrap rows at roughly the square root of the total area so that a single
+    # sheet comes out close to square instead of one long strip.
+    total_area = sum((img.shape[0] + padding) * (img.shape[1] + padding) for img in images)
+    widest = max((img.shape[1] for img in images), default=0)
+    row_width = min(max_size, max(widest, int(np.ceil(np.sqrt(total_area)))))
+
+    order = sorted(range(len(images)), key=lambda i: images[i].shape[0], reverse=True)
+    sheet_index = 0
+    x = y = row_height = sheet_w = sheet_h = 0
+    for i in order:
+        h, w = images[i].shape[:2]
+        if w > max_size or h > max_size:
+            raise ValueError(f"Image of size {w}x{h} does not fit on a {max_size}x{max_size} sheet.")
+
+        # Start a new row.
+        if x + w > row_width:
+            x = 0
+            y += row_height + padding
+            row_height = 0
+
+        # Start a new sheet.
+        if y + h > max_size:
+            sheet_sizes.append((sheet_w, sheet_h))
+            sheet_index += 1
+            x = y = row_height = sheet_w = sheet_h = 0
+
+        placements[i] = (sheet_index, x, y)
+        row_height = max(row_height, h)
+        sheet_w = max(sheet_w, x + w)
+        sheet_h = max(sheet_h, y + h)
+        x += w + padding
+
+    if images:
+        sheet_sizes.append((sheet_w, sheet_h))
+    return placements, sheet_sizes
+
+
+def build_skill_icon_atlas(
+    icons_dir: str = DEFAULT_ICONS_DIR,
+    out_dir: str = None,
+    atlas_name: str = DEFAULT_ATLAS_NAME,
+    max_size: int = 2048,
+    padding: int = 1,
+) -> Dict:
+    """Builds the skill icon sprite sheets and their manifest.
+
+    Args:
+        icons_dir (str, optional): The directory containing the downloaded skill icons.
+        out_dir (str, optional): Where to write the sheets and manifest. Defaults to `icons_dir`.
+        atlas_name (str, optional): The base filename for the sheets and manifest.
+        max_size (int, optional): The maximum width and height of a sheet. Defaults to 2048.
+        padding (int, optional): Transparent gutter between icons. Defaults to 1.
+
+    Returns:
+        The manifest dictionary that was written to disk.
+    """
+    out_dir = out_dir or icons_dir
+    os.makedirs(out_dir, exist_ok=True)
+    icons = load_skill_icons(icons_dir)
+    if not icons:
+        logging.warning(f"No skill icons found in {icons_dir}. Skipping atlas build.")
+        return {}
+
+    unique_images, icon_to_index = dedupe_icons(icons)
+    placements, sheet_sizes = pack_images(unique_images, max_size, padding)
+
+    # Draw every unique icon onto its sheet.
+    sheets = [np.zeros((h, w, 4), dtype=np.uint8) for w, h in sheet_sizes]
+    for img, (sheet_index, x, y) in zip(unique_images, placements):
+        h, w = img.shape[:2]
+        sheets[sheet_index][y : y + h, x : x + w] = img
+
+    manifest = {"sheets": [], "icons": {}}
+    atlas_bytes = 0
+    for sheet_index, sheet in enumerate(sheets):
+        filename = f"{atlas_name}_{sheet_index}.png"
+        out_fp = os.path.join(out_dir, filename)
+        cv2.imwrite(out_fp, sheet, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        atlas_bytes += os.path.getsize(out_fp)
+        manifest["sheets"].append({"file": filename, "width": sheet.shape[1], "height": sheet.shape[0]})
+
+    for icon_id in sorted(icon_to_index):
+        img = unique_images[icon_to_index[icon_id]]
+        sheet_index, x, y = placements[icon_to_index[icon_id]]
+        manifest["icons"][str(icon_id)] = {"sheet": sheet_index, "x": x, "y": y, "w": img.shape[1], "h": img.shape[0]}
+
+    manifest_fp = os.path.join(out_dir, f"{atlas_name}.json")
+    with open(manifest_fp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    atlas_bytes += os.path.getsize(manifest_fp)
+
+    loose_bytes = sum(os.path.getsize(os.path.join(icons_dir, f"utx_ico_skill_{icon_id}.png")) for icon_id in icons)
+    logging.info(
+        f"Packed {len(icons)} skill icons ({len(unique_images)} unique) into {len(sheets)} sheet(s): "
+        f"{atlas_bytes / 1024:.1f} KB (atlas + manifest) vs {loose_bytes / 1024:.1f} KB (loose files), "
+        f"{len(sheets)} vs {len(icons)} image decodes."
+    )
+    return manifest
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Packs the downloaded skill icons into sprite sheets.")
+    parser.add_argument("--icons-dir", default=DEFAULT_ICONS_DIR, help="Directory containing the utx_ico_skill_*.png files.")
+    parser.add_argument("--out-dir", default=None, help="Where to write the sheets and manifest. Defaults to --icons-dir.")
+    parser.add_argument("--max-size", type=int, default=2048, help="Maximum width and height of a sheet.")
+    parser.add_argument("--padding", type=int, default=1, help="Transparent gutter between icons.")
+    args = parser.parse_args()
+
+    build_skill_icon_atlas(args.icons_dir, args.out_dir, max_size=args.max_size, padding=args.padding)
@@ -0,0 +1,274 @@
+"""Coarse-to-fine matching of many templates against one screenshot.
+
+`CustomImageUtils.findImageWithBitmap`/`findAllWithBitmap` match one template
+at a time with `matchTemplate` over the full-resolution screenshot, so the cost
+of every lookup grows with the screenshot size times the template size.
+`CoarseToFineMatcher` prototypes a cheaper search for porting to Kotlin:
+
+1. The screenshot is converted to grayscale and downscaled into a pyramid once
+   per frame, and every template's downscaled versions are built once when the
+   matcher is created. Everything is shared by all templates matched on a frame.
+2. Each template is matched on the coarsest pyramid level at which it is still
+   large enough to be recognizable. The best peaks above a lowered threshold
+   become candidate regions.
+3. The template is matched again at full resolution only inside a small ROI
+   around every candidate, which gives the exact location and score.
+
+Run it with: `python templateMatcher.py` to benchmark it against naive
+full-frame matching of the button templates on the sample screenshots.
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from templatePrecompiler import DEFAULT_TEMPLATES_DIR, list_template_names, load_raw_template
+
+DEFAULT_SAMPLES = [
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample2.png"),
+    os.path.join(os.path.dirname(__file__), "imageDetectionSample3.png"),
+]
+
+# A (x, y, score) match in full-resolution coordinates. (x, y) is the top-left corner like `cv2.minMaxLoc`.
+Match = Tuple[int, int, float]
+
+
+def suppress_overlaps(matches: List[Match], template_w: int, template_h: int) -> List[Match]:
+    """Keeps the best of any matches that are closer than half a template apart.
+
+    Args:
+        matches (List[Match]): The matches of one template.
+        template_w (int): The width of the template.
+        template_h (int): The height of the template.
+
+    Returns:
+        The remaining matches from best to worst.
+    """
+    kept = []
+    for x, y, score in sorted(matches, key=lambda m: m[2], reverse=True):
+        if all(abs(x - kx) > template_w // 2 or abs(y - ky) > template_h // 2 for kx, ky, _ in kept):
+            kept.append((x, y, score))
+    return kept
+
+
+def find_peaks(result: np.ndarray, threshold: float, max_peaks: int, suppress_w: int, suppress_h: int) -> List[Match]:
+    """Finds the best peaks of a `matchTemplate` result map.
+
+    Args:
+        result (np.ndarray): The result map. It is modified.
+        threshold (float): The minimum score of a peak.
+        max_peaks (int): The maximum number of peaks to return.
+        suppress_w (int): The width of the area cleared around every peak.
+        suppress_h (int): The height of the area cleared around every peak.
+
+    Returns:
+        The (x, y, score) peaks from best to worst.
+    """
+    peaks = []
+    for _ in range(max_peaks):
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        if score < threshold:
+            break
+        peaks.append((x, y, score))
+        result[max(0, y - suppress_h // 2) : y + suppress_h // 2 + 1, max(0, x - suppress_w // 2) : x + suppress_w // 2 + 1] = -1.0
+    return peaks
+
+
+def match_naive(source_gray: np.ndarray, template: np.ndarray, threshold: float, max_matches: int = 10) -> List[Match]:
+    """Matches a template over the whole screenshot at full resolution like the bot does today.
+
+    Args:
+        source_gray (np.ndarray): The grayscale screenshot.
+        template (np.ndarray): The grayscale template.
+        threshold (float): The minimum TM_CCOEFF_NORMED score of a match.
+        max_matches (int, optional): The maximum number of matches to return. Defaults to 10.
+
+    Returns:
+        The (x, y, score) matches from best to worst.
+    """
+    if template.shape[0] > source_gray.shape[0] or template.shape[1] > source_gray.shape[1]:
+        return []
+    result = cv2.matchTemplate(source_gray, template, cv2.TM_CCOEFF_NORMED)
+    return find_peaks(result, threshold, max_matches, template.shape[1], template.shape[0])
+
+
+class CoarseToFineMatcher:
+    """Matches many templates per frame with a downscaled search and full-resolution refinement.
+
+    Args:
+        templates (Dict[str, np.ndarray]): Maps each template name to its grayscale image.
+        num_levels (int, optional): How many times the screenshot is halved for the
+            coarse search. Defaults to 3 (eighth resolution).
+        min_coarse_size (int, optional): The minimum width and height of a downscaled
+            template. Templates are matched on the coarsest level that keeps them at
+            least this large. Defaults to 8.
+        coarse_margin (float, optional): How much lower the coarse threshold is than
+            the final one since downscaling lowers the scores. Defaults to 0.3.
+        max_candidates (int, optional): The maximum number of candidate regions per
+            template. Defaults to 10.
+    """
+
+    def __init__(self, templates: Dict[str, np.ndarray], num_levels: int = 3, min_coarse_size: int = 8, coarse_margin: float = 0.3, max_candidates: int = 10):
+        self.num_levels = num_levels
+        self.coarse_margin = coarse_margin
+        self.max_candidates = max_candidates
+
+        # Pick each template's pyramid level and downscale it once.
+        self.templates = {}
+        for name, template in templates.items():
+            level = 0
+            while level < num_levels and min(template.shape[:2]) >> (level + 1) >= min_coarse_size:
+                level += 1
+
+            coarse = template
+            for _ in range(level):
+                coarse = cv2.pyrDown(coarse)
+            self.templates[name] = (template, level, coarse)
+
+    @classmethod
+    def from_directory(cls, templates_dir: str = DEFAULT_TEMPLATES_DIR, prefix: str = "components/button/", **kwargs) -> "CoarseToFineMatcher":
+        """Creates a matcher for every template under `templates_dir` whose name starts with `prefix`."""
+        names = [name for name in list_template_names(templates_dir) if name.startswith(prefix)]
+        return cls({name: load_raw_template(templates_dir, name)[0] for name in names}, **kwargs)
+
+    def build_pyramid(self, image: np.ndarray) -> List[np.ndarray]:
+        """Converts a BGR or grayscale screenshot to grayscale and halves it `num_levels` times."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        pyramid = [gray]
+        for _ in range(self.num_levels):
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        return pyramid
+
+    def match(self, pyramid: List[np.ndarray], name: str, threshold: float = 0.8) -> List[Match]:
+        """Finds every match of one template.
+
+        Args:
+            pyramid (List[np.ndarray]): The screenshot pyramid from `build_pyramid`.
+            name (str): The template name.
+            threshold (float, optional): The minimum TM_CCOEFF_NORMED score of a match. Defaults to 0.8.
+
+        Returns:
+            The (x, y, score) matches in full-resolution coordinates from best to worst.
+        """
+        template, level, coarse = self.templates[name]
+        source = pyramid[0]
+        template_h, template_w = template.shape[:2]
+        if level == 0:
+            return match_naive(source, template, threshold, self.max_candidates)
+
+        coarse_source = pyramid[level]
+        if coarse.shape[0] > coarse_source.shape[0] or coarse.shape[1] > coarse_source.shape[1]:
+            return []
+        result = cv2.matchTemplate(coarse_source, coarse, cv2.TM_CCOEFF_NORMED)
+        candidates = find_peaks(result, threshold - self.coarse_margin, self.max_candidates, coarse.shape[1], coarse.shape[0])
+
+        # Refine every candidate at full resolution. A coarse pixel covers 2^level
+        # pixels, so search a little beyond that around the scaled-up location.
+        factor = 1 << level
+        margin = 2 * factor
+        matches = []
+        for coarse_x, coarse_y, _ in candidates:
+            x0 = max(0, coarse_x * factor - margin)
+            y0 = max(0, coarse_y * factor - margin)
+            x1 = min(source.shape[1], coarse_x * factor + margin + template_w)
+            y1 = min(source.shape[0], coarse_y * factor + margin + template_h)
+            if x1 - x0 < template_w or y1 - y0 < template_h:
+                continue
+
+            roi_result = cv2.matchTemplate(source[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (x, y) = cv2.minMaxLoc(roi_result)
+            if score >= threshold:
+                matches.append((x0 + x, y0 + y, score))
+        return suppress_overlaps(matches, template_w, template_h)
+
+    def match_all(self, image: np.ndarray, names: Optional[Sequence[str]] = None, threshold: float = 0.8) -> Dict[str, List[Match]]:
+        """Finds the matches of many templates on one screenshot while sharing the preprocessing.
+
+        Args:
+            image (np.ndarray): The BGR or grayscale screenshot.
+            names (Sequence[str], optional): The templates to match. Defaults to all of them.
+            threshold (float, optional): The minimum TM_CCOEFF_NORMED score of a match. Defaults to 0.8.
+
+        Returns:
+            A dictionary mapping each template name with at least one match to its matches.
+        """
+        pyramid = self.build_pyramid(image)
+        results = {}
+        for name in names if names is not None else self.templates:
+            matches = self.match(pyramid, name, threshold)
+            if matches:
+                results[name] = matches
+        return results
+
+
+def benchmark(sample_fps: Sequence[str], templates_dir: str = DEFAULT_TEMPLATES_DIR, prefix: str = "components/button/", threshold: float = 0.8, tolerance: int = 2):
+    """Compares the coarse-to-fine matcher against naive full-frame matching.
+
+    The naive matches are the reference. A coarse-to-fine match counts as found
+    when it is within `tolerance` pixels of a naive match of the same template.
+
+    Args:
+        sample_fps (Sequence[str]): The screenshots to match against.
+        templates_dir (str, optional): The root template directory.
+        prefix (str, optional): Only templates starting with this prefix are matched. Defaults to the button templates.
+        threshold (float, optional): The minimum TM_CCOEFF_NORMED score of a match. Defaults to 0.8.
+        tolerance (int, optional): The maximum distance in pixels between matching results. Defaults to 2.
+    """
+    start = time.perf_counter()
+    matcher = CoarseToFineMatcher.from_directory(templates_dir, prefix)
+    setup_ms = 1000.0 * (time.perf_counter() - start)
+    levels = [level for _, level, _ in matcher.templates.values()]
+    logging.info(
+        f"Loaded {len(matcher.templates)} '{prefix}' templates in {setup_ms:.0f} ms "
+        f"(pyramid levels: {', '.join(f'{levels.count(level)} at 1/{1 << level}' for level in sorted(set(levels)))})."
+    )
+
+    for sample_fp in sample_fps:
+        image = cv2.imread(sample_fp)
+
+        start = time.perf_counter()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        expected = {}
+        for name, (template, _, _) in matcher.templates.items():
+            matches = match_naive(gray, template, threshold, matcher.max_candidates)
+            if matches:
+                expected[name] = suppress_overlaps(matches, template.shape[1], template.shape[0])
+        naive_ms = 1000.0 * (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = matcher.match_all(image, threshold=threshold)
+        fast_ms = 1000.0 * (time.perf_counter() - start)
+
+        def is_close(a: Match, b: Match) -> bool:
+            return abs(a[0] - b[0]) <= tolerance and abs(a[1] - b[1]) <= tolerance
+
+        num_expected = sum(len(matches) for matches in expected.values())
+        num_found = sum(len(matches) for matches in found.values())
+        recalled = sum(any(is_close(e, f) for f in found.get(name, [])) for name, matches in expected.items() for e in matches)
+        missed = [name for name, matches in expected.items() for e in matches if not any(is_close(e, f) for f in found.get(name, []))]
+
+        logging.info(
+            f"{os.path.basename(sample_fp)}: naive {naive_ms:.0f} ms vs coarse-to-fine {fast_ms:.0f} ms ({naive_ms / fast_ms:.1f}x), "
+            f"found {recalled}/{num_expected} naive matches ({num_found} total)"
+        )
+        if missed:
+            logging.info(f"    Missed: {', '.join(missed)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks coarse-to-fine template matching against naive full-frame matching.")
+    parser.add_argument("--samples", nargs="+", default=DEFAULT_SAMPLES, help="The screenshots to match against.")
+    parser.add_argument("--templates-dir", default=DEFAULT_TEMPLATES_DIR, help="Root template directory.")
+    parser.add_argument("--prefix", default="components/button/", help="Only templates starting with this prefix are matched.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum TM_CCOEFF_NORMED score of a match.")
+    args = parser.parse_args()
+
+    benchmark(args.samples, args.templates_dir, args.prefix, args.threshold)
@@ -0,0 +1,342 @@
+"""Precompiles the Android image-matching templates.
+
+The bot decodes every template in `android/app/src/main/assets/images` from PNG
+and converts it before it can be matched against a screenshot. This script does
+that work ahead of time: every template is converted to grayscale, tightly
+cropped to its opaque pixels, optionally resized to extra scales and stored with
+its alpha mask and the statistics that normalized matching needs (mean, standard
+deviation and norms). The results are written as PNGs, a single binary bundle
+holding every template back to back and a `manifest.json` with the offsets.
+
+Run it with: `python templatePrecompiler.py` and add `--benchmark` to compare
+matching with raw and precompiled templates on a sample screenshot.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "android", "app", "src", "main", "assets", "images")
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "precompiled_templates")
+MANIFEST_FILENAME = "manifest.json"
+BUNDLE_FILENAME = "templates.bin"
+
+
+def list_template_names(templates_dir: str) -> List[str]:
+    """Lists every template under a directory.
+
+    Template names are the path relative to `templates_dir` without the extension
+    (e.g. `components/button/ok`) which matches the `templateName` used by
+    `CustomImageUtils.findImageWithBitmap`.
+
+    Args:
+        templates_dir (str): The root template directory.
+
+    Returns:
+        The sorted list of template names.
+    """
+    names = []
+    for dirpath, _, filenames in os.walk(templates_dir):
+        for filename in filenames:
+            if filename.lower().endswith(".png"):
+                rel_path = os.path.relpath(os.path.join(dirpath, filename), templates_dir)
+                names.append(os.path.splitext(rel_path)[0].replace(os.sep, "/"))
+    return sorted(names)
+
+
+def load_raw_template(templates_dir: str, name: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Decodes a template the same way it is done at runtime.
+
+    Args:
+        templates_dir (str): The root template directory.
+        name (str): The template name.
+
+    Returns:
+        A tuple of the grayscale template and its binary alpha mask, or None if the
+        template has no transparent pixels.
+    """
+    img = cv2.imread(os.path.join(templates_dir, f"{name}.png"), cv2.IMREAD_UNCHANGED)
+    if img is None:
+        raise ValueError(f"Failed to decode template: {name}")
+
+    mask = None
+    if img.ndim == 3 and img.shape[2] == 4:
+        alpha = img[:, :, 3]
+        if (alpha < 255).any():
+            mask = np.where(alpha > 0, 255, 0).astype(np.uint8)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    elif img.ndim == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = img
+    return gray, mask
+
+
+def tight_crop(gray: np.ndarray, mask: Optional[np.ndarray]) -> Tuple[np.ndarray, Optional[np.ndarray], Tuple[int, int]]:
+    """Crops a template down to the bounding box of its opaque pixels.
+
+    Args:
+        gray (np.ndarray): The grayscale template.
+        mask (Optional[np.ndarray]): The binary alpha mask or None.
+
+    Returns:
+        A tuple of the cropped template, the cropped mask (None if the crop left no
+        transparent pixels) and the (x, y) offset of the crop within the original.
+    """
+    if mask is None:
+        return gray, None, (0, 0)
+
+    points = cv2.findNonZero(mask)
+    if points is None:
+        # Fully transparent. Nothing sensible to crop to.
+        return gray, mask, (0, 0)
+
+    x, y, w, h = cv2.boundingRect(points)
+    gray = gray[y : y + h, x : x + w]
+    mask = mask[y : y + h, x : x + w]
+    if mask.all():
+        mask = None
+    return gray, mask, (x, y)
+
+
+def compute_template_stats(gray: np.ndarray, mask: Optional[np.ndarray]) -> Dict[str, float]:
+    """Computes the statistics used by normalized template matching.
+
+    Args:
+        gray (np.ndarray): The grayscale template.
+        mask (Optional[np.ndarray]): The binary alpha mask or None.
+
+    Returns:
+        A dictionary with the mean, standard deviation, L2 norm and zero-mean L2 norm
+        of the (masked) template pixels.
+    """
+    values = gray.astype(np.float64)
+    if mask is not None:
+        values = values[mask > 0]
+    mean = float(values.mean()) if values.size else 0.0
+    return {
+        "mean": mean,
+        "std": float(values.std()) if values.size else 0.0,
+        "norm": float(np.sqrt(np.square(values).sum())),
+        "zero_mean_norm": float(np.sqrt(np.square(values - mean).sum())),
+    }
+
+
+def scale_template(gray: np.ndarray, mask: Optional[np.ndarray], scale: float) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Resizes a template and its mask.
+
+    Args:
+        gray (np.ndarray): The grayscale template.
+        mask (Optional[np.ndarray]): The binary alpha mask or None.
+        scale (float): The scale factor.
+
+    Returns:
+        The resized template and mask.
+    """
+    if scale == 1.0:
+        return gray, mask
+
+    h, w = gray.shape[:2]
+    new_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    gray = cv2.resize(gray, new_size, interpolation=interpolation)
+    if mask is not None:
+        mask = cv2.resize(mask, new_size, interpolation=cv2.INTER_NEAREST)
+    return gray, mask
+
+
+def get_variant_key(name: str, scale: float) -> str:
+    """Returns the key that identifies one scale of a template."""
+    return f"{name}@{scale:g}"
+
+
+def precompile_templates(
+    templates_dir: str = DEFAULT_TEMPLATES_DIR,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    scales: Tuple[float, ...] = (1.0,),
+) -> Dict:
+    """Precompiles every template and writes the results to disk.
+
+    Args:
+        templates_dir (str, optional): The root template directory.
+        output_dir (str, optional): Where to write the precompiled templates.
+        scales (Tuple[float, ...], optional): The scales to generate for each template. Defaults to (1.0,).
+
+    Returns:
+        The manifest dictionary that was written to disk.
+    """
+    manifest = {"scales": list(scales), "templates": {}}
+    os.makedirs(output_dir, exist_ok=True)
+    # Write the bundle under a temporary name so that a failure does not leave a truncated one next to the manifest.
+    bundle_fp = os.path.join(output_dir, BUNDLE_FILENAME)
+    with open(bundle_fp + ".tmp", "wb") as bundle:
+        for name in list_template_names(templates_dir):
+            raw_gray, raw_mask = load_raw_template(templates_dir, name)
+            gray, mask, (crop_x, crop_y) = tight_crop(raw_gray, raw_mask)
+
+            entry = {
+                "source_width": raw_gray.shape[1],
+                "source_height": raw_gray.shape[0],
+                "crop_x": crop_x,
+                "crop_y": crop_y,
+                "variants": {},
+            }
+
+            for scale in scales:
+                scaled_gray, scaled_mask = scale_template(gray, mask, scale)
+                key = get_variant_key(name, scale)
+
+                out_fp = os.path.join(output_dir, f"{key}.png")
+                os.makedirs(os.path.dirname(out_fp), exist_ok=True)
+                cv2.imwrite(out_fp, scaled_gray)
+                offset = bundle.tell()
+                bundle.write(np.ascontiguousarray(scaled_gray).tobytes())
+                mask_offset = None
+                if scaled_mask is not None:
+                    cv2.imwrite(os.path.join(output_dir, f"{key}_mask.png"), scaled_mask)
+                    mask_offset = bundle.tell()
+                    bundle.write(np.ascontiguousarray(scaled_mask).tobytes())
+
+                entry["variants"][f"{scale:g}"] = {
+                    "file": f"{key}.png",
+                    "mask_file": f"{key}_mask.png" if scaled_mask is not None else None,
+                    "width": scaled_gray.shape[1],
+                    "height": scaled_gray.shape[0],
+                    "offset": offset,
+                    "mask_offset": mask_offset,
+                    **compute_template_stats(scaled_gray, scaled_mask),
+                }
+
+            manifest["templates"][name] = entry
+
+    os.replace(bundle_fp + ".tmp", bundle_fp)
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+    logging.info(f"Precompiled {len(manifest['templates'])} templates at {len(scales)} scale(s) into {output_dir}.")
+    return manifest
+
+
+def load_precompiled_templates(output_dir: str = DEFAULT_OUTPUT_DIR) -> Tuple[Dict, Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]]]:
+    """Loads the precompiled templates written by `precompile_templates`.
+
+    Args:
+        output_dir (str, optional): The directory the templates were written to.
+
+    Returns:
+        A tuple of the manifest and a dictionary mapping each variant key
+        (e.g. `components/button/ok@1`) to its grayscale template and mask.
+    """
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    # A single read of the whole bundle. Every template is a view into it.
+    buffer = np.fromfile(os.path.join(output_dir, BUNDLE_FILENAME), dtype=np.uint8)
+
+    templates = {}
+    for name, entry in manifest["templates"].items():
+        for scale, variant in entry["variants"].items():
+            size = variant["width"] * variant["height"]
+            shape = (variant["height"], variant["width"])
+            gray = buffer[variant["offset"] : variant["offset"] + size].reshape(shape)
+            mask = None
+            if variant["mask_offset"] is not None:
+                mask = buffer[variant["mask_offset"] : variant["mask_offset"] + size].reshape(shape)
+            templates[get_variant_key(name, float(scale))] = (gray, mask)
+    return manifest, templates
+
+
+def benchmark(templates_dir: str, output_dir: str, source_fp: str, match_prefix: str = "components/button/", repeat: int = 3):
+    """Compares raw templates against precompiled templates.
+
+    The raw path decodes and converts a template on every lookup just like
+    `CustomImageUtils.findImageWithBitmap` does. The precompiled path loads the
+    bundle once and looks the template up in memory.
+
+    Args:
+        templates_dir (str): The root template directory.
+        output_dir (str): The directory containing the precompiled templates.
+        source_fp (str): The screenshot to match against.
+        match_prefix (str, optional): Only templates starting with this prefix are matched
+            against the screenshot since full-frame matching dominates the runtime.
+            Defaults to the button templates.
+        repeat (int, optional): How many times to repeat each measurement. Defaults to 3.
+    """
+    source = cv2.cvtColor(cv2.imread(source_fp), cv2.COLOR_BGR2GRAY)
+    names = list_template_names(templates_dir)
+    match_names = [name for name in names if name.startswith(match_prefix)]
+
+    def fits(template: np.ndarray) -> bool:
+        return template.shape[0] <= source.shape[0] and template.shape[1] <= source.shape[1]
+
+    timings = {"raw_startup": [], "pre_startup": [], "raw_lookup": [], "pre_lookup": [], "raw_match": [], "pre_match": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        raw_templates = {name: load_raw_template(templates_dir, name) for name in names}
+        timings["raw_startup"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        manifest, templates = load_precompiled_templates(output_dir)
+        timings["pre_startup"].append(time.perf_counter() - start)
+        scale = 1.0 if 1.0 in manifest["scales"] else manifest["scales"][0]
+
+        # Per-lookup cost without the match itself.
+        start = time.perf_counter()
+        for name in names:
+            load_raw_template(templates_dir, name)
+        timings["raw_lookup"].append((time.perf_counter() - start) / len(names))
+
+        start = time.perf_counter()
+        for name in names:
+            templates[get_variant_key(name, scale)]
+        timings["pre_lookup"].append((time.perf_counter() - start) / len(names))
+
+        # Lookup and match over the full screenshot.
+        start = time.perf_counter()
+        for name in match_names:
+            gray, _ = load_raw_template(templates_dir, name)
+            if fits(gray):
+                cv2.minMaxLoc(cv2.matchTemplate(source, gray, cv2.TM_CCOEFF_NORMED))
+        timings["raw_match"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for name in match_names:
+            gray, _ = templates[get_variant_key(name, scale)]
+            if fits(gray):
+                cv2.minMaxLoc(cv2.matchTemplate(source, gray, cv2.TM_CCOEFF_NORMED))
+        timings["pre_match"].append(time.perf_counter() - start)
+
+    raw_pixels = sum(gray.size for gray, _ in raw_templates.values())
+    pre_pixels = sum(templates[get_variant_key(name, scale)][0].size for name in names)
+
+    logging.info(f"Benchmark over {len(names)} templates on {source_fp} (best of {repeat}):")
+    logging.info(f"    Startup load:        raw {min(timings['raw_startup']) * 1000:.2f} ms vs precompiled {min(timings['pre_startup']) * 1000:.2f} ms")
+    logging.info(f"    Per-lookup overhead: raw {min(timings['raw_lookup']) * 1e6:.1f} us vs precompiled {min(timings['pre_lookup']) * 1e6:.1f} us")
+    logging.info(
+        f"    Match {len(match_names)} '{match_prefix}' templates: raw {min(timings['raw_match']) * 1000:.1f} ms vs precompiled {min(timings['pre_match']) * 1000:.1f} ms"
+    )
+    logging.info(f"    Template pixels:     raw {raw_pixels} vs precompiled {pre_pixels} ({100.0 * pre_pixels / raw_pixels:.1f}%)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Precompiles the Android image-matching templates.")
+    parser.add_argument("--templates-dir", default=DEFAULT_TEMPLATES_DIR, help="Root template directory.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Where to write the precompiled templates.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="Scales to generate for each template.")
+    parser.add_argument("--benchmark", action="store_true", help="Compare raw against precompiled template matching afterwards.")
+    parser.add_argument("--source", default=os.path.join(os.path.dirname(__file__), "imageDetectionSample.png"), help="Screenshot used by --benchmark.")
+    parser.add_argument("--match-prefix", default="components/button/", help="Templates matched against the screenshot by --benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times --benchmark repeats each measurement.")
+    args = parser.parse_args()
+
+    precompile_templates(args.templates_dir, args.output_dir, tuple(args.scales))
+    if args.benchmark:
+        benchmark(args.templates_dir, args.output_dir, args.source, args.match_prefix, args.repeat)
@@ -0,0 +1,452 @@
+"""Benchmark and property checks for the pure scraper transforms in `scraperTransforms.py`.
+
+Every transform is run over inputs rebuilt from the JSON files in the repo: the
+race dates and dialog values of `races.json`, raw skill objects and version
+links of `skills.json`, and the tooltip fragments of every training event option
+of `characters.json` and `supports.json`. The inputs are then replicated with
+suffixed names and shifted IDs to build synthetic catalogs 2, 4 and 8 times the
+size of the real one, and the time per item is compared across the sizes. A
+transform whose time per item grows with the catalog scales worse than linearly
+and is reported, so the regression shows up before the game's catalog doubles.
+
+The same inputs are used to check that the transforms reproduce the files they
+were scraped into: the turn numbers and race entries of `races.json`, the
+conditions and upgrade/downgrade links of `skills.json` and the option texts of
+the training events. The turn numbers are also checked to stay in 1-72, to follow
+the order of the dates and to survive typos through the `SequenceMatcher` fallback.
+
+Run it with: `python transformBenchmark.py --out transforms.json` and compare a
+later run against it with `python transformBenchmark.py --baseline transforms.json`.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple
+
+from scraperTransforms import (
+    build_race_entries,
+    calculate_turn_number,
+    format_event_option,
+    get_skill_activation_conditions,
+    link_skill_versions,
+    write_sorted_json,
+)
+
+SOURCES = {
+    "races": os.path.join(os.path.dirname(__file__), "races.json"),
+    "skills": os.path.join(os.path.dirname(__file__), "skills.json"),
+    "characters": os.path.join(os.path.dirname(__file__), "characters.json"),
+    "supports": os.path.join(os.path.dirname(__file__), "supports.json"),
+}
+DEFAULT_FACTORS = [1, 2, 4, 8]
+# How much the time per item may grow from the real catalog to the largest synthetic one before it is reported.
+MAX_PER_ITEM_GROWTH = 2.0
+# Added to the IDs of every copy of the skills so that the copies link to each other and not to the originals.
+ID_STRIDE = 10_000_000
+YEARS = ["Junior Class", "Classic Class", "Senior Class"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+HALVES = ["First Half", "Second Half"]
+# Where a raw skill object may keep its condition groups, in the order `get_skill_activation_conditions` looks for them.
+CONDITION_LOCATIONS = ["loc_gene_version", "loc", "gene_version", "skill"]
+
+
+@contextmanager
+def quiet_logging():
+    """Only logs warnings and errors inside the block. The `SequenceMatcher` fallback logs every match it makes."""
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logging.getLogger().setLevel(level)
+
+
+def load_sources() -> Dict[str, Dict[str, Any]]:
+    """Loads the JSON files the transforms are run over."""
+    sources = {}
+    for kind, fp in SOURCES.items():
+        with open(fp, "r", encoding="utf-8") as f:
+            sources[kind] = json.load(f)
+    return sources
+
+
+def race_inputs(races: Dict[str, Dict[str, Any]]) -> List[Tuple[str, Dict[str, str], List[tuple]]]:
+    """
+    Rebuilds the dialog values every race entry was scraped from.
+
+    Args:
+        races (Dict[str, Dict[str, Any]]): The races.json entries.
+
+    Returns:
+        The (name, info_map, schedules) arguments of `build_race_entries` of every entry.
+    """
+    inputs = []
+    for race in races.values():
+        info_map = {
+            "Racetrack": race["raceTrack"],
+            "Course": race["course"],
+            "Direction": "Clockwise" if race["direction"] == "Right" else "Counterclockwise",
+            "Grade": race["grade"],
+            "Terrain": race["terrain"],
+            "Distance (type)": race["distanceType"],
+            "Distance (meters)": str(race["distanceMeters"]),
+        }
+        inputs.append((race["name"], info_map, [(race["date"], race["fans"])]))
+    return inputs
+
+
+def raw_skill_object(skill: Dict[str, Any], location: str) -> Dict[str, Any]:
+    """
+    Rebuilds a raw skill object of the site with the conditions of a skills.json entry.
+
+    The condition groups are put at one of the places the site keeps them. The
+    places that are looked at later get stale groups, so a wrong lookup order shows.
+
+    Args:
+        skill (Dict[str, Any]): The skills.json entry.
+        location (str): One of `CONDITION_LOCATIONS`.
+
+    Returns:
+        The raw skill object.
+    """
+    conditions = skill["condition"].split("@") if skill["condition"] else []
+    preconditions = skill["precondition"].split("@") if skill["precondition"] else []
+    groups = []
+    for i in range(max(len(conditions), len(preconditions))):
+        group = {"condition": conditions[i] if i < len(conditions) else None}
+        if i < len(preconditions):
+            group["precondition"] = preconditions[i]
+        groups.append(group)
+    stale = [{"condition": "stale==1", "precondition": "stale==1"}]
+
+    raw = {"id": skill["id"], "name_en": skill["name_en"], "condition_groups": stale}
+    if location == "skill":
+        raw["condition_groups"] = groups
+    elif location == "gene_version":
+        raw["gene_version"] = {"id": skill["id"], "condition_groups": groups}
+    elif location == "loc":
+        raw["gene_version"] = {"id": skill["id"], "condition_groups": stale}
+        raw["loc"] = {"en": {"condition_groups": groups}}
+    else:
+        raw["gene_version"] = {"id": skill["id"], "condition_groups": stale}
+        raw["loc"] = {"en": {"condition_groups": stale, "gene_version": {"condition_groups": groups}}}
+    return raw
+
+
+def skill_inputs(skills: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rebuilds a raw skill object for every skills.json entry, cycling through `CONDITION_LOCATIONS`."""
+    return [raw_skill_object(skill, CONDITION_LOCATIONS[i % len(CONDITION_LOCATIONS)]) for i, skill in enumerate(skills.values())]
+
+
+def unlinked_skills(skills: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[int, str]]:
+    """
+    Copies the skills.json entries without their upgrade/downgrade links.
+
+    Args:
+        skills (Dict[str, Dict[str, Any]]): The skills.json entries.
+
+    Returns:
+        The copied skills and the names of the skills by ID for `link_skill_versions`.
+    """
+    unlinked = {}
+    for name, skill in skills.items():
+        unlinked[name] = {**skill, "upgrade": None, "downgrade": None}
+    return unlinked, {skill["id"]: name for name, skill in skills.items()}
+
+
+def option_fragments(option_text: str) -> List[str]:
+    """
+    Rebuilds the tooltip fragments an option text was formatted from.
+
+    Args:
+        option_text (str): The stored option text.
+
+    Returns:
+        The text of the divs of the option, with an "or" between the outcomes of a random option.
+    """
+    header = "Randomly either\n----------\n"
+    if not option_text.startswith(header):
+        return option_text.split("\n")
+
+    fragments = ["Randomly either"]
+    for i, group in enumerate(option_text[len(header) :].split("\n----------\n")):
+        if i > 0:
+            fragments.append("or")
+        fragments.extend(group.split("\n"))
+    return fragments
+
+
+def event_options(sources: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Collects every training event option text of the characters and support cards."""
+    return [
+        option
+        for kind in ("characters", "supports")
+        for events in sources[kind].values()
+        for options in events.values()
+        for option in options
+    ]
+
+
+def misspell_month(date: str) -> str:
+    """Misspells the month of a date so that `calculate_turn_number` takes the `SequenceMatcher` fallback."""
+    year_class, year, month, *phase = date.split()
+    return " ".join([year_class, year, month[:2] + "x" + month[3:], *phase])
+
+
+def scale_list(items: List[Any], factor: int) -> List[Any]:
+    """Repeats the items `factor` times."""
+    return [item for _ in range(factor) for item in items]
+
+
+def scale_named(data: Dict[str, Any], factor: int) -> Dict[str, Any]:
+    """Repeats the entries `factor` times, with the copies suffixed by their number so that they sort among the originals."""
+    scaled = {}
+    for copy_index in range(factor):
+        suffix = "" if copy_index == 0 else f" #{copy_index}"
+        for name, value in data.items():
+            scaled[f"{name}{suffix}"] = value
+    return scaled
+
+
+def scale_skills(skills: Dict[str, Dict[str, Any]], factor: int) -> Dict[str, Dict[str, Any]]:
+    """Repeats the skills.json entries `factor` times, with the IDs and versions of every copy shifted by `ID_STRIDE`."""
+    scaled = {}
+    for copy_index in range(factor):
+        suffix = "" if copy_index == 0 else f" #{copy_index}"
+        offset = copy_index * ID_STRIDE
+        for name, skill in skills.items():
+            scaled[f"{name}{suffix}"] = {
+                **skill,
+                "id": skill["id"] + offset,
+                "versions": [version + offset for version in skill["versions"]],
+                "upgrade": skill["upgrade"] + offset if skill["upgrade"] is not None else None,
+                "downgrade": skill["downgrade"] + offset if skill["downgrade"] is not None else None,
+            }
+    return scaled
+
+
+def check_properties(sources: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Checks that the transforms reproduce the JSON files and that the turn numbers behave.
+
+    Args:
+        sources (Dict[str, Dict[str, Any]]): The JSON files by kind, see `load_sources`.
+
+    Returns:
+        The number of failures by check. Every failure is logged.
+    """
+    failures = {}
+
+    def check(name: str, ok: bool, message: str):
+        failures.setdefault(name, 0)
+        if not ok:
+            failures[name] += 1
+            if failures[name] <= 5:
+                logging.error(f"{name}: {message}")
+
+    # Every date of the calendar gets its own turn in 1-72, in the order of the dates.
+    turns = [calculate_turn_number(f"{year} {month}, {half}") for year in YEARS for month in MONTHS for half in HALVES]
+    check("turn_range", turns == list(range(1, 73)), f"The turns of the calendar are {turns}.")
+
+    # Misspelled years and months fall back to the most similar name. Months of three letters are too short to misspell unambiguously.
+    for year in YEARS:
+        for month in MONTHS:
+            date = f"{year} {month}, Second Half"
+            expected = calculate_turn_number(date)
+            typos = [f"{year.replace('Class', 'Clas')} {month}, Second Half", f"{year} {month.lower()}, Second Half"]
+            if len(month) > 3:
+                typos.append(f"{year} {month[:-1]}, Second Half")
+            for typo in typos:
+                with quiet_logging():
+                    turn = calculate_turn_number(typo)
+                check("turn_typos", turn == expected, f"{typo!r} is turn {turn} instead of {expected}.")
+
+    for race_input, (key, race) in zip(race_inputs(sources["races"]), sources["races"].items()):
+        entries = build_race_entries(*race_input)
+        check("race_entries", entries == [race], f"{key} is rebuilt as {entries}.")
+
+    for raw, skill in zip(skill_inputs(sources["skills"]), sources["skills"].values()):
+        condition = get_skill_activation_conditions(raw)
+        precondition = get_skill_activation_conditions(raw, get_preconditions=True)
+        check("skill_conditions", (condition, precondition) == (skill["condition"], skill["precondition"]), f"{skill['name_en']} has {condition!r} / {precondition!r}.")
+
+    skills, skill_id_to_name = unlinked_skills(sources["skills"])
+    link_skill_versions(skills, skill_id_to_name)
+    for name, skill in sources["skills"].items():
+        linked = (skills[name]["upgrade"], skills[name]["downgrade"])
+        check("skill_versions", linked == (skill["upgrade"], skill["downgrade"]), f"{name} is linked to {linked}.")
+
+    for option in event_options(sources):
+        formatted = format_event_option(option_fragments(option))
+        check("event_options", formatted == option, f"{option!r} is formatted as {formatted!r}.")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in ("skills", "characters"):
+            fp = os.path.join(tmp_dir, f"{kind}.json")
+            reversed_data = dict(reversed(list(sources[kind].items())))
+            sorted_data = write_sorted_json(reversed_data, fp)
+            with open(fp, "r", encoding="utf-8") as f:
+                written = json.load(f)
+            check("sorted_dump", written == sources[kind], f"{kind}.json does not read back as the data it was written from.")
+            check("sorted_dump", list(written) == sorted(written) == list(sorted_data), f"The keys of {kind}.json are not sorted.")
+
+    return failures
+
+
+def benchmark_transform(fn: Callable[[Any], Any], inputs: Dict[int, Tuple[Any, int]], repeat: int) -> Dict[int, float]:
+    """
+    Times a transform over the same inputs at every catalog size.
+
+    The smaller catalogs are run several times per timed run so that every timed
+    run processes about as many items as the largest one and is as long.
+
+    Args:
+        fn (Callable[[Any], Any]): Runs the transform over one input.
+        inputs (Dict[int, Tuple[Any, int]]): The input and its number of items by scale factor.
+        repeat (int): How many timed runs to take the best of.
+
+    Returns:
+        The best time per item in microseconds by scale factor.
+    """
+    max_items = max(items for _, items in inputs.values())
+    per_item_us = {}
+    for factor, (data, items) in inputs.items():
+        passes = max(1, round(max_items / items))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(passes):
+                fn(data)
+            times.append(time.perf_counter() - start)
+        per_item_us[factor] = 1e6 * min(times) / (items * passes)
+    return per_item_us
+
+
+def run_benchmarks(sources: Dict[str, Dict[str, Any]], factors: List[int] = None, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Benchmarks every transform over the real catalog and the synthetic ones.
+
+    Args:
+        sources (Dict[str, Dict[str, Any]]): The JSON files by kind, see `load_sources`.
+        factors (List[int], optional): The sizes of the synthetic catalogs relative to the real one. Defaults to `DEFAULT_FACTORS`.
+        repeat (int, optional): How many timed runs to take the best of. Defaults to 5.
+
+    Returns:
+        The time per item in microseconds by transform and scale factor, the growth of
+            the time per item from the smallest to the largest catalog, and the
+            transforms whose growth exceeds `MAX_PER_ITEM_GROWTH`.
+    """
+    factors = sorted(factors or DEFAULT_FACTORS)
+    dates = [race["date"] for race in sources["races"].values()]
+    races = race_inputs(sources["races"])
+    options = [option_fragments(option) for option in event_options(sources)]
+    characters = sources["characters"]
+    typo_dates = [misspell_month(date) for date in dates]
+
+    def link(data):
+        skills, skill_id_to_name = data
+        link_skill_versions({name: dict(skill) for name, skill in skills.items()}, skill_id_to_name)
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    dump_fp = os.path.join(tmp_dir.name, "data.json")
+
+    transforms = {}
+    for factor in factors:
+        scaled_skills = scale_skills(sources["skills"], factor)
+        scaled_characters = scale_named(characters, factor)
+        inputs = {
+            "turn_number": (scale_list(dates, factor), len(dates) * factor),
+            "turn_number_fallback": (scale_list(typo_dates, factor), len(typo_dates) * factor),
+            "race_entries": (scale_list(races, factor), len(races) * factor),
+            "skill_conditions": (skill_inputs(scaled_skills), len(scaled_skills)),
+            "skill_versions": (unlinked_skills(scaled_skills), len(scaled_skills)),
+            "event_options": (scale_list(options, factor), len(options) * factor),
+            "sorted_dump": (dict(reversed(list(scaled_characters.items()))), len(scaled_characters)),
+        }
+        for name, value in inputs.items():
+            transforms.setdefault(name, {})[factor] = value
+
+    runners = {
+        "turn_number": lambda data: [calculate_turn_number(date) for date in data],
+        "turn_number_fallback": lambda data: [calculate_turn_number(date) for date in data],
+        "race_entries": lambda data: [build_race_entries(*race) for race in data],
+        "skill_conditions": lambda data: [
+            (get_skill_activation_conditions(raw), get_skill_activation_conditions(raw, get_preconditions=True)) for raw in data
+        ],
+        "skill_versions": link,
+        "event_options": lambda data: [format_event_option(fragments) for fragments in data],
+        "sorted_dump": lambda data: write_sorted_json(data, dump_fp),
+    }
+
+    # The logs of the fallback would dominate its timings.
+    with tmp_dir, quiet_logging():
+        results = {name: benchmark_transform(runners[name], transforms[name], repeat) for name in runners}
+
+    report = {"factors": factors, "items": {name: {factor: items for factor, (_, items) in transforms[name].items()} for name in transforms}}
+    report["per_item_us"] = results
+    report["growth"] = {name: per_item[factors[-1]] / per_item[factors[0]] for name, per_item in results.items()}
+    report["regressions"] = [name for name, growth in report["growth"].items() if growth > MAX_PER_ITEM_GROWTH]
+
+    for name, per_item in results.items():
+        timings = ", ".join(f"x{factor}: {us:.2f}" for factor, us in per_item.items())
+        logging.info(f"{name:<22} us per item {timings} (x{report['growth'][name]:.2f} from x{factors[0]} to x{factors[-1]}).")
+    for name in report["regressions"]:
+        logging.warning(
+            f"The time per item of {name} grows x{report['growth'][name]:.2f} from a catalog x{factors[0]} to x{factors[-1]} "
+            f"the size of the real one, which is more than x{MAX_PER_ITEM_GROWTH}. It scales worse than linearly."
+        )
+    return report
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Logs how the time per item of every transform changed relative to an earlier run."""
+    for name, per_item in report["per_item_us"].items():
+        baseline_per_item = baseline.get("per_item_us", {}).get(name)
+        if not baseline_per_item:
+            continue
+        changes = []
+        for factor, us in per_item.items():
+            # JSON turns the scale factors into strings.
+            baseline_us = baseline_per_item.get(str(factor), baseline_per_item.get(factor))
+            if baseline_us:
+                changes.append(f"x{factor}: {us:.2f} vs {baseline_us:.2f} ({us / baseline_us:.2f}x)")
+        logging.info(f"{name:<22} us per item {', '.join(changes)}.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Benchmarks and checks the pure scraper transforms over the real and synthetic catalogs.")
+    parser.add_argument("--factors", nargs="+", type=int, default=DEFAULT_FACTORS, help="The sizes of the synthetic catalogs relative to the real one.")
+    parser.add_argument("--repeat", type=int, default=5, help="How many timed runs to take the best of.")
+    parser.add_argument("--out", default=None, help="Optional JSON file to write the results to.")
+    parser.add_argument("--baseline", default=None, help="Optional JSON file of an earlier run to compare against.")
+    parser.add_argument("--no-checks", action="store_true", help="Only run the benchmarks.")
+    args = parser.parse_args()
+
+    sources = load_sources()
+    failed = 0
+    if not args.no_checks:
+        failures = check_properties(sources)
+        failed = sum(failures.values())
+        results = [f"{name} failed {count}" if count else f"{name} ok" for name, count in failures.items()]
+        logging.info(f"Property checks: {', '.join(results)}.")
+
+    report = run_benchmarks(sources, args.factors, args.repeat)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare_to_baseline(report, json.load(f))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        logging.info(f"Saved the results of {len(report['per_item_us'])} transforms to {args.out}.")
+
+    if failed:
+        raise SystemExit(f"{failed} property check(s) failed.")
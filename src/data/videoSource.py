@@ -0,0 +1,144 @@
+"""Threaded video decoding for the image detection tools.
+
+`VideoSource` decodes a video on a background thread into a bounded queue so
+that decoding overlaps with whatever processes the frames. It can sample every
+Nth frame (the skipped frames are grabbed but never decoded) and limit decoding
+to a time range of the video.
+"""
+
+import queue
+import threading
+
+import cv2
+
+# Put on the queue by the decode thread once there are no more frames.
+_END_OF_STREAM = object()
+
+
+class VideoSource:
+    """
+    Decodes a video on a background thread.
+
+    Frames are read with `read()` or by iterating over the source. Each frame is a
+    tuple of its frame index, its timestamp in milliseconds and the BGR image.
+
+    Args:
+        fp (str): The filepath of the video.
+        stride (int): Only every `stride`-th frame is decoded. Defaults to 1.
+        start_sec (float): Where to start decoding in seconds. Defaults to the start of the video.
+        end_sec (float): Where to stop decoding in seconds. Defaults to the end of the video.
+        loop (bool): Whether to restart from `start_sec` after the last frame. Defaults to False.
+        queue_size (int): How many decoded frames may wait in the queue. Bounds memory
+            use when decoding is faster than processing. Defaults to 8.
+    """
+
+    def __init__(self, fp, stride=1, start_sec=None, end_sec=None, loop=False, queue_size=8):
+        if stride < 1:
+            raise ValueError(f"stride must be a positive integer. Got: {stride}.")
+
+        self.fp = fp
+        self.stride = stride
+        self.loop = loop
+        self.cap = cv2.VideoCapture(fp)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"Failed to open video: {fp}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.start_frame = int(round(start_sec * self.fps)) if start_sec else 0
+        self.end_frame = int(round(end_sec * self.fps)) if end_sec is not None else None
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._decode, daemon=True)
+        self._thread.start()
+
+    def read(self, timeout=None):
+        """
+        Reads the next decoded frame.
+
+        Args:
+            timeout (float): How long to wait for a frame in seconds. Waits forever if not specified.
+
+        Returns:
+            tuple: The frame index, timestamp in milliseconds and BGR image, or None
+                once there are no more frames.
+        """
+        if self._finished:
+            return None
+
+        item = self._queue.get(timeout=timeout)
+        if item is _END_OF_STREAM:
+            self._finished = True
+            return None
+        return item
+
+    def stop(self):
+        """Stops the decode thread and releases the video."""
+        self._stop_event.set()
+        # Unblock the decode thread if it is waiting on a full queue.
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(timeout=0.05)
+        self.cap.release()
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _seek_to_start(self):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+        return self.start_frame
+
+    def _is_past_end(self, index):
+        return self.end_frame is not None and index >= self.end_frame
+
+    def _put(self, item):
+        # Time out periodically so that a stop request is noticed while the queue is full.
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self):
+        index = self._seek_to_start()
+        decoded_since_seek = False
+        try:
+            while not self._stop_event.is_set():
+                ret, frame = (False, None) if self._is_past_end(index) else self.cap.read()
+                if not ret:
+                    # Only loop if the range produced anything. Otherwise this would spin forever.
+                    if self.loop and decoded_since_seek:
+                        index = self._seek_to_start()
+                        decoded_since_seek = False
+                        continue
+                    break
+
+                decoded_since_seek = True
+                if not self._put((index, index * 1000.0 / self.fps, frame)):
+                    break
+                index += 1
+
+                # Skip over the frames in between without decoding them.
+                for _ in range(self.stride - 1):
+                    if self._is_past_end(index) or not self.cap.grab():
+                        break
+                    index += 1
+        finally:
+            self._put(_END_OF_STREAM)